@@ -14,7 +14,10 @@ import json
 import hashlib
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List
+from llm_cache import (LLM_CACHE_STAGES, STAGE_ANSWER, STAGE_HEADER, STAGE_SQL,
+                       CachedLLM, LLMResponseCache, discard_cached_response)
 
 
 # --- 步骤 0: 定义全局配置 ---
@@ -24,6 +27,23 @@ EXCEL_DIR = "uploads"  # 存放 Excel 文件的目录
 EMBEDDING_MODEL_NAME = "moka-ai/m3e-base"
 CACHE_DIR = "cache"
 HEADER_CACHE_DIR = os.path.join(CACHE_DIR, "headers")
+VECTOR_DB_DIR = "Faiss"  # FAISS 向量数据库目录
+FAISS_INDEX_NAME = "faiss_index"
+FAISS_INDEX_PATH = os.path.join(VECTOR_DB_DIR, f"{FAISS_INDEX_NAME}.faiss")
+FAISS_INDEX_PKL_PATH = os.path.join(VECTOR_DB_DIR, f"{FAISS_INDEX_NAME}.pkl")
+DUMMY_DOC_ID = "__dummy__"  # 空向量数据库的占位文档ID
+# 表头识别的采样参数：开头连续行数、其余部分的分层抽样行数、单元格截断长度、片段 token 预算
+HEADER_SAMPLE_HEAD_ROWS = int(os.getenv("HEADER_SAMPLE_HEAD_ROWS", 30))
+HEADER_SAMPLE_EXTRA_ROWS = int(os.getenv("HEADER_SAMPLE_EXTRA_ROWS", 10))
+HEADER_SAMPLE_CELL_CHARS = int(os.getenv("HEADER_SAMPLE_CELL_CHARS", 40))
+HEADER_SAMPLE_TOKEN_BUDGET = int(os.getenv("HEADER_SAMPLE_TOKEN_BUDGET", 1500))
+# SQL执行参数：每条语句保留的最大行数、分批读取的行数、超出后继续计数的上限
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", 200))
+SQL_FETCH_BATCH_ROWS = int(os.getenv("SQL_FETCH_BATCH_ROWS", 100))
+SQL_COUNT_SCAN_LIMIT = int(os.getenv("SQL_COUNT_SCAN_LIMIT", 100000))
+# 多条SQL并发执行的线程数；是否默认启用命中即停（点查时任一语句返回数据即取消其余语句）
+SQL_EXECUTION_WORKERS = int(os.getenv("SQL_EXECUTION_WORKERS", 4))
+SQL_EARLY_EXIT = os.getenv("SQL_EARLY_EXIT", "false").lower() in ("1", "true", "yes")
 
 # 创建缓存目录
 os.makedirs(CACHE_DIR, exist_ok=True)
@@ -52,13 +72,33 @@ class ModelManager:
                 "model_name": os.getenv("LLM_MODEL_NAME", "glm-4-plus"),
                 "temperature": float(os.getenv("LLM_TEMPERATURE", 0.2))
             }
+            self._llm_cache = None
+            self._cached_llms = {}
+            self._cache_stages = {s.strip() for s in LLM_CACHE_STAGES.split(",") if s.strip()}
             self._initialized = True
     
-    def get_llm(self):
-        """懒加载LLM模型"""
+    def get_llm(self, stage: str = None):
+        """
+        懒加载LLM模型
+        
+        Args:
+            stage: 调用阶段（header/mapping/sql/answer），该阶段在 LLM_CACHE_STAGES 中启用时返回带响应缓存的模型
+        """
         if self._llm is None:
             self._llm = self._create_llm(self._llm_config)
-        return self._llm
+        if stage is None or stage not in self._cache_stages:
+            return self._llm
+        if stage not in self._cached_llms:
+            self._cached_llms[stage] = CachedLLM(self._llm, self.get_llm_cache(), self._llm_config, stage)
+        return self._cached_llms[stage]
+    
+    def get_llm_cache(self) -> LLMResponseCache:
+        """懒加载大模型响应缓存"""
+        if self._llm_cache is None:
+            with self._lock:
+                if self._llm_cache is None:
+                    self._llm_cache = LLMResponseCache()
+        return self._llm_cache
     
     def get_embedding_model(self):
         """懒加载嵌入模型"""
@@ -130,6 +170,17 @@ model_manager = ModelManager()
 
 # --- 导入新的数据库管理器 ---
 from database_manager import get_database_manager
+from connection_pool import QueryGuard, get_connection_pool
+from schema_catalog import get_schema_catalog
+from llm_batching import estimate_tokens, extract_json_object, pack_batches
+from header_detector import HEADER_CONFIDENCE_THRESHOLD, detect_header, format_header_text
+from query_cache import get_sql_query_cache, get_sql_result_cache, get_sql_template_cache
+from semantic_cache import get_semantic_cache
+from fts_index import rewrite_like_predicates
+from column_profiler import is_numeric_shadow
+from file_fingerprint import get_file_hash
+from ingestion_service import get_data_version
+from parsed_sheet_store import get_parsed_sheet_store
 
 def get_table_mapping(excel_path: str) -> Dict[str, str]:
     """
@@ -187,12 +238,8 @@ class HeaderCacheManager:
         return os.path.join(self.cache_dir, f"{cache_key}.json")
     
     def get_file_hash(self, file_path: str) -> str:
-        """计算文件哈希"""
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        """计算文件哈希（stat 未变化时复用进程内记忆的结果）"""
+        return get_file_hash(file_path)
     
     def load_cached_header(self, excel_path: str, sheet_name: str) -> Optional[str]:
         """加载缓存的表头信息"""
@@ -304,6 +351,11 @@ def excel_to_sqlite(excel_path: str, db_path: str = "database.db") -> Tuple[str,
     db_manager.update_if_changed(excel_path)
     return db_manager.db_path, db_manager.get_table_mapping(excel_path)
 
+def get_published_tables(excel_path: str) -> Tuple[str, Dict[str, str]]:
+    """读取已接入的数据库路径和表映射（只读，不触发任何导入）"""
+    db_manager = get_database_manager()
+    return db_manager.db_path, db_manager.get_table_mapping(excel_path)
+
 async def identify_header_with_cache(excel_path: str, sheet_name: str, llm_model) -> Optional[str]:
     """带缓存的表头识别"""
     # 尝试从缓存加载
@@ -311,8 +363,12 @@ async def identify_header_with_cache(excel_path: str, sheet_name: str, llm_model
     if cached_header:
         return cached_header
     
-    # 缓存未命中，执行LLM分析
-    header_info = await identify_header(excel_path, sheet_name, llm_model)
+    # 缓存未命中，先尝试启发式识别，置信度不足时执行LLM分析
+    sample = load_sheet_sample(excel_path, sheet_name)
+    header_info = detect_header_heuristically(sheet_name, sample[0])
+    if header_info is None:
+        header_info = await identify_header(excel_path, sheet_name, llm_model,
+                                            build_sheet_content(excel_path, sheet_name, sample=sample))
     
     # 缓存结果
     if header_info:
@@ -320,26 +376,151 @@ async def identify_header_with_cache(excel_path: str, sheet_name: str, llm_model
     
     return header_info
 
-async def identify_header(excel_path: str, sheet_name: str, llm_model):
-    """使用大模型识别 Excel Sheet 的表头和关键信息"""
-    try:
-        df = pd.read_excel(excel_path, sheet_name=sheet_name)
-        
-        content_lines = []
-        headers = df.columns.tolist()
-        content_lines.append("表头: " + " | ".join(str(h) for h in headers))
+_header_prompt = None
+
+def load_header_prompt() -> str:
+    """读取表头识别提示词（只读取一次）"""
+    global _header_prompt
+    if _header_prompt is None:
+        with open("excel_header_prompt.txt", "r", encoding="utf-8") as f:
+            _header_prompt = f.read()
+    return _header_prompt
+
+def _stratified_positions(start: int, stop: int, count: int) -> List[int]:
+    """在 [start, stop) 区间内均匀分层取 count 个行号（每层取中点）"""
+    if stop <= start or count <= 0:
+        return []
+    count = min(count, stop - start)
+    step = (stop - start) / count
+    return sorted(set(int(start + step * (i + 0.5)) for i in range(count)))
+
+def _sample_rows_from_table(excel_path: str, sheet_name: str, positions: List[int]) -> Optional[pd.DataFrame]:
+    """从已导入的SQLite表中按行号读取样本行（表按Excel行序写入，rowid 即行号+1）"""
+    table_name = get_schema_catalog().get_table_name(os.path.basename(excel_path), sheet_name)
+    if table_name is None or not positions:
+        return None
+    placeholders = ",".join("?" for _ in positions)
+    conn = get_database_manager().pool.get_reader()
+    sample = pd.read_sql_query(
+        f"SELECT rowid AS __rowid__, * FROM [{table_name}] WHERE rowid IN ({placeholders}) ORDER BY rowid",
+        conn, params=[p + 1 for p in positions]
+    )
+    sample.index = sample.pop("__rowid__") - 1
+    # 数值影子列不属于工作表原有的列
+    columns = list(sample.columns)
+    return sample[[c for c in columns if not is_numeric_shadow(c, columns)]]
+
+def _count_table_rows(excel_path: str, sheet_name: str) -> Optional[int]:
+    """读取已导入SQLite表的行数（使用 MAX(rowid)，无需全表扫描）"""
+    table_name = get_schema_catalog().get_table_name(os.path.basename(excel_path), sheet_name)
+    if table_name is None:
+        return None
+    row = get_database_manager().pool.get_reader().execute(f"SELECT MAX(rowid) FROM [{table_name}]").fetchone()
+    return int(row[0] or 0)
+
+def load_sheet_sample(excel_path: str, sheet_name: str) -> Tuple[pd.DataFrame, Optional[pd.DataFrame], int]:
+    """
+    读取用于表头识别的工作表样本：开头若干行 + 其余部分的分层抽样，耗时与工作表大小无关
+    
+    Args:
+        excel_path: Excel文件路径
+        sheet_name: 工作表名
         
-        content_lines.append("\n数据样本:")
-        for idx, row in df.iterrows():
-            row_data = " | ".join(str(val) for val in row.values)
-            content_lines.append(f"第{idx+1}行: {row_data}")
+    Returns:
+        (开头若干行, 分层抽样行或None，两者索引均为原始行号, 工作表总行数)
+    """
+    head_rows = HEADER_SAMPLE_HEAD_ROWS
+    # 优先复用接入阶段已解析的工作表（大表为流式导入时保留的样本，attrs 中记录总行数）
+    df = get_parsed_sheet_store().get_sheet(excel_path, sheet_name)
+    if df is not None:
+        total_rows = int(df.attrs.get("total_rows", len(df)))
+        head = df.head(head_rows)
+    else:
+        head = pd.read_excel(excel_path, sheet_name=sheet_name, nrows=head_rows)
+        total_rows = _count_table_rows(excel_path, sheet_name)
+        if total_rows is None:
+            total_rows = len(head)
+    
+    positions = _stratified_positions(len(head), total_rows, HEADER_SAMPLE_EXTRA_ROWS)
+    extra = None
+    if positions:
+        if df is not None and len(df) >= total_rows:
+            extra = df.iloc[positions]
+        else:
+            try:
+                extra = _sample_rows_from_table(excel_path, sheet_name, positions)
+            except Exception as e:
+                print(f"⚠️ 读取工作表抽样行失败 {sheet_name}: {e}")
+    if extra is not None and extra.empty:
+        extra = None
+    return head, extra, total_rows
+
+def detect_header_heuristically(sheet_name: str, head: pd.DataFrame) -> Optional[str]:
+    """
+    按提示词中的规则用启发式方法识别表头和关键信息，置信度足够时无需调用大模型
+    
+    Args:
+        sheet_name: 工作表名
+        head: 工作表开头若干行
         
-        content_lines.append(f"\n数据统计: 共{len(df)}行，{len(df.columns)}列")
-        content = "\n".join(content_lines)
+    Returns:
+        与大模型输出格式一致的表头和关键信息，置信度不足时返回None
+    """
+    try:
+        detection = detect_header(head)
+    except Exception as e:
+        print(f"⚠️ 启发式表头识别失败 {sheet_name}: {e}")
+        return None
+    if detection is None or detection.confidence < HEADER_CONFIDENCE_THRESHOLD:
+        return None
+    print(f"🧮 工作表 {sheet_name} 使用启发式表头识别 (置信度 {detection.confidence:.2f})")
+    return detection.to_header_text()
+
+def _truncate_cell(value: Any, max_chars: int = HEADER_SAMPLE_CELL_CHARS) -> str:
+    """截断过长的单元格内容"""
+    text = str(value).replace("\n", " ")
+    return text if len(text) <= max_chars else text[:max_chars] + "..."
+
+def build_sheet_content(excel_path: str, sheet_name: str, token_budget: int = HEADER_SAMPLE_TOKEN_BUDGET,
+                        sample: Tuple[pd.DataFrame, Optional[pd.DataFrame], int] = None) -> str:
+    """构建用于表头识别的工作表内容片段（采样、截断单元格并限制在 token 预算内）"""
+    head, extra, total_rows = sample if sample is not None else load_sheet_sample(excel_path, sheet_name)
+    
+    def _format_rows(df: Optional[pd.DataFrame], budget: int) -> Tuple[List[str], int]:
+        lines, used = [], 0
+        if df is None:
+            return lines, used
+        for idx, row in zip(df.index, df.itertuples(index=False, name=None)):
+            line = f"第{idx+1}行: " + " | ".join(_truncate_cell(val) for val in row)
+            if lines and used + estimate_tokens(line) > budget:
+                break
+            lines.append(line)
+            used += estimate_tokens(line)
+        return lines, used
+    
+    content_lines = []
+    content_lines.append("表头: " + " | ".join(_truncate_cell(h) for h in head.columns))
+    content_lines.append("\n数据样本:")
+    remaining = token_budget - sum(estimate_tokens(line) for line in content_lines)
+    
+    # 抽样行最多占用三分之一预算，其余留给开头连续的行（表头通常在开头）
+    extra_lines, extra_used = _format_rows(extra, remaining // 3)
+    head_lines, _ = _format_rows(head, remaining - extra_used)
+    content_lines.extend(head_lines)
+    if extra_lines:
+        content_lines.append("……（以下为其余部分的抽样行）")
+        content_lines.extend(extra_lines)
+    
+    content_lines.append(f"\n数据统计: 共{total_rows}行，{len(head.columns)}列")
+    return "\n".join(content_lines)
+
+async def identify_header(excel_path: str, sheet_name: str, llm_model, content: str = None):
+    """使用大模型识别 Excel Sheet 的表头和关键信息"""
+    try:
+        if content is None:
+            content = build_sheet_content(excel_path, sheet_name)
         
-        with open("excel_header_prompt.txt", "r", encoding="utf-8") as f:
-            HEADER_PROMPT = f.read()
-        prompt = f"{HEADER_PROMPT}\n\n请分析以下 Excel 表格片段，并识别出表格名称、表头和关键信息：\n---\n{content}\n---\n表头和关键信息是: "
+        prompt = f"{load_header_prompt()}\n\n请分析以下 Excel 表格片段，并识别出表格名称、表头和关键信息：\n---\n{content}\n---\n表头和关键信息是: "
         
         messages = [HumanMessage(content=prompt)]
         response = await llm_model.ainvoke(messages)
@@ -352,31 +533,255 @@ async def identify_header(excel_path: str, sheet_name: str, llm_model):
     except Exception as e:
         return None
 
+async def identify_headers_batched(sheet_contents: Dict[str, str], llm_model) -> Dict[str, str]:
+    """
+    在一次请求中识别多个工作表的表头和关键信息
+    
+    Args:
+        sheet_contents: {工作表名: 表格内容片段}
+        llm_model: 大模型
+        
+    Returns:
+        {工作表名: 表头和关键信息}，只包含解析成功的工作表
+    """
+    sections = []
+    for i, (sheet_name, content) in enumerate(sheet_contents.items(), 1):
+        sections.append(f"### 工作表{i}: {sheet_name}\n---\n{content}\n---")
+    prompt = (
+        f"{load_header_prompt()}\n\n"
+        f"下面给出同一个 Excel 文件中的 {len(sheet_contents)} 个工作表片段，请对每个工作表分别按上述要求和输出格式识别表头和关键信息。\n\n"
+        + "\n\n".join(sections)
+        + "\n\n请严格只输出一个JSON对象，键为工作表名（与上面给出的完全一致），"
+          "值为该工作表按上述输出格式给出的表头和关键信息文本，例如："
+          '{"Sheet1": "*表头{header}*\\n产品名称 | 价格\\n*关键信息{key_info}*\\n苹果，香蕉"}'
+    )
+    
+    messages = [HumanMessage(content=prompt)]
+    try:
+        response = await llm_model.ainvoke(messages)
+        result = extract_json_object(response.content if hasattr(response, 'content') else str(response))
+    except Exception as e:
+        print(f"⚠️ 批量表头识别失败: {e}")
+        discard_cached_response(llm_model, messages)
+        return {}
+    if not isinstance(result, dict):
+        discard_cached_response(llm_model, messages)
+        return {}
+    headers = {
+        sheet_name: str(header).strip()
+        for sheet_name, header in result.items()
+        if sheet_name in sheet_contents and isinstance(header, str) and header.strip()
+    }
+    if len(headers) < len(sheet_contents):
+        # 响应不完整，不缓存，避免重试时重放
+        discard_cached_response(llm_model, messages)
+    return headers
+
+def _prepare_sheet_contents(excel_path: str, sheet_names: List[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    读取表头缓存并尝试启发式识别，为其余工作表构建内容片段
+    
+    Returns:
+        (已得到的表头 {工作表名: 表头和关键信息}, 需要大模型识别的 {工作表名: 内容片段})
+    """
+    results = {}
+    sheet_contents = {}
+    for sheet_name in sheet_names:
+        cached_header = header_cache_manager.load_cached_header(excel_path, sheet_name)
+        if cached_header:
+            results[sheet_name] = cached_header
+            continue
+        try:
+            sample = load_sheet_sample(excel_path, sheet_name)
+            header = detect_header_heuristically(sheet_name, sample[0])
+            if header:
+                results[sheet_name] = header
+                header_cache_manager.cache_header_analysis(excel_path, sheet_name, header)
+                continue
+            sheet_contents[sheet_name] = build_sheet_content(excel_path, sheet_name, sample=sample)
+        except Exception as e:
+            print(f"⚠️ 读取工作表失败 {sheet_name}: {e}")
+    
+    if sheet_contents:
+        print(f"🤖 {len(sheet_contents)} 个工作表的启发式表头识别置信度不足，交由大模型识别")
+    return results, sheet_contents
+
 # 并发处理表头识别
 async def identify_headers_concurrently(excel_path: str, sheet_names: List[str], llm_model, max_workers: int = 3):
-    """并发处理多个表头识别"""
-    results = {}
+    """并发处理多个表头识别（未命中缓存的工作表按 token 预算合并为批量请求）"""
+    results, sheet_contents = _prepare_sheet_contents(excel_path, sheet_names)
+    if not sheet_contents:
+        return results
+    
+    batches = pack_batches(list(sheet_contents.items()), estimate_tokens(load_header_prompt()))
     
     # 使用信号量限制并发数
     semaphore = asyncio.Semaphore(max_workers)
     
-    async def process_sheet(sheet_name):
+    async def process_batch(batch):
         async with semaphore:
-            return sheet_name, await identify_header_with_cache(excel_path, sheet_name, llm_model)
-    
-    # 创建并发任务
-    tasks = [process_sheet(sheet_name) for sheet_name in sheet_names]
+            headers = {}
+            if len(batch) > 1:
+                headers = await identify_headers_batched({name: sheet_contents[name] for name in batch}, llm_model)
+                if len(headers) < len(batch):
+                    print(f"🔁 批量表头识别有 {len(batch) - len(headers)} 个工作表未解析，回退到单表识别")
+            # 批量结果缺失的工作表（以及单表批次）逐个识别
+            for sheet_name in batch:
+                if sheet_name not in headers:
+                    header = await identify_header(excel_path, sheet_name, llm_model, sheet_contents[sheet_name])
+                    if header:
+                        headers[sheet_name] = header
+            for sheet_name, header in headers.items():
+                header_cache_manager.cache_header_analysis(excel_path, sheet_name, str(header))
+            return headers
     
-    # 等待所有任务完成
-    completed_tasks = await asyncio.gather(*tasks, return_exceptions=True)
+    # 等待所有批次完成
+    completed_batches = await asyncio.gather(*(process_batch(batch) for batch in batches), return_exceptions=True)
     
     # 处理结果
-    for result in completed_tasks:
+    for result in completed_batches:
         if isinstance(result, Exception):
             continue
-        sheet_name, header = result
-        if header:
-            results[sheet_name] = header
+        results.update(result)
+    
+    return results
+
+def _format_analysis_section(index: int, sheet_name: str, content: str, schema) -> str:
+    """生成单个工作表的分析片段（表格内容 + 导入数据库后的列名）"""
+    section = f"### 工作表{index}: {sheet_name}\n---\n{content}\n---"
+    if schema is not None:
+        section += f"\n数据库列名（表 {schema.table_name}）:\n" + "\n".join(
+            f"{i}. {col}" for i, col in enumerate(schema.columns, 1))
+    return section
+
+async def analyze_sheets_batched(sheet_inputs: Dict[str, Tuple[str, Any]], llm_model) -> Dict[str, Dict[str, Any]]:
+    """
+    在一次请求中完成多个工作表的表头识别、关键信息识别和列名业务含义映射
+    
+    Args:
+        sheet_inputs: {工作表名: (表格内容片段, 表结构信息或None)}
+        llm_model: 大模型
+        
+    Returns:
+        {工作表名: {"header": 表头和关键信息, "column_mappings": 列名映射}}，只包含解析成功的工作表
+    """
+    sections = [
+        _format_analysis_section(i, sheet_name, content, schema)
+        for i, (sheet_name, (content, schema)) in enumerate(sheet_inputs.items(), 1)
+    ]
+    prompt = (
+        f"{load_header_prompt()}\n\n"
+        f"下面给出同一个 Excel 文件中的 {len(sheet_inputs)} 个工作表片段及其导入数据库后的列名，请对每个工作表一次完成两项分析：\n"
+        "1. 按上述要求识别表头和关键信息；\n"
+        "2. 根据列名和数据内容推断每个数据库列的业务含义（简洁明确的中文业务概念，如：产品名称、品牌、价格、规格等）。\n\n"
+        + "\n\n".join(sections)
+        + "\n\n请严格只输出一个JSON对象，键为工作表名（与上面给出的完全一致），值包含三个字段："
+          '"header"（表头，列名之间用" | "分隔）、"key_info"（关键信息列表）、'
+          '"column_mappings"（{"数据库列名": "业务概念"}，未给出数据库列名的工作表输出空对象），例如：'
+          '{"Sheet1": {"header": "产品名称 | 价格", "key_info": ["苹果", "香蕉"], '
+          '"column_mappings": {"Unnamed: 0": "产品名称", "Unnamed: 1": "价格"}}}'
+    )
+    
+    messages = [HumanMessage(content=prompt)]
+    try:
+        response = await llm_model.ainvoke(messages)
+        result = extract_json_object(response.content if hasattr(response, 'content') else str(response))
+    except Exception as e:
+        print(f"⚠️ 工作表合并分析失败: {e}")
+        discard_cached_response(llm_model, messages)
+        return {}
+    if not isinstance(result, dict):
+        discard_cached_response(llm_model, messages)
+        return {}
+    
+    analyses = {}
+    for sheet_name, analysis in result.items():
+        if sheet_name not in sheet_inputs or not isinstance(analysis, dict):
+            continue
+        header = str(analysis.get("header") or "").strip()
+        if not header:
+            continue
+        key_info = analysis.get("key_info") or []
+        if isinstance(key_info, str):
+            key_info = [key_info]
+        schema = sheet_inputs[sheet_name][1]
+        mappings = analysis.get("column_mappings")
+        column_mappings = {}
+        if schema is not None and isinstance(mappings, dict):
+            # 只保留真实存在的列，避免模型串表
+            columns = set(schema.columns)
+            column_mappings = {str(col): str(meaning) for col, meaning in mappings.items() if str(col) in columns}
+        analyses[sheet_name] = {
+            "header": format_header_text(header, [str(v) for v in key_info]),
+            "column_mappings": column_mappings
+        }
+    if len(analyses) < len(sheet_inputs):
+        # 响应不完整，不缓存，避免重试时重放
+        discard_cached_response(llm_model, messages)
+    return analyses
+
+async def analyze_sheets_concurrently(excel_path: str, sheet_names: List[str], llm_model, max_workers: int = 3) -> Dict[str, str]:
+    """
+    工作表分析阶段：一次大模型请求同时得到表头、关键信息和列名映射，分别写入表头缓存和列名映射注册表
+    
+    命中缓存或启发式识别的工作表不调用大模型，其列名映射仍由列名映射生成器负责；
+    合并分析未解析出的工作表回退到单独的表头识别。
+    
+    Args:
+        excel_path: Excel文件路径
+        sheet_names: 工作表名列表
+        llm_model: 大模型
+        max_workers: 最大并发请求数
+        
+    Returns:
+        {工作表名: 表头和关键信息}
+    """
+    results, sheet_contents = _prepare_sheet_contents(excel_path, sheet_names)
+    if not sheet_contents:
+        return results
+    
+    from column_mapping_generator import get_column_mapping_generator
+    # 本阶段自行保存映射，首次创建生成器时不启动缺失映射的后台生成，避免与本阶段重复调用大模型
+    generator = get_column_mapping_generator(check_on_init=False)
+    catalog = get_schema_catalog()
+    excel_name = os.path.basename(excel_path)
+    sheet_inputs = {
+        sheet_name: (content, catalog.get_table_schema(excel_name, sheet_name))
+        for sheet_name, content in sheet_contents.items()
+    }
+    
+    batches = pack_batches(
+        [(name, _format_analysis_section(0, name, content, schema)) for name, (content, schema) in sheet_inputs.items()],
+        estimate_tokens(load_header_prompt())
+    )
+    semaphore = asyncio.Semaphore(max_workers)
+    
+    async def process_batch(batch):
+        async with semaphore:
+            analyses = await analyze_sheets_batched({name: sheet_inputs[name] for name in batch}, llm_model)
+            headers = {}
+            for sheet_name in batch:
+                analysis = analyses.get(sheet_name)
+                if analysis is None:
+                    print(f"🔁 工作表 {sheet_name} 未从合并分析结果中解析，回退到单独的表头识别")
+                    header = await identify_header(excel_path, sheet_name, llm_model, sheet_contents[sheet_name])
+                    if header:
+                        headers[sheet_name] = header
+                    continue
+                headers[sheet_name] = analysis["header"]
+                schema = sheet_inputs[sheet_name][1]
+                if schema is not None and analysis["column_mappings"]:
+                    generator.save_mapping_for_table(schema.table_name, analysis["column_mappings"])
+            for sheet_name, header in headers.items():
+                header_cache_manager.cache_header_analysis(excel_path, sheet_name, str(header))
+            return headers
+    
+    completed_batches = await asyncio.gather(*(process_batch(batch) for batch in batches), return_exceptions=True)
+    for result in completed_batches:
+        if isinstance(result, Exception):
+            print(f"⚠️ 工作表分析批次失败: {result}")
+            continue
+        results.update(result)
     
     return results
 
@@ -387,12 +792,25 @@ def get_file_modification_time(file_path: str) -> float:
     except OSError:
         return 0.0
 
-def save_vector_db_metadata(vector_db_dir: str, excel_files_info: Dict[str, float]):
+def get_file_fingerprint(file_path: str) -> str:
+    """获取文件内容指纹（仅在文件大小、修改时间或inode变化时重新计算哈希）"""
+    try:
+        return get_file_hash(file_path)
+    except OSError:
+        return ""
+
+def make_sheet_doc_id(excel_name: str, sheet_name: str) -> str:
+    """生成 (excel_name, sheet_name) 对应的稳定向量文档ID"""
+    return hashlib.md5(f"{excel_name}\x00{sheet_name}".encode("utf-8")).hexdigest()
+
+def save_vector_db_metadata(vector_db_dir: str, excel_files_info: Dict[str, str],
+                            sheet_doc_ids: Optional[Dict[str, List[str]]] = None):
     """保存向量数据库的元数据信息"""
     metadata_path = os.path.join(vector_db_dir, "vector_db_metadata.json")
     metadata = {
         "last_update": time.time(),
-        "excel_files": excel_files_info
+        "excel_files": excel_files_info,
+        "sheet_doc_ids": sheet_doc_ids or {}
     }
     with open(metadata_path, 'w', encoding='utf-8') as f:
         json.dump(metadata, f, ensure_ascii=False, indent=2)
@@ -408,63 +826,106 @@ def load_vector_db_metadata(vector_db_dir: str) -> Dict[str, Any]:
             return {}
     return {}
 
-def check_excel_files_changes(excel_dir: str, existing_metadata: Dict[str, Any]) -> Tuple[bool, Dict[str, float]]:
-    """检查Excel文件是否有变化（新增、修改或删除）"""
+def diff_excel_files(excel_dir: str, existing_metadata: Dict[str, Any]) -> Tuple[List[str], List[str], List[str], Dict[str, str]]:
+    """
+    对比目录中的Excel文件与元数据记录
+
+    Returns:
+        (新增文件列表, 修改文件列表, 删除文件列表, 当前文件信息 {文件名: 内容指纹})
+    """
     current_files = {}
-    
-    # 获取当前所有Excel文件的信息
     if os.path.exists(excel_dir):
         for filename in os.listdir(excel_dir):
             if filename.endswith(('.xlsx', '.xls')):
                 file_path = os.path.join(excel_dir, filename)
-                current_files[filename] = get_file_modification_time(file_path)
-    
-    # 获取之前记录的文件信息
+                current_files[filename] = get_file_fingerprint(file_path)
+
     previous_files = existing_metadata.get('excel_files', {})
-    
-    # 检查是否有变化
-    has_changes = False
-    
-    # 检查新增或修改的文件
-    for filename, mod_time in current_files.items():
-        if filename not in previous_files or previous_files[filename] != mod_time:
-            has_changes = True
-            print(f"检测到文件变化: {filename}")
-            break
-    
-    # 检查删除的文件
-    if not has_changes:
-        for filename in previous_files:
-            if filename not in current_files:
-                has_changes = True
-                print(f"检测到文件删除: {filename}")
-                break
-    
-    return has_changes, current_files
+
+    added = [f for f in current_files if f not in previous_files]
+    modified = [f for f in current_files if f in previous_files and previous_files[f] != current_files[f]]
+    deleted = [f for f in previous_files if f not in current_files]
+
+    return added, modified, deleted, current_files
+
+def check_excel_files_changes(excel_dir: str, existing_metadata: Dict[str, Any]) -> Tuple[bool, Dict[str, str]]:
+    """检查Excel文件是否有变化（新增、修改或删除）"""
+    added, modified, deleted, current_files = diff_excel_files(excel_dir, existing_metadata)
+
+    for filename in added + modified:
+        print(f"检测到文件变化: {filename}")
+    for filename in deleted:
+        print(f"检测到文件删除: {filename}")
+
+    return bool(added or modified or deleted), current_files
+
+async def build_sheet_documents(excel_path: str, llm_model) -> Tuple[List[Document], List[str]]:
+    """
+    为单个Excel文件的所有Sheet生成向量文档
+
+    Args:
+        excel_path: Excel文件路径
+        llm_model: 用于表头识别的大模型
+
+    Returns:
+        (文档列表, 对应的稳定文档ID列表)
+    """
+    excel_name = os.path.basename(excel_path)
+    sheet_names = get_parsed_sheet_store().get_sheet_names(excel_path)
+    if sheet_names is None:
+        with pd.ExcelFile(excel_path) as excel_file:
+            sheet_names = excel_file.sheet_names
+
+    # 表头识别与列名映射合并为一次分析
+    headers_results = await analyze_sheets_concurrently(excel_path, sheet_names, llm_model)
+
+    documents = []
+    doc_ids = []
+    for sheet_name in sheet_names:
+        header = headers_results.get(sheet_name)
+        if header:
+            sheet_header_mapping = f"Sheet名称: {sheet_name}, 表头: {header}"
+            text_to_embed = f"{excel_name}-{sheet_header_mapping}"
+
+            documents.append(Document(
+                page_content=text_to_embed,
+                metadata={
+                    "excel_name": excel_name,
+                    "sheet_name": sheet_name,
+                    "header": header,
+                    "mapping_text": sheet_header_mapping
+                }
+            ))
+            doc_ids.append(make_sheet_doc_id(excel_name, sheet_name))
+
+    return documents, doc_ids
+
+def _ensure_non_empty(vectorstore, embedding_model):
+    """保证向量数据库至少包含一个占位文档（FAISS 不支持从空文档集创建）"""
+    if vectorstore is None:
+        return FAISS.from_documents([Document(page_content="dummy", metadata={})], embedding_model, ids=[DUMMY_DOC_ID])
+    if not vectorstore.index_to_docstore_id:
+        vectorstore.add_documents([Document(page_content="dummy", metadata={})], ids=[DUMMY_DOC_ID])
+    return vectorstore
 
 async def create_and_store_vectors(excel_dir: str, llm_model, embedding_model, force_recreate: bool = False):
-    """创建和存储向量数据库（集成了加载和创建功能，支持增量更新）"""
-    # 修改全局配置
-    VECTOR_DB_DIR = "Faiss"
-    FAISS_INDEX_PATH = os.path.join(VECTOR_DB_DIR, "faiss_index.faiss")
-    FAISS_INDEX_PKL_PATH = os.path.join(VECTOR_DB_DIR, "faiss_index.pkl")
-    
+    """
+    创建和存储向量数据库（集成了加载和创建功能，支持增量更新）
+
+    每个 (excel_name, sheet_name) 对应一个稳定的文档ID，新增、修改或删除某个工作簿时
+    只增删该工作簿的向量，无需重新识别和嵌入其他文件。
+    """
     os.makedirs(VECTOR_DB_DIR, exist_ok=True)
-    
-    # 加载现有的元数据
+
+    # 加载现有的元数据并对比文件变化
     existing_metadata = load_vector_db_metadata(VECTOR_DB_DIR)
-    
-    # 检查Excel文件是否有变化
-    has_changes, current_files_info = check_excel_files_changes(excel_dir, existing_metadata)
-    
-    # 如果不强制重新创建且向量数据库存在且没有文件变化，则直接加载
-    if (not force_recreate and 
-        os.path.exists(FAISS_INDEX_PATH) and 
-        os.path.exists(FAISS_INDEX_PKL_PATH) and 
-        not has_changes):
+    added, modified, deleted, current_files_info = diff_excel_files(excel_dir, existing_metadata)
+
+    vectorstore = None
+    index_exists = os.path.exists(FAISS_INDEX_PATH) and os.path.exists(FAISS_INDEX_PKL_PATH)
+    if not force_recreate and index_exists:
         try:
-            print("向量数据库已存在且Excel文件无变化，直接加载现有数据库")
-            return FAISS.load_local(VECTOR_DB_DIR, embedding_model, index_name="faiss_index", allow_dangerous_deserialization=True)
+            vectorstore = FAISS.load_local(VECTOR_DB_DIR, embedding_model, index_name=FAISS_INDEX_NAME, allow_dangerous_deserialization=True)
         except Exception as e:
             print(f"加载现有向量数据库失败: {e}，将重新创建")
             try:
@@ -474,85 +935,192 @@ async def create_and_store_vectors(excel_dir: str, llm_model, embedding_model, f
                     os.remove(FAISS_INDEX_PKL_PATH)
             except Exception:
                 pass
-    
-    # 检查是否需要重新创建向量数据库
-    need_recreate = (
-        has_changes or 
-        force_recreate or 
-        not os.path.exists(FAISS_INDEX_PATH) or 
-        not os.path.exists(FAISS_INDEX_PKL_PATH)
-    )
-    
-    if need_recreate:
-        if has_changes:
-            print("检测到Excel文件变化，正在更新向量数据库...")
-        elif force_recreate:
+
+    # 旧版本元数据没有文档ID记录，无法做增量维护，需要全量重建一次
+    if vectorstore is not None and "sheet_doc_ids" not in existing_metadata:
+        print("向量数据库元数据缺少文档ID记录，将全量重建")
+        vectorstore = None
+
+    if vectorstore is not None and not (added or modified or deleted):
+        print("向量数据库已存在且Excel文件无变化，直接加载现有数据库")
+        return vectorstore
+
+    if vectorstore is None:
+        if force_recreate:
             print("强制重新创建向量数据库...")
         else:
             print("向量数据库文件不存在，正在创建向量数据库...")
+        sheet_doc_ids = {}
+        files_to_index = list(current_files_info.keys())
+        stale_ids = []
     else:
-        # 如果不需要重新创建，直接返回None（这种情况不应该发生，因为前面已经处理了加载逻辑）
-        print("向量数据库无需重新创建")
-        return None
-    
-    # 创建新的向量数据库
-    all_documents = []
-    
-    # 处理目录中的所有Excel文件
-    for filename in os.listdir(excel_dir):
-        if filename.endswith(('.xlsx', '.xls')):
-            excel_path = os.path.join(excel_dir, filename)
-            print(f"处理Excel文件: {excel_path}")
-            
-            try:
-                excel_file = pd.ExcelFile(excel_path)
-                sheet_names = excel_file.sheet_names
-                
-                # 并发处理表头识别
-                headers_results = await identify_headers_concurrently(excel_path, sheet_names, llm_model)
-                
-                for sheet_name in sheet_names:
-                    header = headers_results.get(sheet_name)
-                    if header:
-                        sheet_header_mapping = f"Sheet名称: {sheet_name}, 表头: {header}"
-                        text_to_embed = f"{os.path.basename(excel_path)}-{sheet_header_mapping}"
-                        
-                        doc = Document(
-                            page_content=text_to_embed,
-                            metadata={
-                                "excel_name": os.path.basename(excel_path),
-                                "sheet_name": sheet_name,
-                                "header": header,
-                                "mapping_text": sheet_header_mapping
-                            }
-                        )
-                        all_documents.append(doc)
-                        
-            except Exception as e:
-                print(f"处理文件 {excel_path} 时出错: {e}")
-                continue
-    
-    # 创建向量数据库
-    if all_documents:
-        vectorstore = FAISS.from_documents(all_documents, embedding_model)
-        vectorstore.save_local(VECTOR_DB_DIR, index_name="faiss_index")
-        print(f"成功创建向量数据库，包含 {len(all_documents)} 个文档")
-        
-        # 保存元数据信息
-        save_vector_db_metadata(VECTOR_DB_DIR, current_files_info)
-        print("已保存向量数据库元数据信息")
-        
-        return vectorstore
+        print(f"检测到Excel文件变化，增量更新向量数据库: 新增{len(added)}个，修改{len(modified)}个，删除{len(deleted)}个")
+        sheet_doc_ids = dict(existing_metadata.get("sheet_doc_ids", {}))
+        files_to_index = added + modified
+        stale_ids = []
+        for filename in modified + deleted:
+            stale_ids.extend(sheet_doc_ids.pop(filename, []))
+
+    # 只为新增/修改的文件识别表头并生成文档
+    new_documents = []
+    new_ids = []
+    for filename in files_to_index:
+        excel_path = os.path.join(excel_dir, filename)
+        print(f"处理Excel文件: {excel_path}")
+        try:
+            documents, doc_ids = await build_sheet_documents(excel_path, llm_model)
+            new_documents.extend(documents)
+            new_ids.extend(doc_ids)
+            sheet_doc_ids[filename] = doc_ids
+        except Exception as e:
+            print(f"处理文件 {excel_path} 时出错: {e}")
+            # 不记录失败文件，下次检查时重试
+            current_files_info.pop(filename, None)
+            continue
+
+    if vectorstore is None:
+        if new_documents:
+            vectorstore = FAISS.from_documents(new_documents, embedding_model, ids=new_ids)
+            print(f"成功创建向量数据库，包含 {len(new_documents)} 个文档")
+        else:
+            print("未找到有效文档，创建空的向量数据库")
     else:
-        print("未找到有效文档，创建空的向量数据库")
-        dummy_doc = Document(page_content="dummy", metadata={})
-        vectorstore = FAISS.from_documents([dummy_doc], embedding_model)
-        vectorstore.save_local(VECTOR_DB_DIR, index_name="faiss_index")
-        
-        # 即使是空数据库也要保存元数据
-        save_vector_db_metadata(VECTOR_DB_DIR, current_files_info)
-        
+        existing_ids = set(vectorstore.index_to_docstore_id.values())
+        ids_to_delete = [doc_id for doc_id in stale_ids if doc_id in existing_ids]
+        if new_documents and DUMMY_DOC_ID in existing_ids:
+            ids_to_delete.append(DUMMY_DOC_ID)
+        if ids_to_delete:
+            vectorstore.delete(ids_to_delete)
+        if new_documents:
+            vectorstore.add_documents(new_documents, ids=new_ids)
+        print(f"增量更新完成: 删除 {len(ids_to_delete)} 个文档，新增 {len(new_documents)} 个文档")
+
+    vectorstore = _ensure_non_empty(vectorstore, embedding_model)
+    vectorstore.save_local(VECTOR_DB_DIR, index_name=FAISS_INDEX_NAME)
+
+    # 保存元数据信息
+    save_vector_db_metadata(VECTOR_DB_DIR, current_files_info, sheet_doc_ids)
+    print("已保存向量数据库元数据信息")
+
+    return vectorstore
+
+# --- 进程级向量数据库管理器 ---
+class VectorStoreManager:
+    """
+    进程内共享的向量数据库句柄
+
+    首次使用时加载一次并常驻内存，所有图调用共享同一个实例；
+    Excel 文件变化时在后台线程重建，完成后原子替换引用，查询路径不再承担索引I/O。
+    """
+
+    def __init__(self, excel_dir: str = EXCEL_DIR, check_interval: float = None):
+        """
+        初始化向量数据库管理器
+
+        Args:
+            excel_dir: Excel文件目录
+            check_interval: 后台检查Excel变化的最小间隔（秒）
+        """
+        self.excel_dir = excel_dir
+        if check_interval is None:
+            check_interval = float(os.getenv("VECTOR_REFRESH_INTERVAL", 30))
+        self.check_interval = check_interval
+        self.auto_refresh = True  # 由后台接入服务驱动刷新时关闭
+        self._vectorstore = None
+        self._load_lock = threading.Lock()  # 保证只加载一次
+        self._refresh_lock = threading.Lock()  # 同一时间只允许一个后台刷新
+        self._last_check = time.time()
+
+    def _build(self, force_recreate: bool = False):
+        """在当前线程的独立事件循环中加载或重建向量数据库"""
+        return asyncio.run(create_and_store_vectors(
+            self.excel_dir,
+            model_manager.get_llm(STAGE_HEADER),
+            model_manager.get_embedding_model(),
+            force_recreate=force_recreate
+        ))
+
+    def _load_blocking(self):
+        """阻塞式首次加载（双重检查）"""
+        with self._load_lock:
+            if self._vectorstore is None:
+                self._vectorstore = self._build()
+                self._last_check = time.time()
+            return self._vectorstore
+
+    async def get_vectorstore(self):
+        """
+        获取共享的向量数据库实例
+
+        Returns:
+            FAISS 向量数据库实例
+        """
+        vectorstore = self._vectorstore
+        if vectorstore is None:
+            vectorstore = await asyncio.to_thread(self._load_blocking)
+        else:
+            self.maybe_refresh()
         return vectorstore
+
+    def set_vectorstore(self, vectorstore):
+        """直接设置向量数据库实例（用于服务启动时的预加载）"""
+        if vectorstore is not None:
+            self._vectorstore = vectorstore
+            self._last_check = time.time()
+
+    def maybe_refresh(self) -> bool:
+        """
+        超过检查间隔时，在后台线程检查Excel变化并按需重建
+
+        Returns:
+            是否启动了后台检查
+        """
+        if not self.auto_refresh or time.time() - self._last_check < self.check_interval:
+            return False
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        self._last_check = time.time()
+
+        thread = threading.Thread(target=self._refresh_worker, name="vectorstore-refresh", daemon=True)
+        thread.start()
+        return True
+
+    def refresh(self, force_recreate: bool = False):
+        """
+        阻塞式刷新向量数据库并替换当前实例
+
+        Args:
+            force_recreate: 是否强制重新创建
+
+        Returns:
+            刷新后的向量数据库实例
+        """
+        with self._refresh_lock:
+            return self._swap(self._build(force_recreate=force_recreate))
+
+    def _refresh_worker(self):
+        """后台刷新线程：仅在Excel文件变化时重建"""
+        try:
+            metadata = load_vector_db_metadata(VECTOR_DB_DIR)
+            has_changes, _ = check_excel_files_changes(self.excel_dir, metadata)
+            if has_changes:
+                print("🔄 [VECTOR] 检测到Excel文件变化，后台重建向量数据库...")
+                self._swap(self._build())
+        except Exception as e:
+            print(f"⚠️ [VECTOR] 后台刷新向量数据库失败: {e}")
+        finally:
+            self._refresh_lock.release()
+
+    def _swap(self, vectorstore):
+        """原子替换向量数据库引用，正在执行的查询继续使用旧实例"""
+        if vectorstore is not None:
+            self._vectorstore = vectorstore
+            print("✅ [VECTOR] 向量数据库已切换到最新版本")
+        return self._vectorstore
+
+# 全局向量数据库管理器实例
+vector_store_manager = VectorStoreManager()
+
 # ============================================================================
 # --- LangGraph 工作流部分 ---
 # ============================================================================
@@ -567,12 +1135,23 @@ class GraphState(TypedDict):
     db_path: str
     table_mapping: Dict[str, str]
     vectorstore: FAISS
+    data_version: int
     relevant_sheets: List[Tuple[str, str]]
     reranked_sheets: List[Tuple[str, str]]
     sql_query: str
+    sql_cache_hit: bool
+    early_exit: bool
     db_results: Any
     response: str
 
+def lookup_sql_cache(state: GraphState):
+    """查询问题 → SQL 精确缓存，命中时跳过检索、重排序和SQL生成"""
+    entry = get_sql_query_cache().get(state['query'])
+    if entry is None:
+        return {"sql_cache_hit": False}
+    print(f"⚡ [SQL缓存] 命中，直接执行缓存的SQL (表: {entry['sheets']})")
+    return {"sql_cache_hit": True, "sql_query": entry["sql_query"], "reranked_sheets": entry["sheets"]}
+
 def get_relevant_sheets(state: GraphState):
     """从向量数据库中检索与查询最相关的Excel Sheets"""
     query = state['query']
@@ -661,105 +1240,42 @@ def rerank_sheets(state: GraphState):
     return {"reranked_sheets": state['reranked_sheets']}
 
 async def generate_sql(state: GraphState):
-    """根据重排序的sheets和用户问题生成SQL查询（支持方案1和方案2，包含列名业务含义映射）"""
+    """根据重排序的sheets和用户问题生成SQL查询（表结构和列名业务含义映射取自内存结构目录）"""
     query = state['query']
     reranked_sheets = state['reranked_sheets']
-    llm = model_manager.get_llm()
+    llm = model_manager.get_llm(STAGE_SQL)
     
-    # 导入database_manager并获取实例
-    from database_manager import DatabaseManager
-    db_manager = DatabaseManager()
+    # 表结构和列名映射均来自内存中的结构目录，接入或映射变化时由写入方失效
+    catalog = get_schema_catalog()
     
     schema_info = []
     table_names = []
+    used_sheets = []
     column_mappings_text = ""
     
-    # 方案1：尝试使用增强映射（如果存在的话）
-    try:
-        enhanced_mapping = db_manager.get_enhanced_table_mapping()
-        print(f"\n🔧 [SQL DEBUG] 获取到增强映射: {len(enhanced_mapping)} 条记录")
-    except AttributeError:
-        enhanced_mapping = {}
-        print(f"\n🔧 [SQL DEBUG] 增强映射方法不存在，使用方案2")
-    
-    # 读取映射注册表
-    mapping_registry_path = os.path.join("column_mapping_docs", "mapping_registry.json")
-    mapping_registry = {}
-    try:
-        with open(mapping_registry_path, 'r', encoding='utf-8') as f:
-            mapping_registry = json.load(f)
-        print(f"📋 [SQL DEBUG] 成功加载映射注册表，包含 {len(mapping_registry)} 个表的映射配置")
-    except Exception as e:
-        print(f"⚠️ [SQL DEBUG] 加载映射注册表失败: {e}")
-    
     # 遍历重排序的sheets
     for excel_name, sheet_name in reranked_sheets:
-        print(f"\n🔍 [SQL DEBUG] 处理 Excel: {excel_name}, Sheet: {sheet_name}")
-        
-        table_name = None
-        
-        # 方案1：优先使用增强映射
-        if (excel_name, sheet_name) in enhanced_mapping:
-            table_name = enhanced_mapping[(excel_name, sheet_name)]
-            print(f"✅ [SQL DEBUG] 方案1成功: ({excel_name}, {sheet_name}) -> {table_name}")
-        else:
-            # 方案2：回退到动态获取映射
-            print(f"🔄 [SQL DEBUG] 方案1未找到，使用方案2动态获取")
-            try:
-                excel_path = os.path.join("uploads", excel_name)
-                file_table_mapping = db_manager.get_table_mapping(excel_path)
-                print(f"📋 [SQL DEBUG] 动态获取的表映射: {file_table_mapping}")
-                
-                if sheet_name in file_table_mapping:
-                    table_name = file_table_mapping[sheet_name]
-                    print(f"✅ [SQL DEBUG] 方案2成功: {sheet_name} -> {table_name}")
-                else:
-                    print(f"❌ [SQL DEBUG] 方案2失败: {sheet_name} 不在 {list(file_table_mapping.keys())}")
-            except Exception as e:
-                print(f"❌ [SQL DEBUG] 方案2异常: {e}")
+        table_schema = catalog.get_table_schema(excel_name, sheet_name)
+        if table_schema is None:
+            print(f"⚠️ [SQL映射] 未找到映射: {excel_name}-{sheet_name}")
+            continue
         
-        if table_name:
-            table_names.append(table_name)
-            
-            try:
-                conn = sqlite3.connect(db_manager.db_path)
-                cursor = conn.cursor()
-                cursor.execute(f"PRAGMA table_info({table_name})")
-                columns = cursor.fetchall()
-                conn.close()
-                
-                column_names = [col[1] for col in columns]
-                column_names_display = ', '.join(column_names)
-                schema_info.append(f"表名: {table_name} (来源: {excel_name}-{sheet_name}), 列名: {column_names_display}")
-                
-                # 获取列名业务含义映射
-                if table_name in mapping_registry:
-                    config_path = mapping_registry[table_name]['config_path']
-                    full_config_path = os.path.join("column_mapping_docs", os.path.basename(config_path))
-                    
-                    try:
-                        with open(full_config_path, 'r', encoding='utf-8') as f:
-                            column_config = json.load(f)
-                        
-                        column_mappings = column_config.get('column_mappings', {})
-                        if column_mappings:
-                            column_mappings_text += f"\n\n表 {table_name} 的列名业务含义映射:\n"
-                            for db_col, business_meaning in column_mappings.items():
-                                column_mappings_text += f"  - {db_col} → {business_meaning}\n"
-                            print(f"📋 [SQL DEBUG] 成功加载表 {table_name} 的列名映射配置")
-                        else:
-                            print(f"⚠️ [SQL DEBUG] 表 {table_name} 的映射配置为空")
-                            
-                    except Exception as e:
-                        print(f"⚠️ [SQL DEBUG] 加载表 {table_name} 的列名映射配置失败: {e}")
-                else:
-                    print(f"⚠️ [SQL DEBUG] 未找到表 {table_name} 的列名映射配置")
-                
-                print(f"✅ [SQL映射] 成功映射: {excel_name}-{sheet_name} -> {table_name}")
-            except Exception as e:
-                print(f"❌ [SQL映射] 获取表结构失败 {table_name}: {e}")
+        table_names.append(table_schema.table_name)
+        used_sheets.append((excel_name, sheet_name))
+        schema_info.append(table_schema.schema_fragment)
+        if table_schema.mapping_fragment:
+            column_mappings_text += table_schema.mapping_fragment
         else:
-            print(f"⚠️ [SQL映射] 未找到映射: {excel_name}-{sheet_name}")
+            print(f"⚠️ [SQL DEBUG] 未找到表 {table_schema.table_name} 的列名映射配置")
+        print(f"✅ [SQL映射] 成功映射: {excel_name}-{sheet_name} -> {table_schema.table_name}")
+    
+    # 结构相同、只是实体不同的问题直接套用参数化模板，无需调用大模型
+    reader = get_connection_pool(state['db_path']).get_query_reader()
+    sql_query = get_sql_template_cache().get(query, used_sheets, reader)
+    if sql_query is not None:
+        print(f"⚡ [SQL模板] 命中参数化模板，跳过大模型: {sql_query}")
+        get_sql_query_cache().put(query, sql_query, used_sheets)
+        return {"sql_query": sql_query}
     
     schema_text = "\n".join(schema_info)
     
@@ -816,17 +1332,139 @@ async def generate_sql(state: GraphState):
     print(f"🎯 [SQL DEBUG] 查询目标表: {', '.join(table_names)}")
     print(f"🔗 [SQL DEBUG] 列名映射信息: {column_mappings_text}")
     
+    get_sql_query_cache().put(query, sql_query, used_sheets)
+    get_sql_template_cache().put(query, sql_query, used_sheets)
     return {"sql_query": sql_query}
 
+def _fetch_rows(cursor: sqlite3.Cursor, max_rows: int = SQL_MAX_ROWS) -> Tuple[List[tuple], bool, int, bool]:
+    """
+    分批读取查询结果，最多保留 max_rows 行；超出部分只计数不保留（计数也有上限）
+    
+    Args:
+        cursor: 已执行查询的游标
+        max_rows: 保留的最大行数
+        
+    Returns:
+        (保留的行, 是否截断, 总行数估计, 总行数是否精确)
+    """
+    rows: List[tuple] = []
+    while len(rows) < max_rows:
+        chunk = cursor.fetchmany(min(SQL_FETCH_BATCH_ROWS, max_rows - len(rows)))
+        if not chunk:
+            return rows, False, len(rows), True
+        rows.extend(chunk)
+    
+    total = len(rows)
+    try:
+        while total < SQL_COUNT_SCAN_LIMIT:
+            chunk = cursor.fetchmany(SQL_FETCH_BATCH_ROWS)
+            if not chunk:
+                return rows, total > len(rows), total, True
+            total += len(chunk)
+    except sqlite3.OperationalError:
+        # 计数阶段超出执行预算时保留已读取的行，总行数作为下限返回
+        pass
+    return rows, True, total, False
+
+def _json_row(row: tuple) -> tuple:
+    """将一行中 JSON 无法表示的值（BLOB）转为字符串"""
+    return tuple(v.decode("utf-8", "replace") if isinstance(v, bytes) else v for v in row)
+
+def _execute_statement(db_path: str, index: int, sql_stmt: str, guards: Dict[int, QueryGuard],
+                       stop_event: threading.Event) -> Optional[Dict[str, Any]]:
+    """
+    在当前线程的只读连接上执行单条SQL（供线程池并发调用）
+    
+    Args:
+        db_path: 数据库路径
+        index: 语句序号（从1开始）
+        sql_stmt: SQL语句
+        guards: 正在执行的语句的执行预算 {序号: QueryGuard}，提前结束时用于取消
+        stop_event: 提前结束信号，已设置时不再开始执行
+        
+    Returns:
+        单条语句的结果字典（失败时包含 error），提前结束而未执行时返回None
+    """
+    if stop_event.is_set():
+        return None
+    result_cache = get_sql_result_cache()
+    try:
+        conn = get_connection_pool(db_path).get_query_reader()
+    except Exception as e:
+        return {"sql_index": index, "sql_statement": sql_stmt, "error": str(e), "columns": [], "data": []}
+    
+    guard = QueryGuard(conn)
+    guards[index] = guard
+    # 先登记再检查：提前结束可能发生在上面的检查与登记之间，此时取消列表中还没有本语句
+    if stop_event.is_set():
+        guards.pop(index, None)
+        return None
+    try:
+        # 相同语句且所读数据表版本未变时复用上次的结果
+        cache_key = result_cache.make_key(conn, sql_stmt)
+        cached = result_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            return {**cached, "sql_index": index, "sql_statement": sql_stmt, "cache_hit": True}
+        
+        # 有全文索引的列上的 LIKE '%词%' 改写为索引查找，避免全表扫描
+        exec_stmt = rewrite_like_predicates(conn, sql_stmt)
+        if exec_stmt != sql_stmt:
+            print(f"🔎 [SQL DEBUG] 第 {index} 条SQL使用全文索引: {exec_stmt[:200]}")
+        
+        cursor = conn.cursor()
+        with guard:
+            cursor.execute(exec_stmt)
+            columns = [description[0] for description in cursor.description] if cursor.description else []
+            rows, truncated, total_rows, exact = _fetch_rows(cursor)
+        result = {
+            "sql_index": index,
+            "sql_statement": sql_stmt,
+            "columns": columns,
+            "data": [_json_row(row) for row in rows],
+            "truncated": truncated,
+            "total_rows_estimate": total_rows,
+            "total_rows_exact": exact
+        }
+        if cache_key:
+            result_cache.put(cache_key, result)
+        return result
+    except Exception as e:
+        if guard.reason == "cancelled":
+            return None
+        # 被执行预算中止的语句给出明确原因，而不是 SQLite 的 "interrupted"
+        error_message = guard.describe() if isinstance(e, sqlite3.OperationalError) and guard.reason else str(e)
+        return {"sql_index": index, "sql_statement": sql_stmt, "error": error_message, "columns": [], "data": []}
+    finally:
+        guards.pop(index, None)
+
+# 执行SQL语句的全局线程池
+_sql_executor = None
+_sql_executor_lock = threading.Lock()
+
+def _get_sql_executor() -> ThreadPoolExecutor:
+    """获取执行SQL语句的线程池单例（每个工作线程持有自己的只读连接）"""
+    global _sql_executor
+    if _sql_executor is None:
+        with _sql_executor_lock:
+            if _sql_executor is None:
+                _sql_executor = ThreadPoolExecutor(max_workers=SQL_EXECUTION_WORKERS, thread_name_prefix="sql-exec")
+    return _sql_executor
+
 def execute_sql(state: GraphState):
     """执行生成的SQL查询并返回结果
     
-    支持执行多条独立的SQL语句，每个查询结果以JSON格式独立输出
+    支持执行多条独立的SQL语句：多条语句在线程池中并发执行（每个工作线程使用自己的只读连接），
+    结果按语句顺序合并。early_exit 为真时（适用于点查），任一语句返回数据后取消其余尚未完成的语句。
+    每条语句分批读取并最多保留 SQL_MAX_ROWS 行，
+    结果为列式结构：columns 为列名，data 为按列顺序排列的数据行，truncated 表示是否截断，
+    total_rows_estimate 为总行数估计（total_rows_exact 为 False 时是下限）。
+    语句在只读连接上执行，并受 QueryGuard 的时间和虚拟机指令预算约束，超出预算的语句被中止并返回错误。
     """
     import json
     
     sql_query = state['sql_query']
     db_path = state['db_path']
+    early_exit = state.get('early_exit', SQL_EARLY_EXIT)
     
     print(f"\n⚡ [SQL DEBUG] 开始执行SQL查询")
     print(f"🗄️ [SQL DEBUG] 数据库路径: {db_path}")
@@ -837,95 +1475,86 @@ def execute_sql(state: GraphState):
     
     if not sql_statements:
         print(f"❌ [SQL DEBUG] 没有找到有效的SQL语句")
-        return {"db_results": {"query_results": []}}
+        return {"db_results": []}
     
-    print(f"🔢 [SQL DEBUG] 检测到 {len(sql_statements)} 条SQL语句")
+    print(f"🔢 [SQL DEBUG] 检测到 {len(sql_statements)} 条SQL语句"
+          + (f"，并发执行{'（命中即停）' if early_exit else ''}" if len(sql_statements) > 1 else ""))
     
-    query_results = []
+    guards: Dict[int, QueryGuard] = {}
+    stop_event = threading.Event()
+    results: Dict[int, Optional[Dict[str, Any]]] = {}
     
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        for i, sql_stmt in enumerate(sql_statements, 1):
-            print(f"\n🔍 [SQL DEBUG] 执行第 {i} 条SQL: {sql_stmt[:100]}...")
-            
-            try:
-                cursor.execute(sql_stmt)
-                results = cursor.fetchall()
-                columns = [description[0] for description in cursor.description] if cursor.description else []
-                
-                print(f"✅ [SQL DEBUG] 第 {i} 条SQL执行成功")
-                print(f"📊 [SQL DEBUG] 返回列数: {len(columns)}")
-                print(f"📈 [SQL DEBUG] 返回行数: {len(results)}")
-                
-                if columns:
-                    print(f"🏷️ [SQL DEBUG] 列名: {', '.join(columns)}")
-                
-                # 构建当前查询的JSON结果
-                current_query_result = {
-                    "sql_index": i,
-                    "sql_statement": sql_stmt,
-                    "columns": columns,
-                    "data": []
-                }
-                
-                if results:
-                    # 将每行结果转换为JSON格式
-                    for row in results:
-                        row_dict = {}
-                        for j, value in enumerate(row):
-                            if j < len(columns):
-                                row_dict[columns[j]] = str(value) if value is not None else None
-                        current_query_result["data"].append(row_dict)
-                    
-                    # 显示查询结果预览
-                    if len(results) <= 3:
-                        print(f"📋 [SQL DEBUG] 第 {i} 条查询结果:")
-                        for j, row_dict in enumerate(current_query_result["data"]):
-                            print(f"   行{j+1}: {json.dumps(row_dict, ensure_ascii=False)}")
-                    else:
-                        print(f"📋 [SQL DEBUG] 第 {i} 条查询结果（前3行）:")
-                        for j, row_dict in enumerate(current_query_result["data"][:3]):
-                            print(f"   行{j+1}: {json.dumps(row_dict, ensure_ascii=False)}")
-                else:
-                    print(f"📋 [SQL DEBUG] 第 {i} 条SQL无查询结果")
-                
-                # 添加到总结果中
-                query_results.append(current_query_result)
-                    
-            except Exception as e:
-                print(f"❌ [SQL DEBUG] 第 {i} 条SQL执行失败: {str(e)}")
-                # 即使失败也添加错误信息到结果中
-                error_result = {
-                    "sql_index": i,
-                    "sql_statement": sql_stmt,
-                    "error": str(e),
-                    "columns": [],
-                    "data": []
-                }
-                query_results.append(error_result)
+    if len(sql_statements) == 1:
+        results[1] = _execute_statement(db_path, 1, sql_statements[0], guards, stop_event)
+    else:
+        executor = _get_sql_executor()
+        futures = {
+            executor.submit(_execute_statement, db_path, i, sql_stmt, guards, stop_event): i
+            for i, sql_stmt in enumerate(sql_statements, 1)
+        }
+        for future in as_completed(futures):
+            if future.cancelled():
                 continue
+            index = futures[future]
+            results[index] = future.result()
+            if early_exit and not stop_event.is_set() and results[index] and results[index]["data"]:
+                # 点查已找到数据：未开始的语句不再执行，正在执行的语句立即中断
+                stop_event.set()
+                for pending in futures:
+                    pending.cancel()
+                for guard in list(guards.values()):
+                    guard.cancel()
+                print(f"⏹️ [SQL DEBUG] 第 {index} 条SQL已返回数据，取消其余语句")
+    
+    # 按语句顺序合并结果
+    query_results = []
+    for i, sql_stmt in enumerate(sql_statements, 1):
+        current_query_result = results.get(i)
+        if current_query_result is None:
+            print(f"\n⏭️ [SQL DEBUG] 第 {i} 条SQL已取消: {sql_stmt[:100]}...")
+            continue
         
-        conn.close()
-        
-        print(f"\n🎯 [SQL DEBUG] 所有SQL执行完成")
-        print(f"📊 [SQL DEBUG] 总查询数: {len(query_results)}")
+        print(f"\n🔍 [SQL DEBUG] 第 {i} 条SQL: {sql_stmt[:100]}...")
+        if "error" in current_query_result:
+            print(f"❌ [SQL DEBUG] 第 {i} 条SQL执行失败: {current_query_result['error']}")
+            query_results.append(current_query_result)
+            continue
         
-        # 统计总结果数
-        total_data_count = sum(len(result["data"]) for result in query_results)
-        print(f"📈 [SQL DEBUG] 总数据行数: {total_data_count}")
+        if current_query_result.pop("cache_hit", False):
+            print(f"⚡ [SQL结果缓存] 第 {i} 条SQL命中缓存")
+        columns = current_query_result["columns"]
+        data = current_query_result["data"]
+        print(f"✅ [SQL DEBUG] 第 {i} 条SQL执行成功")
+        print(f"📊 [SQL DEBUG] 返回列数: {len(columns)}")
+        print(f"📈 [SQL DEBUG] 返回行数: {len(data)}"
+              + (f"（已截断，总行数约 {current_query_result['total_rows_estimate']}"
+                 f"{'' if current_query_result['total_rows_exact'] else '+'}）" if current_query_result["truncated"] else ""))
         
-        # 输出最终的JSON格式结果
-        final_result = {"db_results": query_results}
-        print(f"\n📋 [SQL DEBUG] 最终JSON结果:")
-        print(json.dumps(final_result, ensure_ascii=False, indent=2))
+        if columns:
+            print(f"🏷️ [SQL DEBUG] 列名: {', '.join(columns)}")
         
-        return final_result
+        # 显示查询结果预览
+        if data:
+            print(f"📋 [SQL DEBUG] 第 {i} 条查询结果（前{min(3, len(data))}行）:")
+            for j, row in enumerate(data[:3]):
+                print(f"   行{j+1}: {json.dumps(row, ensure_ascii=False, default=str)}")
+        else:
+            print(f"📋 [SQL DEBUG] 第 {i} 条SQL无查询结果")
         
-    except Exception as e:
-        print(f"❌ [SQL DEBUG] 数据库连接失败: {str(e)}")
-        return {"db_results": {"error": str(e), "query_results": []}}
+        query_results.append(current_query_result)
+    
+    print(f"\n🎯 [SQL DEBUG] 所有SQL执行完成")
+    print(f"📊 [SQL DEBUG] 总查询数: {len(query_results)}")
+    
+    # 所有语句都执行失败时不再复用这条SQL
+    if query_results and all("error" in result for result in query_results):
+        get_sql_query_cache().discard(state['query'])
+    
+    # 统计总结果数
+    total_data_count = sum(len(result["data"]) for result in query_results)
+    print(f"📈 [SQL DEBUG] 总数据行数: {total_data_count}")
+    
+    return {"db_results": query_results}
 
 async def generate_answer(state: GraphState):
     """根据查询结果生成最终的自然语言答案
@@ -936,7 +1565,7 @@ async def generate_answer(state: GraphState):
     
     query = state['query']
     db_results = state['db_results']
-    llm = model_manager.get_llm()
+    llm = model_manager.get_llm(STAGE_ANSWER)
     
     print(f"\n📋 [DEBUG] 开始生成答案")
     print(f"🔍 [DEBUG] 查询问题: {query}")
@@ -952,9 +1581,10 @@ async def generate_answer(state: GraphState):
 
 用户问题：{query}
 
-查询结果{db_results}
+查询结果{json.dumps(db_results, ensure_ascii=False, default=str)}
 
-该查询结果是一个严格json文档，键"data"对应的值为准确答案，部分键"data"中的值为空，不用理会。
+该查询结果是一个严格json文档，每个查询结果中键"columns"为列名，键"data"为按列顺序排列的数据行，是准确答案，部分键"data"中的值为空，不用理会。
+"truncated"为true时表示结果行数过多已截断，"total_rows_estimate"为总行数估计。
 请根据查询结果，用自然语言回答用户的问题。如果有多个查询结果，请综合所有结果进行回答："""
             
         print(f"🤖 [DEBUG] 调用LLM生成答案")
@@ -967,13 +1597,20 @@ async def generate_answer(state: GraphState):
 # 构建LangGraph
 builder = StateGraph(GraphState)
 
+builder.add_node("lookup_sql_cache", lookup_sql_cache)
 builder.add_node("get_relevant", get_relevant_sheets)
 builder.add_node("rerank", rerank_sheets)
 builder.add_node("generate_sql", generate_sql)
 builder.add_node("execute_sql", execute_sql)
 builder.add_node("generate_answer", generate_answer)
 
-builder.set_entry_point("get_relevant")
+builder.set_entry_point("lookup_sql_cache")
+
+builder.add_conditional_edges(
+    "lookup_sql_cache",
+    lambda state: "execute_sql" if state.get("sql_cache_hit") else "get_relevant",
+    {"execute_sql": "execute_sql", "get_relevant": "get_relevant"}
+)
 
 builder.add_edge("get_relevant", "rerank")
 builder.add_edge("rerank", "generate_sql")
@@ -983,26 +1620,43 @@ builder.add_edge("generate_answer", END)
 
 graph = builder.compile()
 
-async def run_flow(query: str, excel_path: str, db_path: str):
-    """优化的主流程"""
+async def run_flow(query: str, excel_path: str, db_path: str, early_exit: bool = SQL_EARLY_EXIT):
+    """优化的主流程
+    
+    early_exit 为真时（适用于点查），多条SQL中任一条返回数据后取消其余语句。
+    """
     print(f"\n🚀 [DEBUG] 开始处理查询流程")
     print(f"📝 [DEBUG] 查询内容: {query}")
     print(f"📁 [DEBUG] Excel文件: {excel_path}")
     print(f"🗄️ [DEBUG] 数据库路径: {db_path}")
     print(f"🔧 [DEBUG] run_flow函数已启动，版本: 2024-01-15")
     
-    # 1. 使用缓存的Excel到SQLite转换
-    print(f"\n⚡ [DEBUG] 步骤1: Excel到SQLite转换")
-    db_path, table_mapping = excel_to_sqlite(excel_path, db_path)
+    # 1. 读取已发布的数据（导入由后台接入服务完成，查询路径不承担接入开销）
+    print(f"\n⚡ [DEBUG] 步骤1: 读取已接入的数据")
+    data_version = get_data_version()
+    db_path, table_mapping = get_published_tables(excel_path)
     print(f"📊 [DEBUG] 表映射: {table_mapping}")
-    print(f"💾 [DEBUG] 缓存数据库路径: {db_path}")
+    print(f"💾 [DEBUG] 数据库路径: {db_path}, 数据版本: v{data_version}")
 
-    # 2. 懒加载向量数据库
-    print(f"\n🧠 [DEBUG] 步骤2: 加载模型和向量数据库")
-    llm = model_manager.get_llm()
-    embedding_model = model_manager.get_embedding_model()
-    vectorstore = await create_and_store_vectors(EXCEL_DIR, llm, embedding_model)
-    print(f"✅ [DEBUG] 模型和向量数据库加载完成")
+    # 语义缓存：相似问题且数据版本未变时直接返回缓存的答案
+    semantic_cache = get_semantic_cache()
+    query_embedding = None
+    try:
+        query_embedding = await asyncio.to_thread(semantic_cache.embed, query, model_manager.get_embedding_model())
+        cached = semantic_cache.lookup(query_embedding, data_version)
+        if cached is not None:
+            print(f"⚡ [语义缓存] 命中 (相似度 {cached['similarity']:.3f}): {cached['query']}")
+            return {**cached["response"], "query": query, "cache": {
+                "type": "semantic", "similarity": cached["similarity"], "cached_query": cached["query"]
+            }}
+        print(f"🔍 [语义缓存] 未命中 (最高相似度: {semantic_cache.last_similarity})")
+    except Exception as e:
+        print(f"⚠️ [语义缓存] 查询失败: {e}")
+
+    # 2. 获取进程内共享的向量数据库（首次调用时加载，之后常驻内存）
+    print(f"\n🧠 [DEBUG] 步骤2: 获取共享向量数据库")
+    vectorstore = await vector_store_manager.get_vectorstore()
+    print(f"✅ [DEBUG] 向量数据库就绪")
 
     # 3. 运行LangGraph
     print(f"\n🔄 [DEBUG] 步骤3: 执行LangGraph工作流")
@@ -1012,14 +1666,15 @@ async def run_flow(query: str, excel_path: str, db_path: str):
         "db_path": db_path,
         "table_mapping": table_mapping,
         "vectorstore": vectorstore,
-
+        "data_version": data_version,
+        "early_exit": early_exit,
     }
     result = await graph.ainvoke(inputs)
     print(f"🎯 [DEBUG] LangGraph执行完成")
     
     # 4. 构建MCP响应
     print(f"\n📋 [DEBUG] 步骤4: 构建MCP响应")
-    db_results = result.get('db_results', {'db_results': []})
+    db_results = result.get('db_results', [])
     
     # 检查是否有查询结果数据
     is_empty = all(not res['data'] for res in db_results)
@@ -1042,11 +1697,16 @@ async def run_flow(query: str, excel_path: str, db_path: str):
     
     mcp_response = {
         "query": result.get('query', ''),
-        "answer": final_answer
+        "answer": final_answer,
+        "data_version": data_version
     }
     
     print(f"✅ [DEBUG] MCP响应构建完成")
     
+    # 只缓存有数据的答案
+    if query_embedding is not None and not is_empty:
+        semantic_cache.store(query, query_embedding, mcp_response, data_version)
+    
     return mcp_response
 
 def format_mcp_output(mcp_response: dict) -> str:
@@ -1063,9 +1723,11 @@ def main(query: str = None):
     
     # 初始化列名映射生成器并检查映射配置
     from column_mapping_generator import get_column_mapping_generator
+    column_mapping_generator = None
     try:
         print("🔧 初始化列名映射生成器...")
-        column_mapping_generator = get_column_mapping_generator()
+        # 缺失的映射在工作表分析（查询时构建向量库）之后再生成
+        column_mapping_generator = get_column_mapping_generator(check_on_init=False)
         print("✅ 列名映射生成器初始化完成")
     except Exception as e:
         print(f"⚠️ 列名映射生成器初始化失败: {e}")
@@ -1081,6 +1743,8 @@ def main(query: str = None):
     
     excel_file = excel_files[0]
     mcp_response = asyncio.run(run_flow(query, excel_file, db_file))
+    if column_mapping_generator is not None:
+        column_mapping_generator.check_missing_mappings()
     
     return mcp_response
 
@@ -119,21 +119,46 @@ async def query_excel_data(query: str) -> Dict[str, Any]:
 
 
 
+@mcp.tool()
+async def get_cache_stats(include_entries: bool = False) -> Dict[str, Any]:
+    """
+    查看各级缓存的统计信息（用于调整语义缓存阈值等参数）
+    
+    Args:
+        include_entries: 是否列出语义缓存中每个条目的问题、数据版本和命中次数
+        
+    Returns:
+        语义缓存、SQL缓存和大模型响应缓存的统计信息
+    """
+    from NL2DB import model_manager
+    from query_cache import get_sql_query_cache, get_sql_result_cache, get_sql_template_cache
+    from semantic_cache import get_semantic_cache
+    
+    return {
+        "semantic_cache": get_semantic_cache().get_stats(include_entries),
+        "sql_query_cache": get_sql_query_cache().get_stats(),
+        "sql_template_cache": get_sql_template_cache().get_stats(),
+        "sql_result_cache": get_sql_result_cache().get_stats(),
+        "llm_response_cache": model_manager.get_llm_cache().get_stats()
+    }
+
 async def initialize_vector_database():
     """
     初始化向量数据库
     """
     try:
         print("🧠 初始化向量数据库...")
-        from NL2DB import model_manager, create_and_store_vectors
-        
+        from NL2DB import model_manager, create_and_store_vectors, vector_store_manager
+        from llm_cache import STAGE_HEADER
+
         # 获取模型实例
-        llm = model_manager.get_llm()
+        llm = model_manager.get_llm(STAGE_HEADER)
         embedding_model = model_manager.get_embedding_model()
-        
-        # 创建向量数据库
+
+        # 创建向量数据库，并交给进程级管理器常驻内存
         vectorstore = await create_and_store_vectors(EXCEL_DIR, llm, embedding_model)
-        
+        vector_store_manager.set_vectorstore(vectorstore)
+
         if vectorstore:
             print("✅ 向量数据库初始化完成")
         else:
@@ -163,11 +188,12 @@ def main():
     db_manager.check_all_files(EXCEL_DIR)
     print("✅ 数据库初始化完成")
     
-    # 初始化列名映射生成器
+    # 初始化列名映射生成器（缺失的映射在工作表分析之后再生成，避免同一工作表调用两次大模型）
     print("📝 初始化列名映射生成器...")
+    column_mapping_generator = None
     try:
         from column_mapping_generator import get_column_mapping_generator
-        column_mapping_generator = get_column_mapping_generator()
+        column_mapping_generator = get_column_mapping_generator(check_on_init=False)
         print("✅ 列名映射生成器初始化完成")
         
         # 获取映射状态
@@ -178,13 +204,27 @@ def main():
         print(f"⚠️ 列名映射生成器初始化失败: {e}")
         print("系统将继续启动，但可能影响查询准确性")
     
-    # 初始化向量数据库
+    # 初始化向量数据库（新工作表的合并分析会同时生成列名映射）
     try:
         asyncio.run(initialize_vector_database())
     except Exception as e:
         print(f"❌ 向量数据库初始化失败: {e}")
         print("系统将继续启动，但可能影响查询准确性")
     
+    # 只为工作表分析阶段未覆盖的表生成列名映射
+    if column_mapping_generator is not None:
+        column_mapping_generator.check_missing_mappings()
+        if column_mapping_generator.get_generation_progress()['running']:
+            print("⏳ 缺失的列名映射正在后台生成，服务启动不等待其完成")
+
+    # 启动阶段的导入、列名映射和表头识别均已完成，释放共享的解析结果
+    from parsed_sheet_store import get_parsed_sheet_store
+    get_parsed_sheet_store().release()
+
+    # 启动后台数据接入服务：之后上传的Excel文件在后台导入，查询路径不再做任何检查
+    from ingestion_service import get_ingestion_service
+    get_ingestion_service(EXCEL_DIR).start()
+
     # 启动服务器
     mcp.run(
         transport="sse",
@@ -1,24 +1,36 @@
-import sqlite3
 import pandas as pd
 import json
 import os
 import re
+import time
+import asyncio
 import hashlib
+import threading
 from typing import Dict, List, Any, Optional, Tuple
-from database_manager import get_database_manager
+from database_manager import get_database_manager, METADATA_TABLES
+from parsed_sheet_store import get_parsed_sheet_store
+from sqlite_bulk_loader import sqlite_type_for_dtype
+from schema_catalog import get_schema_catalog
+from fts_index import FTS_TABLE_PREFIX
+from column_profiler import is_numeric_shadow
+from llm_batching import LLM_BATCH_MAX_ITEMS, LLM_BATCH_TOKEN_BUDGET, estimate_tokens, extract_json_object, pack_batches
 from NL2DB import ModelManager
+from llm_cache import STAGE_MAPPING, discard_cached_response
 from langchain_core.messages import HumanMessage
 
 class ColumnMappingGenerator:
-    """列名映射生成器 - 生成列名与业务含义的映射配置文件"""
+    """列名映射生成器 - 生成列名与业务含义的映射并保存到数据库元数据表"""
     
-    def __init__(self, mapping_dir: str = "column_mapping_docs", config_file: str = "column_mapping_config.json"):
+    def __init__(self, mapping_dir: str = "column_mapping_docs", config_file: str = "column_mapping_config.json",
+                 check_on_init: bool = True):
         """
         初始化列名映射生成器
         
         Args:
-            mapping_dir: 映射配置文件保存目录
+            mapping_dir: 旧版JSON映射配置目录，存在注册表时一次性迁移到数据库
             config_file: 配置文件路径
+            check_on_init: 是否在初始化时为缺失映射的表启动生成；启动流程中工作表分析阶段会同时生成映射，
+                此时应传 False，待分析完成后再调用 check_missing_mappings
         """
         self.mapping_dir = mapping_dir
         self.config_file = config_file
@@ -28,15 +40,21 @@ class ColumnMappingGenerator:
         # 加载配置
         self.config = self._load_config()
         
-        # 创建映射配置目录
-        os.makedirs(self.mapping_dir, exist_ok=True)
+        # 后台生成状态
+        self._generation_lock = threading.Lock()
+        self._generation_thread: Optional[threading.Thread] = None
+        self.generation_progress: Dict[str, Any] = {
+            "running": False, "total": 0, "completed": 0, "succeeded": 0, "failed": 0,
+            "started_at": None, "finished_at": None
+        }
         
-        # 初始化映射关系存储
+        # 初始化映射关系存储（迁移旧版JSON后从数据库加载）
         self.mapping_registry_file = os.path.join(self.mapping_dir, "mapping_registry.json")
-        self.mapping_registry = self._load_mapping_registry()
+        self._migrate_json_mappings()
+        self.mapping_registry = self.db_manager.get_column_mapping_registry()
         
         # 启动时检查并生成映射
-        if self.config.get("enable_incremental_updates", True):
+        if check_on_init and self.config.get("enable_incremental_updates", True):
             self._check_and_initialize_mappings()
     
     def _load_config(self) -> Dict[str, Any]:
@@ -49,6 +67,9 @@ class ColumnMappingGenerator:
         default_config = {
             "auto_generate_on_startup": True,
             "max_tables_per_batch": 5,
+            "max_concurrent_requests": 4,
+            "batch_token_budget": LLM_BATCH_TOKEN_BUDGET,
+            "batch_max_tables": LLM_BATCH_MAX_ITEMS,
             "enable_incremental_updates": True,
             "log_level": "info",
             "excluded_tables": ["sqlite_sequence", "file_versions", "table_mappings"],
@@ -67,30 +88,35 @@ class ColumnMappingGenerator:
         
         return default_config
     
-    def _load_mapping_registry(self) -> Dict[str, Dict[str, str]]:
+    def _migrate_json_mappings(self):
         """
-        加载映射关系注册表
-        
-        Returns:
-            映射关系注册表 {表名: {配置文件路径: 文件名, 生成时间: 时间戳}}
-        """
-        if os.path.exists(self.mapping_registry_file):
-            try:
-                with open(self.mapping_registry_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"⚠️ 加载映射关系注册表失败: {e}")
-        return {}
-    
-    def _save_mapping_registry(self):
-        """
-        保存映射关系注册表到文件
+        将旧版 mapping_registry.json 及各表的映射配置文件一次性迁移到数据库，
+        迁移后注册表文件重命名为 .migrated（各表配置文件保留作为备份）
         """
+        if not os.path.exists(self.mapping_registry_file):
+            return
         try:
-            with open(self.mapping_registry_file, 'w', encoding='utf-8') as f:
-                json.dump(self.mapping_registry, f, ensure_ascii=False, indent=2)
+            with open(self.mapping_registry_file, 'r', encoding='utf-8') as f:
+                legacy_registry = json.load(f)
+            
+            migrated = 0
+            with self.db_manager.pool.writer():
+                for table_name, entry in legacy_registry.items():
+                    config_path = os.path.join(self.mapping_dir, os.path.basename(entry.get("config_path", "")))
+                    try:
+                        with open(config_path, 'r', encoding='utf-8') as f:
+                            mapping = json.load(f).get("column_mappings", {})
+                    except Exception as e:
+                        print(f"⚠️ 读取表 {table_name} 的旧版映射配置失败: {e}")
+                        continue
+                    # 嵌套写事务并入外层，全部迁移在一个事务内完成
+                    self.db_manager.save_column_mapping(table_name, mapping, entry.get("generated_at"))
+                    migrated += 1
+            
+            os.replace(self.mapping_registry_file, self.mapping_registry_file + ".migrated")
+            print(f"📦 列名映射已迁移到数据库: {migrated}/{len(legacy_registry)} 个表")
         except Exception as e:
-            print(f"⚠️ 保存映射关系注册表失败: {e}")
+            print(f"⚠️ 迁移列名映射失败: {e}")
     
     def _get_table_schema_and_samples(self, table_name: str) -> Optional[Dict[str, Any]]:
         """
@@ -102,8 +128,26 @@ class ColumnMappingGenerator:
         Returns:
             包含列信息和样本数据的字典
         """
+        # 优先复用接入阶段已解析的工作表，避免再次读取SQLite中的数据
+        df = get_parsed_sheet_store().get_table(table_name)
+        if df is not None:
+            # 列类型以导入时推断并写入表结构的类型为准（只读取表结构，与 DataFrame 的 dtype 可能不同）
+            try:
+                conn = self.db_manager.pool.get_reader()
+                declared_types = {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info([{table_name}])")}
+            except Exception:
+                declared_types = {}
+            columns = [str(col) for col in df.columns]
+            return {
+                'table_name': table_name,
+                'columns': columns,
+                'types': [declared_types.get(col) or sqlite_type_for_dtype(dtype)
+                          for col, dtype in zip(columns, df.dtypes)],
+                'sample_data': df.head(10).reset_index(drop=True)
+            }
+        
         try:
-            conn = sqlite3.connect(self.db_manager.db_path)
+            conn = self.db_manager.pool.get_reader()
             
             # 获取列信息
             columns_query = f"PRAGMA table_info([{table_name}])"
@@ -113,28 +157,30 @@ class ColumnMappingGenerator:
             sample_query = f"SELECT * FROM [{table_name}] LIMIT 10"
             sample_data = pd.read_sql_query(sample_query, conn)
             
-            conn.close()
+            # 数值影子列由原列派生，不单独生成映射
+            all_columns = columns_df['name'].tolist()
+            columns_df = columns_df[[not is_numeric_shadow(c, all_columns) for c in all_columns]]
             
             return {
                 'table_name': table_name,
                 'columns': columns_df['name'].tolist(),
                 'types': columns_df['type'].tolist(),
-                'sample_data': sample_data
+                'sample_data': sample_data[columns_df['name'].tolist()]
             }
             
         except Exception as e:
             print(f"⚠️ 获取表结构失败 {table_name}: {e}")
             return None
     
-    def _generate_mapping_prompt(self, table_info: Dict[str, Any]) -> str:
+    def _format_table_section(self, table_info: Dict[str, Any]) -> str:
         """
-        生成用于大模型的列名映射提示词
+        生成单个表的结构和样本片段（单表与批量提示词共用）
         
         Args:
             table_info: 表信息字典
             
         Returns:
-            大模型提示词
+            表信息片段
         """
         table_name = table_info['table_name']
         columns = table_info['columns']
@@ -149,6 +195,24 @@ class ColumnMappingGenerator:
             row_data = [str(val)[:50] + "..." if len(str(val)) > 50 else str(val) for val in row]
             sample_data_str += f"行{i+1}: {row_data}\n"
         
+        return f"""表名: {table_name}
+
+列信息:
+{chr(10).join([f"{i+1}. {col} ({typ})" for i, (col, typ) in enumerate(zip(columns, types))])}
+
+样本数据:
+{sample_data_str}"""
+    
+    def _generate_mapping_prompt(self, table_info: Dict[str, Any]) -> str:
+        """
+        生成用于大模型的列名映射提示词
+        
+        Args:
+            table_info: 表信息字典
+            
+        Returns:
+            大模型提示词
+        """
         prompt = f"""
 # 角色定义
 你是一位资深的数据库架构师和业务分析专家，拥有15年以上的数据建模和业务理解经验。你的专长是分析复杂的数据库表结构，理解业务语义，并建立准确的映射关系。
@@ -156,13 +220,7 @@ class ColumnMappingGenerator:
 # 核心任务
 请分析以下数据库表的结构和内容，建立列名到业务概念的精确映射关系。这个映射将用于自然语言查询系统，准确性至关重要。
 
-表名: {table_name}
-
-列信息:
-{chr(10).join([f"{i+1}. {col} ({typ})" for i, (col, typ) in enumerate(zip(columns, types))])}
-
-样本数据:
-{sample_data_str}
+{self._format_table_section(table_info)}
 
 请根据列名和数据内容，推断每个列的业务含义，并以JSON格式返回映射关系。
 
@@ -190,6 +248,91 @@ class ColumnMappingGenerator:
         
         return prompt.strip()
     
+    def _generate_batch_mapping_prompt(self, table_infos: List[Dict[str, Any]]) -> str:
+        """
+        生成一次分析多个表的列名映射提示词
+        
+        Args:
+            table_infos: 表信息字典列表
+            
+        Returns:
+            大模型提示词
+        """
+        sections = "\n\n".join(
+            f"## 表{i}\n{self._format_table_section(table_info)}" for i, table_info in enumerate(table_infos, 1)
+        )
+        prompt = f"""
+# 角色定义
+你是一位资深的数据库架构师和业务分析专家，拥有15年以上的数据建模和业务理解经验。你的专长是分析复杂的数据库表结构，理解业务语义，并建立准确的映射关系。
+
+# 核心任务
+请分别分析以下 {len(table_infos)} 个数据库表的结构和内容，为每个表建立列名到业务概念的精确映射关系。这个映射将用于自然语言查询系统，准确性至关重要。
+
+{sections}
+
+请根据每个表的列名和数据内容，推断每个列的业务含义，并以JSON格式返回映射关系。
+
+要求:
+1. 分析每列的数据特征，各表独立分析
+2. 数据库表都是由excel文件经pandas自动转化而来，所以每个表的第一行就是列名
+3. 基于列名、数据内容推断业务含义（如：产品名称、品牌、价格、规格等）
+4. 主要为中文业务场景
+5. 业务含义要简洁明确，便于自然语言查询理解
+
+# 输出要求
+严格按照json格式输出，外层键为表名（与上面给出的完全一致）{{"表名": {{"列名": "业务概念", ...}}, ...}}
+
+示例输出:
+{{
+    "table_a_Sheet1": {{"Unnamed: 0": "序号", "Unnamed: 1": "产品名称"}},
+    "table_a_Sheet2": {{"Unnamed: 0": "品牌信息", "Unnamed: 1": "单位"}}
+}}
+
+请开始分析:
+        """
+        
+        return prompt.strip()
+    
+    async def _generate_column_mappings_batched(self, table_infos: List[Dict[str, Any]]) -> Dict[str, Dict[str, str]]:
+        """
+        使用一次大模型请求为多个表生成列名映射
+        
+        Args:
+            table_infos: 表信息字典列表
+            
+        Returns:
+            {表名: 列名映射字典}，只包含解析成功的表
+        """
+        llm = self.model_manager.get_llm(STAGE_MAPPING)
+        messages = [HumanMessage(content=self._generate_batch_mapping_prompt(table_infos))]
+        try:
+            response = await llm.ainvoke(messages)
+            response_text = response.content if hasattr(response, 'content') else str(response)
+        except Exception as e:
+            print(f"⚠️ 大模型批量生成列名映射失败: {e}")
+            return {}
+        
+        result = extract_json_object(response_text)
+        if not isinstance(result, dict):
+            print(f"⚠️ 批量映射响应无法解析为JSON: {response_text[:200]}...")
+            discard_cached_response(llm, messages)
+            return {}
+        
+        mappings = {}
+        for table_info in table_infos:
+            table_mapping = result.get(table_info['table_name'])
+            if not isinstance(table_mapping, dict):
+                continue
+            # 只保留真实存在的列，避免模型串表
+            columns = set(str(col) for col in table_info['columns'])
+            table_mapping = {str(col): str(meaning) for col, meaning in table_mapping.items() if str(col) in columns}
+            if table_mapping:
+                mappings[table_info['table_name']] = table_mapping
+        if len(mappings) < len(table_infos):
+            # 响应不完整，不缓存，避免重试时重放
+            discard_cached_response(llm, messages)
+        return mappings
+    
     async def _generate_column_mapping_with_llm(self, table_info: Dict[str, Any]) -> Optional[Dict[str, str]]:
         """
         使用大模型生成列名映射
@@ -201,7 +344,7 @@ class ColumnMappingGenerator:
             列名到业务含义的映射字典
         """
         try:
-            llm = self.model_manager.get_llm()
+            llm = self.model_manager.get_llm(STAGE_MAPPING)
             prompt = self._generate_mapping_prompt(table_info)
             
             messages = [HumanMessage(content=prompt)]
@@ -220,75 +363,50 @@ class ColumnMappingGenerator:
                 if json_match:
                     json_str = json_match.group()
                     mapping = json.loads(json_str)
-                    return mapping
+                    if isinstance(mapping, dict) and mapping:
+                        return mapping
+                    print(f"⚠️ 响应中的JSON不是有效的列名映射: {response_text[:200]}...")
                 else:
                     print(f"⚠️ 无法从响应中提取JSON: {response_text[:200]}...")
-                    return None
             except json.JSONDecodeError as e:
                 print(f"⚠️ JSON解析失败: {e}")
                 print(f"响应内容: {response_text[:200]}...")
-                return None
+            # 无法解析的响应不缓存，避免重试时重放
+            discard_cached_response(llm, messages)
+            return None
                 
         except Exception as e:
             print(f"⚠️ 大模型生成列名映射失败: {e}")
             return None
     
-    def _save_column_mapping(self, table_name: str, mapping: Dict[str, str]) -> str:
+    def _save_column_mapping(self, table_name: str, mapping: Dict[str, str]) -> bool:
         """
-        保存列名映射配置文件
+        保存列名映射到数据库并更新映射关系注册表
         
         Args:
             table_name: 表名
             mapping: 列名映射字典
             
         Returns:
-            配置文件路径
+            是否保存成功
         """
         try:
-            # 生成配置文件名
-            config_filename = f"{table_name}_column_mapping.json"
-            config_path = os.path.join(self.mapping_dir, config_filename)
-            
-            # 构建完整的配置数据
-            config_data = {
-                "table_name": table_name,
-                "generated_at": pd.Timestamp.now().isoformat(),
-                "column_mappings": mapping,
-                "description": f"表 {table_name} 的列名与业务含义映射配置"
-            }
-            
-            # 保存配置文件
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(config_data, f, ensure_ascii=False, indent=2)
-            
-            print(f"✅ 列名映射配置已保存: {config_path}")
-            return config_path
+            generated_at = self.db_manager.save_column_mapping(table_name, mapping)
+            self.mapping_registry[table_name] = {"generated_at": generated_at}
+            print(f"✅ 列名映射已保存: {table_name}")
+            return True
             
         except Exception as e:
-            print(f"⚠️ 保存列名映射配置失败: {e}")
-            return ""
-    
-    def _update_mapping_registry(self, table_name: str, config_path: str):
-        """
-        更新映射关系注册表
-        
-        Args:
-            table_name: 表名
-            config_path: 配置文件路径
-        """
-        self.mapping_registry[table_name] = {
-            "config_file": os.path.basename(config_path),
-            "config_path": config_path,
-            "generated_at": pd.Timestamp.now().isoformat()
-        }
-        self._save_mapping_registry()
+            print(f"⚠️ 保存列名映射失败: {e}")
+            return False
     
-    async def generate_mapping_for_table(self, table_name: str) -> bool:
+    async def generate_mapping_for_table(self, table_name: str, table_info: Optional[Dict[str, Any]] = None) -> bool:
         """
         为指定表生成列名映射配置
         
         Args:
             table_name: 数据库表名
+            table_info: 已读取的表结构和样本数据，为None时重新读取
             
         Returns:
             是否生成成功
@@ -296,7 +414,8 @@ class ColumnMappingGenerator:
         print(f"🔄 开始为表 {table_name} 生成列名映射...")
         
         # 获取表结构和样本数据
-        table_info = self._get_table_schema_and_samples(table_name)
+        if table_info is None:
+            table_info = self._get_table_schema_and_samples(table_name)
         if not table_info:
             print(f"❌ 无法获取表 {table_name} 的信息")
             return False
@@ -307,18 +426,75 @@ class ColumnMappingGenerator:
             print(f"❌ 无法为表 {table_name} 生成列名映射")
             return False
         
-        # 保存配置文件
-        config_path = self._save_column_mapping(table_name, mapping)
-        if not config_path:
-            return False
+        return self._finish_mapping(table_name, mapping)
+    
+    def _finish_mapping(self, table_name: str, mapping: Dict[str, str]) -> bool:
+        """
+        保存生成的映射、更新注册表并使结构目录失效
         
-        # 更新注册表
-        self._update_mapping_registry(table_name, config_path)
+        Args:
+            table_name: 数据库表名
+            mapping: 列名映射字典
+            
+        Returns:
+            是否保存成功
+        """
+        # 保存映射并更新注册表
+        if not self._save_column_mapping(table_name, mapping):
+            return False
+        get_schema_catalog().invalidate([table_name])
         
         print(f"✅ 表 {table_name} 的列名映射生成完成")
         print(f"📋 映射内容: {json.dumps(mapping, ensure_ascii=False, indent=2)}")
         return True
     
+    def save_mapping_for_table(self, table_name: str, mapping: Dict[str, str]) -> bool:
+        """
+        保存由其他分析阶段（工作表合并分析）得到的列名映射
+        
+        Args:
+            table_name: 数据库表名
+            mapping: 列名映射字典
+            
+        Returns:
+            是否保存成功
+        """
+        return self._finish_mapping(table_name, mapping)
+    
+    async def generate_mappings_for_tables(self, tables: List[str],
+                                           table_infos: Optional[Dict[str, Optional[Dict[str, Any]]]] = None
+                                           ) -> Dict[str, bool]:
+        """
+        用一次批量请求为多个表生成列名映射，批量结果缺失或无法解析的表回退到单表请求
+        
+        Args:
+            tables: 数据库表名列表
+            table_infos: 已读取的表结构和样本数据 {表名: 表信息}，为None时重新读取
+            
+        Returns:
+            生成结果字典 {表名: 是否成功}
+        """
+        if table_infos is None:
+            table_infos = {t: self._get_table_schema_and_samples(t) for t in tables}
+        if len(tables) == 1:
+            return {tables[0]: await self.generate_mapping_for_table(tables[0], table_infos.get(tables[0]))}
+        
+        print(f"🔄 批量为 {len(tables)} 个表生成列名映射: {', '.join(tables)}")
+        batch_infos = [table_infos[t] for t in tables if table_infos.get(t)]
+        mappings = await self._generate_column_mappings_batched(batch_infos) if batch_infos else {}
+        
+        results = {}
+        for table_name in tables:
+            if table_name in mappings:
+                results[table_name] = self._finish_mapping(table_name, mappings[table_name])
+            elif not table_infos.get(table_name):
+                print(f"❌ 无法获取表 {table_name} 的信息")
+                results[table_name] = False
+            else:
+                print(f"🔁 表 {table_name} 未从批量结果中解析到映射，回退到单表请求")
+                results[table_name] = await self.generate_mapping_for_table(table_name, table_infos[table_name])
+        return results
+    
     async def generate_mappings_for_all_tables(self) -> Dict[str, bool]:
         """
         为数据库中的所有表生成列名映射配置
@@ -329,19 +505,8 @@ class ColumnMappingGenerator:
         print(f"🚀 开始为所有数据库表生成列名映射...")
         
         try:
-            # 获取所有表名
-            conn = sqlite3.connect(self.db_manager.db_path)
-            cursor = conn.cursor()
-            
             # 获取所有用户表（排除系统表）
-            cursor.execute("""
-                SELECT name FROM sqlite_master 
-                WHERE type='table' AND name NOT LIKE 'sqlite_%' 
-                AND name NOT IN ('file_versions', 'table_mappings')
-            """)
-            
-            tables = [row[0] for row in cursor.fetchall()]
-            conn.close()
+            tables = self._get_all_database_tables()
             
             if not tables:
                 print(f"📭 数据库中未找到用户表")
@@ -384,10 +549,7 @@ class ColumnMappingGenerator:
             return None
         
         try:
-            config_path = self.mapping_registry[table_name]["config_path"]
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config_data = json.load(f)
-                return config_data.get("column_mappings", {})
+            return self.db_manager.get_column_mapping(table_name)
         except Exception as e:
             print(f"⚠️ 读取表 {table_name} 的列名映射失败: {e}")
             return None
@@ -416,15 +578,10 @@ class ColumnMappingGenerator:
             return False
         
         try:
-            # 删除配置文件
-            config_path = self.mapping_registry[table_name]["config_path"]
-            if os.path.exists(config_path):
-                os.remove(config_path)
-                print(f"🗑️ 已删除配置文件: {config_path}")
-            
-            # 从注册表中移除
+            # 从数据库和注册表中移除
+            self.db_manager.delete_column_mapping(table_name)
             del self.mapping_registry[table_name]
-            self._save_mapping_registry()
+            get_schema_catalog().invalidate([table_name])
             
             print(f"✅ 表 {table_name} 的列名映射已删除")
             return True
@@ -440,15 +597,32 @@ class ColumnMappingGenerator:
         """
         print("🔍 检查列名映射配置状态...")
         
-        # 如果映射注册表不存在，说明是首次运行
-        if not os.path.exists(self.mapping_registry_file):
-            print("📝 首次运行，映射注册表不存在，将创建初始配置")
-            self._save_mapping_registry()  # 创建空的注册表文件
-            return
-        
         # 检查是否需要增量更新
         self._check_incremental_updates()
     
+    def filter_unmapped_since(self, tables: List[str], mapped_since: str = None) -> List[str]:
+        """
+        过滤掉在指定时间之后已生成映射的表（重新导入的表已有旧映射，由工作表合并分析阶段
+        重新生成过映射的不再重复生成）
+        
+        Args:
+            tables: 表名列表
+            mapped_since: ISO 格式时间，为None时不过滤
+            
+        Returns:
+            仍需生成映射的表名列表
+        """
+        if not mapped_since:
+            return list(tables)
+        return [t for t in tables if self.mapping_registry.get(t, {}).get("generated_at", "") < mapped_since]
+    
+    def check_missing_mappings(self):
+        """
+        为仍缺少映射的表启动后台生成（在工作表分析阶段之后调用，分析阶段已保存映射的表已在注册表中）
+        """
+        if self.config.get("enable_incremental_updates", True):
+            self._check_incremental_updates()
+    
     def _check_incremental_updates(self):
         """
         检查并执行增量更新
@@ -473,26 +647,11 @@ class ColumnMappingGenerator:
                 max_batch = self.config.get("max_tables_per_batch", 5)
                 
                 if auto_generate:
-                    print("🚀 开始自动生成新表的映射配置...")
-                    import asyncio
-                    try:
-                        # 为新表生成映射，限制批次大小
-                        batch_tables = missing_tables[:max_batch]
-                        for table in batch_tables:
-                            try:
-                                asyncio.run(self.generate_mapping_for_table(table))
-                                print(f"✅ 表 {table} 映射生成完成")
-                            except Exception as e:
-                                print(f"⚠️ 表 {table} 映射生成失败: {e}")
-                        
-                        if len(missing_tables) > max_batch:
-                            print(f"💡 还有 {len(missing_tables) - max_batch} 个表未处理，请运行 'python generate_column_mappings.py --check' 继续")
-                            
-                    except RuntimeError as e:
-                        if "cannot run the event loop" in str(e):
-                            print("⚠️ 无法在当前上下文中自动生成映射，请手动运行生成命令")
-                        else:
-                            raise
+                    # 为新表生成映射，限制批次大小；在后台线程中执行，不阻塞启动
+                    self.start_background_generation(missing_tables[:max_batch])
+                    
+                    if len(missing_tables) > max_batch:
+                        print(f"💡 还有 {len(missing_tables) - max_batch} 个表未处理，请运行 'python generate_column_mappings.py --check' 继续")
                 else:
                     print("💡 提示: 使用 'python generate_column_mappings.py --all' 为所有新表生成映射")
                     print("   或者在配置文件中设置 'auto_generate_on_startup': true 启用自动生成")
@@ -502,6 +661,100 @@ class ColumnMappingGenerator:
         except Exception as e:
             print(f"⚠️ 增量更新检查失败: {e}")
     
+    async def generate_mappings_concurrently(self, tables: List[str], max_concurrency: int = None) -> Dict[str, bool]:
+        """
+        以有限并发为多个表生成列名映射（小表按 token 预算合并为批量请求），并更新进度
+        
+        Args:
+            tables: 表名列表
+            max_concurrency: 最大并发请求数，为None时读取配置 max_concurrent_requests
+            
+        Returns:
+            生成结果字典 {表名: 是否成功}
+        """
+        if max_concurrency is None:
+            max_concurrency = self.config.get("max_concurrent_requests", 4)
+        semaphore = asyncio.Semaphore(max(1, int(max_concurrency)))
+        results = {}
+        
+        with self._generation_lock:
+            self.generation_progress["total"] += len(tables)
+        
+        # 按 token 预算把多个小表合并为一次请求（读取的表信息直接交给批量生成，不再重复读取）
+        table_infos = {}
+        sections = []
+        for table_name in tables:
+            table_info = self._get_table_schema_and_samples(table_name)
+            table_infos[table_name] = table_info
+            sections.append((table_name, self._format_table_section(table_info) if table_info else ""))
+        batches = pack_batches(
+            sections,
+            estimate_tokens(self._generate_batch_mapping_prompt([])),
+            token_budget=self.config.get("batch_token_budget", LLM_BATCH_TOKEN_BUDGET),
+            max_items=self.config.get("batch_max_tables", LLM_BATCH_MAX_ITEMS)
+        )
+        
+        async def process_batch(batch):
+            async with semaphore:
+                try:
+                    batch_results = await self.generate_mappings_for_tables(
+                        batch, {table_name: table_infos[table_name] for table_name in batch})
+                except Exception as e:
+                    print(f"⚠️ 表 {', '.join(batch)} 映射生成失败: {e}")
+                    batch_results = {table_name: False for table_name in batch}
+            results.update(batch_results)
+            with self._generation_lock:
+                progress = self.generation_progress
+                progress["completed"] += len(batch_results)
+                progress["succeeded"] += sum(batch_results.values())
+                progress["failed"] += len(batch_results) - sum(batch_results.values())
+                print(f"📈 [MAPPING] 列名映射进度: {progress['completed']}/{progress['total']} "
+                      f"(成功 {progress['succeeded']}, 失败 {progress['failed']})")
+        
+        await asyncio.gather(*(process_batch(batch) for batch in batches))
+        return results
+    
+    def start_background_generation(self, tables: List[str]) -> bool:
+        """
+        在后台线程中为指定表生成列名映射，立即返回
+        
+        生成期间查询使用已有的映射，每个表生成完成后结构目录随即失效并加载新映射。
+        
+        Args:
+            tables: 表名列表
+            
+        Returns:
+            是否启动了新的后台任务（已有任务运行时返回False）
+        """
+        if not tables:
+            return False
+        with self._generation_lock:
+            if self._generation_thread is not None and self._generation_thread.is_alive():
+                print("⏳ [MAPPING] 已有后台映射生成任务在运行")
+                return False
+            self.generation_progress.update({
+                "running": True, "total": 0, "completed": 0, "succeeded": 0, "failed": 0,
+                "started_at": time.time(), "finished_at": None
+            })
+        
+        def _run():
+            try:
+                asyncio.run(self.generate_mappings_concurrently(tables))
+            except Exception as e:
+                print(f"⚠️ [MAPPING] 后台映射生成失败: {e}")
+            finally:
+                with self._generation_lock:
+                    self.generation_progress["running"] = False
+                    self.generation_progress["finished_at"] = time.time()
+                progress = self.generation_progress
+                print(f"🎯 [MAPPING] 后台映射生成结束: {progress['succeeded']}/{progress['total']} 个表成功")
+        
+        print(f"🚀 [MAPPING] 后台生成 {len(tables)} 个表的列名映射 "
+              f"(并发数: {self.config.get('max_concurrent_requests', 4)})")
+        self._generation_thread = threading.Thread(target=_run, name="column-mapping-generator", daemon=True)
+        self._generation_thread.start()
+        return True
+    
     def _get_all_database_tables(self) -> List[str]:
         """
         获取数据库中所有用户表（排除系统表）
@@ -510,24 +763,24 @@ class ColumnMappingGenerator:
             表名列表
         """
         try:
-            conn = sqlite3.connect(self.db_manager.db_path)
+            conn = self.db_manager.pool.get_reader()
             cursor = conn.cursor()
             
-            # 获取所有表名，排除系统表和配置中指定的表
-            excluded_tables = self.config.get("excluded_tables", ["sqlite_sequence", "file_versions", "table_mappings"])
+            # 获取所有表名，排除系统表、全文索引表和配置中指定的表
+            excluded_tables = list(self.config.get("excluded_tables", ["sqlite_sequence"])) + list(METADATA_TABLES)
             excluded_placeholders = ','.join(['?' for _ in excluded_tables])
             
             query = f"""
                 SELECT name FROM sqlite_master 
                 WHERE type='table' 
                 AND name NOT LIKE 'sqlite_%'
+                AND name NOT GLOB '{FTS_TABLE_PREFIX}*'
                 AND name NOT IN ({excluded_placeholders})
             """
             
             cursor.execute(query, excluded_tables)
             
             tables = [row[0] for row in cursor.fetchall()]
-            conn.close()
             
             return tables
             
@@ -552,24 +805,36 @@ class ColumnMappingGenerator:
             "unmapped_tables": len(unmapped_tables),
             "mapping_coverage": len(mapped_tables) / len(db_tables) * 100 if db_tables else 0,
             "unmapped_table_list": unmapped_tables[:10],  # 只显示前10个
-            "registry_file_exists": os.path.exists(self.mapping_registry_file),
-            "mapping_dir_exists": os.path.exists(self.mapping_dir)
+            "mapping_store": self.db_manager.db_path,
+            "background_generation": self.get_generation_progress()
         }
+    
+    def get_generation_progress(self) -> Dict[str, Any]:
+        """
+        获取后台映射生成进度
+        
+        Returns:
+            进度信息字典
+        """
+        with self._generation_lock:
+            return dict(self.generation_progress)
 
 # 全局列名映射生成器实例
 _column_mapping_generator = None
 
-def get_column_mapping_generator(mapping_dir: str = "column_mapping_docs") -> ColumnMappingGenerator:
+def get_column_mapping_generator(mapping_dir: str = "column_mapping_docs",
+                                 check_on_init: bool = True) -> ColumnMappingGenerator:
     """
     获取列名映射生成器单例
     
     Args:
         mapping_dir: 映射配置目录
+        check_on_init: 首次创建时是否立即为缺失映射的表启动生成（见 ColumnMappingGenerator）
         
     Returns:
         列名映射生成器实例
     """
     global _column_mapping_generator
     if _column_mapping_generator is None:
-        _column_mapping_generator = ColumnMappingGenerator(mapping_dir)
+        _column_mapping_generator = ColumnMappingGenerator(mapping_dir, check_on_init=check_on_init)
     return _column_mapping_generator
\ No newline at end of file
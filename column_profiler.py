@@ -0,0 +1,279 @@
+import os
+import re
+import math
+import datetime
+import unicodedata
+from functools import partial
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 可解析为数值（或日期）的值达到该比例时按数值（或日期）列处理
+TYPE_INFERENCE_MIN_RATIO = float(os.getenv("TYPE_INFERENCE_MIN_RATIO", 0.8))
+# 类型推断抽样的最大值数（均匀抽样，与工作表大小无关）
+TYPE_INFERENCE_SAMPLE_SIZE = int(os.getenv("TYPE_INFERENCE_SAMPLE_SIZE", 2000))
+# 数值影子列的列名后缀：原列中夹杂表头行、小计文字等非数值内容时，另存一列清洗后的数值
+NUMERIC_SHADOW_SUFFIX = "__num"
+
+# 千分位、货币符号和空白（清洗数值字符串时去掉）
+_NUMBER_NOISE = re.compile(r"[,\s¥$€£￥元]")
+_NUMBER_PATTERN = re.compile(r"^[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?$")
+# 以 0 开头的多位整数（编号、邮编）和超过 15 位的数字串（证件号、条码）按文本处理（在去掉千分位之前判断）
+_CODE_PATTERN = re.compile(r"^[+-]?(0\d+|\d{16,})$")
+# 科学计数法（2E10、1e5 等也常见于产品编号，只在整列都是小数时按数值解析）
+_EXPONENT_PATTERN = re.compile(r"\d[eE][+-]?\d")
+_DATE_PATTERN = re.compile(
+    r"^(\d{4})[-/.年](\d{1,2})[-/.月](\d{1,2})日?"
+    r"(?:[ T](\d{1,2}):(\d{2})(?::(\d{2}))?)?$"
+)
+
+
+class ColumnProfile:
+    """单列的类型推断结果"""
+
+    def __init__(self, name: str, kind: str, declared_type: str, shadow: Optional[str] = None,
+                 convert: bool = False, parsed_ratio: float = 0.0, allow_exponent: bool = False):
+        self.name = name
+        self.kind = kind  # integer / real / date / text
+        self.declared_type = declared_type  # 建表时的声明类型（决定列亲和性）
+        self.shadow = shadow  # 数值影子列名，不需要时为None
+        self.convert = convert  # 写入前是否需要逐值转换
+        self.parsed_ratio = parsed_ratio
+        self.allow_exponent = allow_exponent  # 是否把科学计数法文本解析为数值
+
+
+def parse_number(value: Any, allow_exponent: bool = False) -> Optional[Any]:
+    """
+    将单元格值解析为数值（支持千分位、货币符号、百分号、括号负数和全角数字；编号类数字串不解析）
+
+    Args:
+        value: 单元格值
+        allow_exponent: 是否解析科学计数法文本（默认按编号处理）
+
+    Returns:
+        int / float，无法解析时返回None
+    """
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return None if math.isnan(value) else float(value)
+    if not isinstance(value, str):
+        return None
+    text = unicodedata.normalize("NFKC", value).strip()
+    negative = text.startswith("(") and text.endswith(")")
+    if negative:
+        text = text[1:-1]
+    percent = text.endswith("%")
+    if percent:
+        text = text[:-1]
+    if _CODE_PATTERN.match(text.strip()):
+        return None
+    text = _NUMBER_NOISE.sub("", text)
+    if not _NUMBER_PATTERN.match(text) or (not allow_exponent and _EXPONENT_PATTERN.search(text)):
+        return None
+    number = float(text) if percent or any(c in text for c in ".eE") else int(text)
+    if percent:
+        number /= 100
+    return -number if negative else number
+
+
+def parse_date(value: Any) -> Optional[str]:
+    """
+    将单元格值解析为 ISO 格式的日期/时间文本
+
+    Args:
+        value: 单元格值
+
+    Returns:
+        ISO 格式文本，无法解析时返回None
+    """
+    if isinstance(value, pd.Timestamp):
+        return None if pd.isna(value) else value.to_pydatetime().isoformat(sep=' ')
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if not isinstance(value, str):
+        return None
+    match = _DATE_PATTERN.match(unicodedata.normalize("NFKC", value).strip())
+    if not match:
+        return None
+    year, month, day, hour, minute, second = match.groups()
+    try:
+        if hour is None:
+            return datetime.date(int(year), int(month), int(day)).isoformat()
+        return datetime.datetime(int(year), int(month), int(day), int(hour), int(minute),
+                                 int(second or 0)).isoformat(sep=' ')
+    except ValueError:
+        return None
+
+
+def _is_blank(value: Any) -> bool:
+    """空单元格（None、NaN、NaT、空字符串）"""
+    if value is None or value is pd.NaT:
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return True
+    return isinstance(value, str) and value.strip() == ""
+
+
+def profile_values(name: str, values: Sequence[Any], existing_columns: Sequence[str] = ()) -> ColumnProfile:
+    """
+    根据列中的值推断类型
+
+    全部可解析为数值时按 INTEGER/REAL 存储；大部分可解析（其余为夹在数据中的表头行、小计文字等）时
+    原列保留文本，另加清洗后的数值影子列；日期统一为 ISO 文本。
+
+    Args:
+        name: 列名
+        values: 列中的值（可为抽样）
+        existing_columns: 表中已有的列名，影子列名与之冲突时不建影子列
+
+    Returns:
+        类型推断结果
+    """
+    values = [v for v in values if not _is_blank(v)]
+    if not values:
+        return ColumnProfile(name, "text", "TEXT")
+
+    # 整列（含科学计数法在内）都能解析且带有小数时才把科学计数法当作数值，否则按编号处理
+    with_exponent = [parse_number(v, allow_exponent=True) for v in values]
+    allow_exponent = (all(n is not None for n in with_exponent)
+                      and any(isinstance(n, float) and not _EXPONENT_PATTERN.search(str(v))
+                              for n, v in zip(with_exponent, values)))
+    numbers = with_exponent if allow_exponent else [parse_number(v) for v in values]
+    parsed = [n for n in numbers if n is not None]
+    ratio = len(parsed) / len(values)
+    already_numeric = all(isinstance(v, (int, float, np.number)) and not isinstance(v, bool) for v in values)
+    if ratio == 1.0:
+        is_integer = all(isinstance(n, int) for n in parsed)
+        return ColumnProfile(name, "integer" if is_integer else "real", "INTEGER" if is_integer else "REAL",
+                             convert=not already_numeric, parsed_ratio=ratio, allow_exponent=allow_exponent)
+    if ratio >= TYPE_INFERENCE_MIN_RATIO:
+        shadow = f"{name}{NUMERIC_SHADOW_SUFFIX}"
+        if shadow in existing_columns:
+            shadow = None
+        return ColumnProfile(name, "text", "TEXT", shadow=shadow, convert=shadow is not None, parsed_ratio=ratio)
+
+    dates = sum(1 for v in values if parse_date(v) is not None)
+    ratio = dates / len(values)
+    if ratio >= TYPE_INFERENCE_MIN_RATIO:
+        return ColumnProfile(name, "date", "TIMESTAMP" if ratio == 1.0 else "TEXT", convert=True, parsed_ratio=ratio)
+    return ColumnProfile(name, "text", "TEXT", parsed_ratio=ratio)
+
+
+def _sample(values: Sequence[Any], size: int = TYPE_INFERENCE_SAMPLE_SIZE) -> Sequence[Any]:
+    """均匀抽取至多 size 个值（保留开头的值，夹在数据中的表头行多在开头）"""
+    if len(values) <= size:
+        return values
+    head = list(values[:size // 4])
+    step = len(values) / (size - len(head))
+    return head + [values[int(i * step)] for i in range(size - len(head))]
+
+
+def profile_dataframe(df: pd.DataFrame) -> List[ColumnProfile]:
+    """
+    推断 DataFrame 各列的存储类型（数值、布尔和日期类型的列直接沿用 pandas 的类型）
+
+    Args:
+        df: 已解析的工作表
+
+    Returns:
+        各列的类型推断结果
+    """
+    columns = [str(c) for c in df.columns]
+    profiles = []
+    for i, column in enumerate(columns):
+        dtype = df.dtypes.iloc[i]
+        if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+            profiles.append(ColumnProfile(column, "integer", "INTEGER"))
+        elif pd.api.types.is_float_dtype(dtype):
+            profiles.append(ColumnProfile(column, "real", "REAL"))
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            profiles.append(ColumnProfile(column, "date", "TIMESTAMP"))
+        else:
+            profiles.append(profile_values(column, _sample(df.iloc[:, i].tolist()), columns))
+    return profiles
+
+
+def profile_rows(columns: List[str], rows: List[Tuple[Any, ...]]) -> List[ColumnProfile]:
+    """
+    根据首批数据行推断各列的存储类型（流式导入时使用）
+
+    Args:
+        columns: 列名
+        rows: 首批数据行
+
+    Returns:
+        各列的类型推断结果
+    """
+    return [profile_values(column, _sample([row[i] for row in rows]), columns) for i, column in enumerate(columns)]
+
+
+def storage_layout(profiles: List[ColumnProfile]) -> Tuple[List[str], List[str]]:
+    """
+    建表用的列名和声明类型（影子列追加在原有列之后，NUMERIC 亲和性保留整数和小数的原始类型）
+
+    Args:
+        profiles: 各列的类型推断结果
+
+    Returns:
+        (列名列表, 声明类型列表)
+    """
+    columns = [p.name for p in profiles] + [p.shadow for p in profiles if p.shadow]
+    types = [p.declared_type for p in profiles] + ["NUMERIC" for p in profiles if p.shadow]
+    return columns, types
+
+
+def make_row_converter(profiles: List[ColumnProfile]) -> Optional[Callable[[Tuple[Any, ...]], Tuple[Any, ...]]]:
+    """
+    生成按推断类型转换数据行的函数（无法解析的值保持原样）
+
+    Args:
+        profiles: 各列的类型推断结果
+
+    Returns:
+        行转换函数，不需要转换时返回None
+    """
+    converters = []
+    for i, profile in enumerate(profiles):
+        if not profile.convert or profile.shadow:
+            continue
+        if profile.kind == "date":
+            parse = parse_date
+        else:
+            parse = partial(parse_number, allow_exponent=profile.allow_exponent)
+        converters.append((i, parse))
+    shadows = [i for i, profile in enumerate(profiles) if profile.shadow]
+    if not converters and not shadows:
+        return None
+
+    def _convert(row: Tuple[Any, ...]) -> Tuple[Any, ...]:
+        values = list(row)
+        for i, parse in converters:
+            value = values[i]
+            if not _is_blank(value):
+                parsed = parse(value)
+                if parsed is not None:
+                    values[i] = parsed
+        values.extend(parse_number(row[i]) for i in shadows)
+        return tuple(values)
+
+    return _convert
+
+
+def is_numeric_shadow(column: str, columns: Sequence[str]) -> bool:
+    """
+    判断列是否为数值影子列
+
+    Args:
+        column: 列名
+        columns: 表的全部列名
+
+    Returns:
+        是否为影子列
+    """
+    return column.endswith(NUMERIC_SHADOW_SUFFIX) and column[:-len(NUMERIC_SHADOW_SUFFIX)] in columns
@@ -0,0 +1,282 @@
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+from urllib.request import pathname2url
+
+# 每个连接的内存映射大小（字节）
+DEFAULT_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+# 每个连接的页缓存大小（KB）
+DEFAULT_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 64 * 1024))
+# 遇到锁时的等待时间（毫秒）
+DEFAULT_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+# 单条查询语句的时间预算（秒）和虚拟机指令预算（0 表示不限制）
+QUERY_TIMEOUT_SECONDS = float(os.getenv("SQL_QUERY_TIMEOUT_SECONDS", 10))
+QUERY_MAX_VM_STEPS = int(os.getenv("SQL_QUERY_MAX_VM_STEPS", 0))
+# 进度回调的调用间隔（虚拟机指令数）
+PROGRESS_HANDLER_INTERVAL = 10000
+
+
+class SQLiteConnectionPool:
+    """
+    SQLite 连接池
+
+    读连接按线程复用（同一线程上的异步任务共享，sqlite3 调用本身是同步的），
+    写连接全局唯一并由锁串行化。所有连接使用 WAL 模式并配置 mmap_size / cache_size，
+    导入写入期间读请求仍可并发执行。
+    """
+
+    def __init__(self, db_path: str, mmap_size: int = DEFAULT_MMAP_SIZE, cache_size_kb: int = DEFAULT_CACHE_SIZE_KB):
+        """
+        初始化连接池
+
+        Args:
+            db_path: 数据库文件路径
+            mmap_size: 每个连接的内存映射大小（字节）
+            cache_size_kb: 每个连接的页缓存大小（KB）
+        """
+        self.db_path = db_path
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self._local = threading.local()
+        self._writer_lock = threading.RLock()
+        self._writer_conn = None
+        self._connections: List[sqlite3.Connection] = []
+        self._registry_lock = threading.Lock()
+        self._generation = 0  # close_all 后递增，使各线程缓存的旧连接失效
+
+    def _connect(self, isolation_level=None, read_only: bool = False) -> sqlite3.Connection:
+        """创建并配置新连接（只读连接以 mode=ro 打开，不修改日志模式）"""
+        if read_only:
+            uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=isolation_level)
+            conn.execute("PRAGMA query_only=ON")
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=isolation_level)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        conn.execute(f"PRAGMA cache_size=-{self.cache_size_kb}")
+        conn.execute(f"PRAGMA busy_timeout={DEFAULT_BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        with self._registry_lock:
+            self._connections.append(conn)
+        return conn
+
+    def get_reader(self) -> sqlite3.Connection:
+        """
+        获取当前线程的读连接（自动提交模式，读完即释放快照）
+
+        Returns:
+            sqlite3 连接
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "generation", -1) != self._generation:
+            conn = self._connect(isolation_level=None)
+            self._local.conn = conn
+            self._local.generation = self._generation
+        return conn
+
+    def get_query_reader(self) -> sqlite3.Connection:
+        """
+        获取当前线程的只读连接（用于执行大模型生成的SQL，任何写操作都会被拒绝）
+
+        Returns:
+            以 mode=ro 打开的 sqlite3 连接
+        """
+        conn = getattr(self._local, "query_conn", None)
+        if conn is None or getattr(self._local, "query_generation", -1) != self._generation:
+            conn = self._connect(isolation_level=None, read_only=True)
+            self._local.query_conn = conn
+            self._local.query_generation = self._generation
+        return conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """
+        读连接上下文
+
+        Yields:
+            当前线程复用的读连接
+        """
+        yield self.get_reader()
+
+    @contextmanager
+    def writer_connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        独占写连接（不自动开启事务，调用方自行管理事务和写入参数）
+
+        Yields:
+            自动提交模式的写连接
+        """
+        with self._writer_lock:
+            if self._writer_conn is None:
+                self._writer_conn = self._connect(isolation_level=None)
+            yield self._writer_conn
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """
+        写事务上下文：正常退出时提交，异常时回滚
+
+        Yields:
+            处于事务中的写连接
+        """
+        with self.writer_connection() as conn:
+            if conn.in_transaction:
+                # 嵌套使用时并入外层事务
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+
+    def close_all(self):
+        """
+        关闭池中所有连接（删除或替换数据库文件前调用）
+        """
+        with self._writer_lock, self._registry_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._connections = []
+            self._writer_conn = None
+            self._generation += 1
+
+    def get_stats(self) -> Dict:
+        """
+        获取连接池统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._registry_lock:
+            return {
+                "db_path": self.db_path,
+                "open_connections": len(self._connections),
+                "mmap_size": self.mmap_size,
+                "cache_size_kb": self.cache_size_kb
+            }
+
+class QueryGuard:
+    """
+    单条查询语句的执行预算
+
+    通过进度回调检查时间和虚拟机指令预算，超出时中止语句（sqlite3 抛出 OperationalError: interrupted）；
+    另设定时器在超时后调用 conn.interrupt() 兜底，cancel() 可由其他线程随时取消正在执行的语句。
+    """
+
+    def __init__(self, conn: sqlite3.Connection, timeout_seconds: float = QUERY_TIMEOUT_SECONDS,
+                 max_vm_steps: int = QUERY_MAX_VM_STEPS):
+        """
+        初始化执行预算
+
+        Args:
+            conn: 执行语句的连接
+            timeout_seconds: 时间预算（秒），0 表示不限制
+            max_vm_steps: 虚拟机指令预算，0 表示不限制
+        """
+        self.conn = conn
+        self.timeout_seconds = timeout_seconds
+        self.max_vm_steps = max_vm_steps
+        self.steps = 0
+        self.reason: Optional[str] = None  # 中止原因：timeout / steps / cancelled
+        self._deadline = None
+        self._timer: Optional[threading.Timer] = None
+
+    def _check(self) -> int:
+        """进度回调：返回非零值时中止当前语句"""
+        self.steps += PROGRESS_HANDLER_INTERVAL
+        if self.reason is not None:
+            return 1
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            self.reason = "timeout"
+            return 1
+        if self.max_vm_steps and self.steps > self.max_vm_steps:
+            self.reason = "steps"
+            return 1
+        return 0
+
+    def _on_timer(self):
+        """定时器兜底：超时后直接中断连接上的语句"""
+        if self.reason is None:
+            self.reason = "timeout"
+        self.conn.interrupt()
+
+    def cancel(self):
+        """取消正在执行的语句（可从其他线程调用）"""
+        self.reason = "cancelled"
+        self.conn.interrupt()
+
+    def describe(self) -> str:
+        """中止原因的说明文字"""
+        if self.reason == "timeout":
+            return f"查询超时（超过 {self.timeout_seconds:g} 秒）"
+        if self.reason == "steps":
+            return f"查询计算量超出预算（超过 {self.max_vm_steps} 步）"
+        if self.reason == "cancelled":
+            return "查询已取消"
+        return ""
+
+    def __enter__(self) -> "QueryGuard":
+        # 不重置 reason：进入前已被 cancel() 的语句在第一次进度回调时即被中止
+        self.steps = 0
+        if self.timeout_seconds:
+            self._deadline = time.monotonic() + self.timeout_seconds
+            self._timer = threading.Timer(self.timeout_seconds + 1.0, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+        self.conn.set_progress_handler(self._check, PROGRESS_HANDLER_INTERVAL)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.conn.set_progress_handler(None, 0)
+        return False
+
+# 全局连接池实例 {数据库绝对路径: 连接池}
+_connection_pools: Dict[str, SQLiteConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+def get_connection_pool(db_path: str = "database.db") -> SQLiteConnectionPool:
+    """
+    获取数据库对应的连接池单例
+
+    Args:
+        db_path: 数据库文件路径
+
+    Returns:
+        连接池实例
+    """
+    key = os.path.abspath(db_path)
+    pool = _connection_pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _connection_pools.get(key)
+            if pool is None:
+                pool = SQLiteConnectionPool(db_path)
+                _connection_pools[key] = pool
+    return pool
+
+def close_connection_pool(db_path: str = "database.db"):
+    """
+    关闭并移除数据库对应的连接池
+
+    Args:
+        db_path: 数据库文件路径
+    """
+    with _pools_lock:
+        pool = _connection_pools.pop(os.path.abspath(db_path), None)
+    if pool is not None:
+        pool.close_all()
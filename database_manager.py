@@ -1,10 +1,58 @@
 import os
 import sqlite3
 import pandas as pd
-import hashlib
 import json
-from typing import Dict, List, Tuple, Optional
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Tuple, Optional
 from datetime import datetime
+from file_fingerprint import get_file_hash
+from parsed_sheet_store import get_parsed_sheet_store
+from sqlite_bulk_loader import BulkSqliteLoader, estimate_sheet_rows
+from connection_pool import get_connection_pool
+from schema_catalog import get_schema_catalog
+from fts_index import build_fts_index, drop_fts_index
+
+# 超过该行数的工作表直接从Excel流式导入SQLite，不整表解析为DataFrame
+STREAM_THRESHOLD_ROWS = int(os.getenv("INGEST_STREAM_ROWS", 50000))
+# 元数据表（不属于用户数据，不参与列名映射等处理）
+METADATA_TABLES = ("file_versions", "table_mappings", "enhanced_table_mappings",
+                   "column_mapping_registry", "column_mappings")
+
+
+def _inspect_workbook(excel_path: str) -> Dict[str, int]:
+    """
+    获取工作簿的工作表列表及行数估计（进程池任务，需为模块级函数）
+    
+    Args:
+        excel_path: Excel文件路径
+        
+    Returns:
+        {工作表名: 估计行数}
+    """
+    return estimate_sheet_rows(excel_path)
+
+def _parse_sheet(excel_path: str, sheet_name: str, estimated_rows: int = 0) -> Tuple[str, Optional[pd.DataFrame], float]:
+    """
+    解析单个工作表（进程池任务，需为模块级函数）
+    
+    超过流式导入阈值的大表不在此解析，返回None，由写入方直接从Excel流式导入，
+    避免整表DataFrame在进程间传递和驻留内存。
+    
+    Args:
+        excel_path: Excel文件路径
+        sheet_name: 工作表名
+        estimated_rows: 估计行数
+        
+    Returns:
+        (工作表名, DataFrame 或 None, 解析耗时秒数)
+    """
+    if estimated_rows > STREAM_THRESHOLD_ROWS:
+        return sheet_name, None, 0.0
+    started = time.perf_counter()
+    df = pd.read_excel(excel_path, sheet_name=sheet_name)
+    return sheet_name, df, time.perf_counter() - started
+
 
 class DatabaseManager:
     """数据库管理器 - 基于增量更新策略"""
@@ -15,87 +63,126 @@ class DatabaseManager:
         
         Args:
             db_path: 数据库文件路径
-            registry_file: 文件注册表路径，用于记录文件状态
+            registry_file: 旧版JSON文件注册表路径，存在时一次性迁移到 file_versions 表
         """
         self.db_path = db_path
         self.registry_file = registry_file
-        self.file_registry = self._load_file_registry()
+        self.pool = get_connection_pool(db_path)
+        self.last_ingest_timings: Dict[str, Dict[str, float]] = {}  # 最近一次导入各文件的耗时
         self._init_database()
+        self._migrate_file_registry()
+        self.file_registry = self._load_file_registry()
     
     def _load_file_registry(self) -> Dict[str, str]:
         """
-        加载文件注册表
+        从 file_versions 表加载文件注册表
         
         Returns:
             文件注册表字典，键为文件名，值为文件哈希
         """
-        if os.path.exists(self.registry_file):
-            try:
-                with open(self.registry_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"⚠️ 加载文件注册表失败: {e}")
-        return {}
+        try:
+            conn = self.pool.get_reader()
+            return dict(conn.execute("SELECT file_name, file_hash FROM file_versions WHERE status = 'active'"))
+        except Exception as e:
+            print(f"⚠️ 加载文件注册表失败: {e}")
+            return {}
     
-    def _save_file_registry(self):
+    def _migrate_file_registry(self):
         """
-        保存文件注册表到文件
+        将旧版 file_registry.json 一次性迁移到 file_versions 表，迁移后重命名为 .migrated
         """
+        if not os.path.exists(self.registry_file):
+            return
         try:
-            with open(self.registry_file, 'w', encoding='utf-8') as f:
-                json.dump(self.file_registry, f, ensure_ascii=False, indent=2)
+            with open(self.registry_file, 'r', encoding='utf-8') as f:
+                legacy_registry = json.load(f)
+            
+            with self.pool.writer() as conn:
+                for file_name, file_hash in legacy_registry.items():
+                    table_count = conn.execute(
+                        "SELECT COUNT(*) FROM table_mappings WHERE file_name = ?", (file_name,)
+                    ).fetchone()[0]
+                    # 只迁移仍有数据表的文件，已存在的版本记录以数据库为准
+                    if table_count:
+                        conn.execute("""
+                            INSERT OR IGNORE INTO file_versions 
+                            (file_name, file_hash, last_updated, table_count, status) 
+                            VALUES (?, ?, CURRENT_TIMESTAMP, ?, 'active')
+                        """, (file_name, file_hash, table_count))
+            
+            os.replace(self.registry_file, self.registry_file + ".migrated")
+            print(f"📦 文件注册表已迁移到数据库: {len(legacy_registry)} 条记录")
         except Exception as e:
-            print(f"⚠️ 保存文件注册表失败: {e}")
+            print(f"⚠️ 迁移文件注册表失败: {e}")
     
     def _init_database(self):
         """
         初始化数据库，创建必要的元数据表
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # 创建文件版本表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS file_versions (
-                file_name TEXT PRIMARY KEY,
-                file_hash TEXT NOT NULL,
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                table_count INTEGER DEFAULT 0,
-                status TEXT DEFAULT 'active'
-            )
-        """)
-        
-        # 创建表映射表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS table_mappings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                file_name TEXT NOT NULL,
-                sheet_name TEXT NOT NULL,
-                table_name TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(file_name, sheet_name)
-            )
-        """)
-        
-        # 创建增强的表映射表（方案1：包含excel_name的映射结构）
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS enhanced_table_mappings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                excel_name TEXT NOT NULL,
-                sheet_name TEXT NOT NULL,
-                table_name TEXT NOT NULL,
-                file_path TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(excel_name, sheet_name)
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
+        with self.pool.writer() as conn:
+            cursor = conn.cursor()
+            
+            # 创建文件版本表
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS file_versions (
+                    file_name TEXT PRIMARY KEY,
+                    file_hash TEXT NOT NULL,
+                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    table_count INTEGER DEFAULT 0,
+                    status TEXT DEFAULT 'active'
+                )
+            """)
+            
+            # 创建表映射表
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS table_mappings (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    file_name TEXT NOT NULL,
+                    sheet_name TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(file_name, sheet_name)
+                )
+            """)
+            
+            # 创建增强的表映射表（方案1：包含excel_name的映射结构）
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS enhanced_table_mappings (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    excel_name TEXT NOT NULL,
+                    sheet_name TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(excel_name, sheet_name)
+                )
+            """)
+            
+            # 创建列名映射注册表（每个已生成映射的表一条记录）
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS column_mapping_registry (
+                    table_name TEXT PRIMARY KEY,
+                    generated_at TEXT NOT NULL
+                )
+            """)
+            
+            # 创建列名映射表（列名 → 业务含义）
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS column_mappings (
+                    table_name TEXT NOT NULL,
+                    column_name TEXT NOT NULL,
+                    business_meaning TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    PRIMARY KEY (table_name, column_name)
+                )
+            """)
+            
+            # 为按文件查询表映射建立索引
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_table_mappings_file ON table_mappings(file_name)")
     
     def get_file_hash(self, file_path: str) -> str:
         """
-        计算文件的MD5哈希值
+        计算文件的MD5哈希值（文件大小、修改时间和inode未变时直接复用进程内记忆的结果）
         
         Args:
             file_path: 文件路径
@@ -103,16 +190,27 @@ class DatabaseManager:
         Returns:
             文件的MD5哈希值
         """
-        hash_md5 = hashlib.md5()
         try:
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
+            return get_file_hash(file_path)
         except Exception as e:
             print(f"⚠️ 计算文件哈希失败 {file_path}: {e}")
             return ""
     
+    def _check_file_changed(self, excel_path: str) -> Tuple[bool, str]:
+        """
+        检查文件内容是否相对注册表发生变化
+
+        Args:
+            excel_path: Excel文件路径
+
+        Returns:
+            (是否变化, 当前文件哈希)，哈希计算失败时返回 (False, "")
+        """
+        current_hash = self.get_file_hash(excel_path)
+        if not current_hash:
+            return False, ""
+        return self.file_registry.get(os.path.basename(excel_path)) != current_hash, current_hash
+    
     def update_if_changed(self, excel_path: str) -> Tuple[bool, Dict[str, str]]:
         """
         检查文件是否发生变化，如有变化则更新数据库
@@ -128,14 +226,13 @@ class DatabaseManager:
             return False, {}
         
         file_key = os.path.basename(excel_path)
-        current_hash = self.get_file_hash(excel_path)
+        changed, current_hash = self._check_file_changed(excel_path)
         
         if not current_hash:
             return False, {}
         
         # 检查是否需要更新
-        stored_hash = self.file_registry.get(file_key)
-        if stored_hash == current_hash:
+        if not changed:
             # 文件未变化，从数据库获取现有映射
             table_mapping = self._get_table_mapping(file_key)
             print(f"📋 文件未变化，使用现有映射: {file_key}")
@@ -143,82 +240,142 @@ class DatabaseManager:
         
         # 文件发生变化或首次处理，更新数据库
         print(f"🔄 检测到文件变化，更新数据库: {file_key}")
-        table_mapping = self._update_database(excel_path)
+        table_mapping = self._update_database(excel_path, current_hash)
         
-        if table_mapping:
-            # 更新文件注册表
-            self.file_registry[file_key] = current_hash
-            self._save_file_registry()
-            
-            # 更新数据库中的文件版本信息
-            self._update_file_version(file_key, current_hash, len(table_mapping))
+        return self._record_file_update(file_key, current_hash, table_mapping), table_mapping
+    
+    def _record_file_update(self, file_key: str, file_hash: str, table_mapping: Dict[str, str]) -> bool:
+        """
+        导入成功后更新内存中的文件注册表（文件版本已在导入事务中写入数据库）
+        
+        Args:
+            file_key: 文件名
+            file_hash: 文件哈希
+            table_mapping: 表映射字典
             
-            print(f"✅ 数据库更新完成: {file_key}")
-            return True, table_mapping
+        Returns:
+            是否记录成功（表映射为空时视为导入失败）
+        """
+        if not table_mapping:
+            return False
+        
+        # 更新文件注册表
+        self.file_registry[file_key] = file_hash
+        
+        print(f"✅ 数据库更新完成: {file_key}")
+        return True
+    
+    @staticmethod
+    def make_table_name(file_name: str, sheet_name: str) -> str:
+        """
+        根据Excel文件名和工作表名生成数据库表名
         
-        return False, {}
+        Args:
+            file_name: Excel文件名
+            sheet_name: 工作表名
+            
+        Returns:
+            数据库表名
+        """
+        excel_base = os.path.splitext(file_name)[0]
+        return f"table_{''.join(filter(str.isalnum, excel_base))}_{''.join(filter(str.isalnum, sheet_name))}"
     
-    def _update_database(self, excel_path: str) -> Dict[str, str]:
+    def _update_database(self, excel_path: str, file_hash: str = None) -> Dict[str, str]:
         """
         更新数据库，将Excel文件转换为SQLite表
         
         Args:
             excel_path: Excel文件路径
+            file_hash: 文件哈希，提供时保留解析结果供表头识别和列名映射复用
             
         Returns:
             表映射字典 {工作表名: 数据库表名}
         """
         try:
-            excel_file = pd.ExcelFile(excel_path)
-            sheet_names = excel_file.sheet_names
+            frames = {}
+            for sheet_name, estimated_rows in _inspect_workbook(excel_path).items():
+                try:
+                    frames[sheet_name] = _parse_sheet(excel_path, sheet_name, estimated_rows)[1]
+                except Exception as e:
+                    print(f"⚠️ 处理工作表失败 {sheet_name}: {e}")
+            
+            table_mapping = self._write_workbook(excel_path, frames, file_hash)
+            if file_hash and table_mapping:
+                get_parsed_sheet_store().put_workbook(excel_path, file_hash, frames, table_mapping)
+            return table_mapping
+            
+        except Exception as e:
+            print(f"❌ 更新数据库失败 {excel_path}: {e}")
+            return {}
+    
+    def _write_workbook(self, excel_path: str, frames: Dict[str, Optional[pd.DataFrame]],
+                        file_hash: str = None) -> Dict[str, str]:
+        """
+        将工作表写入SQLite（所有写入都经由此方法串行执行）
+        
+        整个工作簿（数据表、表映射和文件版本）在一个事务内导入；值为None的工作表（大表）
+        直接从Excel流式导入，导入后在 frames 中替换为前若干行样本。数据表导入后随即重建其文本列的全文索引。
+        
+        Args:
+            excel_path: Excel文件路径
+            frames: 工作表 {工作表名: 已解析的DataFrame 或 None}
+            file_hash: 文件哈希，提供且导入成功时同时记录文件版本
             
-            conn = sqlite3.connect(self.db_path)
+        Returns:
+            表映射字典 {工作表名: 数据库表名}
+        """
+        try:
             table_mapping = {}
             file_name = os.path.basename(excel_path)
             
-            # 清理旧的表映射记录
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM table_mappings WHERE file_name = ?", (file_name,))
-            
-            for sheet_name in sheet_names:
-                try:
-                    df = pd.read_excel(excel_file, sheet_name=sheet_name)
-                    
+            with BulkSqliteLoader(self.pool) as loader:
+                # 清理旧的表映射记录
+                cursor = loader.cursor()
+                cursor.execute("DELETE FROM table_mappings WHERE file_name = ?", (file_name,))
+                
+                for sheet_name, df in list(frames.items()):
                     # 生成表名
-                    excel_base = os.path.splitext(file_name)[0]
-                    table_name = f"table_{''.join(filter(str.isalnum, excel_base))}_{''.join(filter(str.isalnum, sheet_name))}"
-                    
-                    # 删除旧表（如果存在）
-                    cursor.execute(f"DROP TABLE IF EXISTS [{table_name}]")
-                    
-                    # 创建新表
-                    df.to_sql(table_name, conn, if_exists='replace', index=False)
-                    table_mapping[sheet_name] = table_name
-                    
-                    # 记录表映射（原有方式）
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO table_mappings 
-                        (file_name, sheet_name, table_name) 
-                        VALUES (?, ?, ?)
-                    """, (file_name, sheet_name, table_name))
-                    
-                    # 记录增强表映射（方案1：包含excel_name）
-                    excel_name = os.path.basename(excel_path)
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO enhanced_table_mappings 
-                        (excel_name, sheet_name, table_name, file_path) 
-                        VALUES (?, ?, ?, ?)
-                    """, (excel_name, sheet_name, table_name, excel_path))
-                    
-                    print(f"📊 已处理工作表: {sheet_name} -> {table_name}")
-                    
-                except Exception as e:
-                    print(f"⚠️ 处理工作表失败 {sheet_name}: {e}")
-                    continue
-            
-            conn.commit()
-            conn.close()
+                    table_name = self.make_table_name(file_name, sheet_name)
+                    cursor.execute("SAVEPOINT sheet_import")
+                    try:
+                        # 重建表并批量导入
+                        if df is None:
+                            row_count, frames[sheet_name] = loader.load_excel_sheet(table_name, excel_path, sheet_name)
+                        else:
+                            row_count = loader.load_dataframe(table_name, df)
+                        fts_columns = build_fts_index(cursor, table_name)
+                        table_mapping[sheet_name] = table_name
+                        
+                        # 记录表映射（原有方式）
+                        cursor.execute("""
+                            INSERT OR REPLACE INTO table_mappings 
+                            (file_name, sheet_name, table_name) 
+                            VALUES (?, ?, ?)
+                        """, (file_name, sheet_name, table_name))
+                        
+                        # 记录增强表映射（方案1：包含excel_name）
+                        cursor.execute("""
+                            INSERT OR REPLACE INTO enhanced_table_mappings 
+                            (excel_name, sheet_name, table_name, file_path) 
+                            VALUES (?, ?, ?, ?)
+                        """, (file_name, sheet_name, table_name, excel_path))
+                        
+                        cursor.execute("RELEASE SAVEPOINT sheet_import")
+                        print(f"📊 已处理工作表: {sheet_name} -> {table_name} ({row_count} 行"
+                              + (f"，全文索引 {len(fts_columns)} 列" if fts_columns else "") + ")")
+                        
+                    except Exception as e:
+                        cursor.execute("ROLLBACK TO SAVEPOINT sheet_import")
+                        cursor.execute("RELEASE SAVEPOINT sheet_import")
+                        frames.pop(sheet_name, None)
+                        print(f"⚠️ 处理工作表失败 {sheet_name}: {e}")
+                        continue
+                
+                if file_hash and table_mapping:
+                    # 并入导入事务
+                    self._update_file_version(file_name, file_hash, len(table_mapping))
             
+            get_schema_catalog().invalidate(table_mapping.values())
             return table_mapping
             
         except Exception as e:
@@ -249,7 +406,7 @@ class DatabaseManager:
             表映射字典
         """
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.get_reader()
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -259,7 +416,6 @@ class DatabaseManager:
             """, (file_name,))
             
             results = cursor.fetchall()
-            conn.close()
             
             return {sheet_name: table_name for sheet_name, table_name in results}
             
@@ -278,7 +434,7 @@ class DatabaseManager:
             增强映射字典 {(excel_name, sheet_name): table_name}
         """
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.get_reader()
             cursor = conn.cursor()
             
             if excel_name:
@@ -294,7 +450,6 @@ class DatabaseManager:
                 """)
             
             results = cursor.fetchall()
-            conn.close()
             
             return {(excel_name, sheet_name): table_name for excel_name, sheet_name, table_name in results}
             
@@ -314,7 +469,7 @@ class DatabaseManager:
             对应的数据库表名，如果未找到返回None
         """
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.get_reader()
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -324,7 +479,6 @@ class DatabaseManager:
             """, (excel_name, sheet_name))
             
             result = cursor.fetchone()
-            conn.close()
             
             return result[0] if result else None
             
@@ -342,27 +496,63 @@ class DatabaseManager:
             table_count: 表数量
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO file_versions 
-                (file_name, file_hash, last_updated, table_count, status) 
-                VALUES (?, ?, CURRENT_TIMESTAMP, ?, 'active')
-            """, (file_name, file_hash, table_count))
-            
-            conn.commit()
-            conn.close()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("""
+                    INSERT OR REPLACE INTO file_versions 
+                    (file_name, file_hash, last_updated, table_count, status) 
+                    VALUES (?, ?, CURRENT_TIMESTAMP, ?, 'active')
+                """, (file_name, file_hash, table_count))
             
         except Exception as e:
             print(f"⚠️ 更新文件版本失败 {file_name}: {e}")
     
-    def check_all_files(self, excel_dir: str) -> Dict[str, Dict[str, str]]:
+    def remove_file(self, file_name: str) -> List[str]:
+        """
+        移除已删除文件对应的数据库表和映射记录
+
+        Args:
+            file_name: 文件名
+
+        Returns:
+            被删除的数据库表名列表
+        """
+        try:
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute("SELECT table_name FROM table_mappings WHERE file_name = ?", (file_name,))
+                table_names = [row[0] for row in cursor.fetchall()]
+
+                for table_name in table_names:
+                    drop_fts_index(cursor, table_name)
+                    cursor.execute(f"DROP TABLE IF EXISTS [{table_name}]")
+
+                cursor.execute("DELETE FROM table_mappings WHERE file_name = ?", (file_name,))
+                cursor.execute("DELETE FROM enhanced_table_mappings WHERE excel_name = ?", (file_name,))
+                cursor.execute("DELETE FROM file_versions WHERE file_name = ?", (file_name,))
+
+            get_schema_catalog().invalidate(table_names)
+            self.file_registry.pop(file_name, None)
+
+            print(f"🗑️ 已移除文件及其数据表: {file_name} ({len(table_names)} 个表)")
+            return table_names
+
+        except Exception as e:
+            print(f"⚠️ 移除文件失败 {file_name}: {e}")
+            return []
+
+    def check_all_files(self, excel_dir: str, max_workers: Optional[int] = None) -> Dict[str, Dict[str, str]]:
         """
         启动时检查所有Excel文件并更新数据库
         
+        变化的工作簿在进程池中并行解析（按工作表粒度分发），解析结果由当前进程
+        作为唯一写入方串行写入SQLite。
+        
         Args:
             excel_dir: Excel文件目录
+            max_workers: 解析进程数，默认读取环境变量 INGEST_WORKERS；小于等于1时顺序处理
             
         Returns:
             所有文件的表映射字典 {文件名: {工作表名: 表名}}
@@ -382,20 +572,258 @@ class DatabaseManager:
         
         print(f"📋 找到 {len(excel_files)} 个Excel文件")
         
+        # 先用文件指纹筛出需要重新导入的文件
+        changed_files = {}
         for excel_file in excel_files:
             excel_path = os.path.join(excel_dir, excel_file)
-            updated, table_mapping = self.update_if_changed(excel_path)
-            
-            if table_mapping:
-                all_mappings[excel_file] = table_mapping
-                status = "更新" if updated else "已存在"
-                print(f"✅ {status}: {excel_file} ({len(table_mapping)} 个工作表)")
+            changed, current_hash = self._check_file_changed(excel_path)
+            if changed:
+                changed_files[excel_file] = current_hash
+            elif current_hash:
+                all_mappings[excel_file] = self._get_table_mapping(excel_file)
+                print(f"✅ 已存在: {excel_file} ({len(all_mappings[excel_file])} 个工作表)")
+        
+        if max_workers is None:
+            max_workers = int(os.getenv("INGEST_WORKERS", min(4, os.cpu_count() or 1)))
+        
+        self.last_ingest_timings = {}
+        if changed_files:
+            started = time.perf_counter()
+            if max_workers > 1:
+                updated_mappings = self._ingest_files_parallel(excel_dir, changed_files, max_workers)
             else:
-                print(f"❌ 处理失败: {excel_file}")
+                updated_mappings = self._ingest_files_sequential(excel_dir, changed_files)
+            all_mappings.update(updated_mappings)
+            
+            for excel_file in changed_files:
+                if excel_file in updated_mappings:
+                    timing = self.last_ingest_timings.get(excel_file, {})
+                    print(f"✅ 更新: {excel_file} ({len(updated_mappings[excel_file])} 个工作表, "
+                          f"解析 {timing.get('parse_seconds', 0):.2f}s, 写入 {timing.get('write_seconds', 0):.2f}s)")
+                else:
+                    print(f"❌ 处理失败: {excel_file}")
+            print(f"⏱️ 导入 {len(changed_files)} 个变化文件耗时 {time.perf_counter() - started:.2f}s (解析进程数: {max(max_workers, 1)})")
         
         print(f"🎯 文件检查完成，共处理 {len(all_mappings)} 个文件")
         return all_mappings
     
+    def _ingest_files_sequential(self, excel_dir: str, changed_files: Dict[str, str]) -> Dict[str, Dict[str, str]]:
+        """
+        顺序解析并写入变化的文件
+        
+        Args:
+            excel_dir: Excel文件目录
+            changed_files: 变化的文件 {文件名: 文件哈希}
+            
+        Returns:
+            导入成功的文件表映射 {文件名: {工作表名: 表名}}
+        """
+        mappings = {}
+        for excel_file, file_hash in changed_files.items():
+            excel_path = os.path.join(excel_dir, excel_file)
+            print(f"🔄 检测到文件变化，更新数据库: {excel_file}")
+            
+            parse_started = time.perf_counter()
+            frames = {}
+            try:
+                for sheet_name, estimated_rows in _inspect_workbook(excel_path).items():
+                    try:
+                        frames[sheet_name] = _parse_sheet(excel_path, sheet_name, estimated_rows)[1]
+                    except Exception as e:
+                        print(f"⚠️ 处理工作表失败 {sheet_name}: {e}")
+            except Exception as e:
+                print(f"❌ 更新数据库失败 {excel_path}: {e}")
+            parse_seconds = time.perf_counter() - parse_started
+            
+            self._finish_file_ingest(excel_path, file_hash, frames, parse_seconds, mappings)
+        return mappings
+    
+    def _ingest_files_parallel(self, excel_dir: str, changed_files: Dict[str, str], max_workers: int) -> Dict[str, Dict[str, str]]:
+        """
+        在进程池中并行解析工作表，当前进程作为唯一写入方按文件写入SQLite
+        
+        Args:
+            excel_dir: Excel文件目录
+            changed_files: 变化的文件 {文件名: 文件哈希}
+            max_workers: 解析进程数
+            
+        Returns:
+            导入成功的文件表映射 {文件名: {工作表名: 表名}}
+        """
+        mappings = {}
+        try:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        except Exception as e:
+            print(f"⚠️ 无法创建解析进程池，改为顺序处理: {e}")
+            return self._ingest_files_sequential(excel_dir, changed_files)
+        
+        with executor:
+            # 第一阶段：并行获取各工作簿的工作表列表
+            list_futures = {
+                executor.submit(_inspect_workbook, os.path.join(excel_dir, excel_file)): excel_file
+                for excel_file in changed_files
+            }
+            
+            # 第二阶段：每个工作表一个解析任务
+            pending = {}  # {文件名: {"sheets": [...], "frames": {}, "remaining": n, "parse_seconds": 0.0}}
+            sheet_futures = {}
+            for future in as_completed(list_futures):
+                excel_file = list_futures[future]
+                excel_path = os.path.join(excel_dir, excel_file)
+                try:
+                    sheet_rows = future.result()
+                    sheet_names = list(sheet_rows.keys())
+                except Exception as e:
+                    print(f"❌ 更新数据库失败 {excel_path}: {e}")
+                    continue
+                print(f"🔄 检测到文件变化，并行解析 {len(sheet_names)} 个工作表: {excel_file}")
+                pending[excel_file] = {"sheets": sheet_names, "frames": {}, "remaining": len(sheet_names), "parse_seconds": 0.0}
+                if not sheet_names:
+                    self._finish_file_ingest(excel_path, changed_files[excel_file], {}, 0.0, mappings)
+                for sheet_name in sheet_names:
+                    sheet_futures[executor.submit(_parse_sheet, excel_path, sheet_name, sheet_rows[sheet_name])] = (excel_file, sheet_name)
+            
+            # 解析完成一个文件的全部工作表后立即写入，写入在当前进程串行进行
+            for future in as_completed(sheet_futures):
+                excel_file, sheet_name = sheet_futures[future]
+                state = pending[excel_file]
+                try:
+                    _, df, seconds = future.result()
+                    state["frames"][sheet_name] = df
+                    state["parse_seconds"] += seconds
+                except Exception as e:
+                    print(f"⚠️ 处理工作表失败 {sheet_name}: {e}")
+                state["remaining"] -= 1
+                
+                if state["remaining"] == 0:
+                    # 按原工作表顺序写入
+                    frames = {name: state["frames"][name] for name in state["sheets"] if name in state["frames"]}
+                    excel_path = os.path.join(excel_dir, excel_file)
+                    self._finish_file_ingest(excel_path, changed_files[excel_file], frames, state["parse_seconds"], mappings)
+                    del pending[excel_file]
+        
+        return mappings
+    
+    def _finish_file_ingest(self, excel_path: str, file_hash: str, frames: Dict[str, pd.DataFrame],
+                            parse_seconds: float, mappings: Dict[str, Dict[str, str]]):
+        """
+        写入单个文件已解析的工作表并记录耗时
+        
+        Args:
+            excel_path: Excel文件路径
+            file_hash: 文件哈希
+            frames: 已解析的工作表 {工作表名: DataFrame}
+            parse_seconds: 解析耗时（各工作表累计）
+            mappings: 导入成功的文件表映射，成功时原地更新
+        """
+        excel_file = os.path.basename(excel_path)
+        write_started = time.perf_counter()
+        table_mapping = self._write_workbook(excel_path, frames, file_hash) if frames else {}
+        if self._record_file_update(excel_file, file_hash, table_mapping):
+            mappings[excel_file] = table_mapping
+            # 保留解析结果，供后续表头识别和列名映射复用，避免再次解析Excel
+            get_parsed_sheet_store().put_workbook(excel_path, file_hash, frames, table_mapping)
+        self.last_ingest_timings[excel_file] = {
+            "sheets": len(frames),
+            "parse_seconds": round(parse_seconds, 3),
+            "write_seconds": round(time.perf_counter() - write_started, 3)
+        }
+    
+    def save_column_mapping(self, table_name: str, mapping: Dict[str, str], generated_at: str = None) -> str:
+        """
+        保存表的列名映射（替换原有映射，单个事务内完成）
+
+        Args:
+            table_name: 表名
+            mapping: 列名映射字典 {列名: 业务含义}
+            generated_at: 生成时间，为None时使用当前时间
+
+        Returns:
+            生成时间
+        """
+        generated_at = generated_at or datetime.now().isoformat()
+        with self.pool.writer() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO column_mapping_registry (table_name, generated_at)
+                VALUES (?, ?)
+            """, (table_name, generated_at))
+            conn.execute("DELETE FROM column_mappings WHERE table_name = ?", (table_name,))
+            conn.executemany("""
+                INSERT OR REPLACE INTO column_mappings (table_name, column_name, business_meaning, position)
+                VALUES (?, ?, ?, ?)
+            """, [(table_name, str(column), str(meaning), i) for i, (column, meaning) in enumerate(mapping.items())])
+        return generated_at
+
+    def get_column_mapping(self, table_name: str) -> Optional[Dict[str, str]]:
+        """
+        获取表的列名映射
+
+        Args:
+            table_name: 表名
+
+        Returns:
+            列名映射字典，未生成过映射时返回None
+        """
+        conn = self.pool.get_reader()
+        if conn.execute("SELECT 1 FROM column_mapping_registry WHERE table_name = ?", (table_name,)).fetchone() is None:
+            return None
+        return dict(conn.execute("""
+            SELECT column_name, business_meaning FROM column_mappings
+            WHERE table_name = ? ORDER BY position
+        """, (table_name,)))
+
+    def get_table_versions(self, table_names: Iterable[str]) -> Dict[str, str]:
+        """
+        获取数据表的版本（来源文件的哈希和最后导入时间），文件重新导入后版本改变
+
+        Args:
+            table_names: 表名列表
+
+        Returns:
+            {表名: 版本}，不属于任何已接入文件的表不包含在结果中
+        """
+        table_names = list(table_names)
+        if not table_names:
+            return {}
+        placeholders = ",".join("?" for _ in table_names)
+        conn = self.pool.get_reader()
+        return {
+            table_name: f"{file_hash}@{last_updated}"
+            for table_name, file_hash, last_updated in conn.execute(f"""
+                SELECT tm.table_name, fv.file_hash, fv.last_updated
+                FROM table_mappings tm JOIN file_versions fv ON fv.file_name = tm.file_name
+                WHERE tm.table_name IN ({placeholders}) AND fv.status = 'active'
+            """, table_names)
+        }
+
+    def get_column_mapping_registry(self) -> Dict[str, Dict[str, str]]:
+        """
+        获取列名映射注册表
+
+        Returns:
+            {表名: {"generated_at": 生成时间}}
+        """
+        conn = self.pool.get_reader()
+        return {
+            table_name: {"generated_at": generated_at}
+            for table_name, generated_at in conn.execute("SELECT table_name, generated_at FROM column_mapping_registry")
+        }
+
+    def delete_column_mapping(self, table_name: str) -> bool:
+        """
+        删除表的列名映射
+
+        Args:
+            table_name: 表名
+
+        Returns:
+            是否存在并已删除
+        """
+        with self.pool.writer() as conn:
+            deleted = conn.execute("DELETE FROM column_mapping_registry WHERE table_name = ?", (table_name,)).rowcount
+            conn.execute("DELETE FROM column_mappings WHERE table_name = ?", (table_name,))
+        return deleted > 0
+
     def get_database_info(self) -> Dict:
         """
         获取数据库信息
@@ -404,7 +832,7 @@ class DatabaseManager:
             数据库统计信息
         """
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.get_reader()
             cursor = conn.cursor()
             
             # 获取文件统计
@@ -418,8 +846,6 @@ class DatabaseManager:
             # 获取数据库大小
             db_size = os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
             
-            conn.close()
-            
             return {
                 "database_path": self.db_path,
                 "database_size_mb": round(db_size / (1024 * 1024), 2),
@@ -437,35 +863,34 @@ class DatabaseManager:
         清理孤立的表（没有对应文件的表）
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
             
-            # 获取所有用户表
-            cursor.execute("""
-                SELECT name FROM sqlite_master 
-                WHERE type='table' AND name LIKE 'table_%'
-            """)
-            all_tables = [row[0] for row in cursor.fetchall()]
+                # 获取所有用户表
+                cursor.execute("""
+                    SELECT name FROM sqlite_master 
+                    WHERE type='table' AND name LIKE 'table_%'
+                """)
+                all_tables = [row[0] for row in cursor.fetchall()]
             
-            # 获取映射中的表
-            cursor.execute("SELECT DISTINCT table_name FROM table_mappings")
-            mapped_tables = [row[0] for row in cursor.fetchall()]
+                # 获取映射中的表
+                cursor.execute("SELECT DISTINCT table_name FROM table_mappings")
+                mapped_tables = [row[0] for row in cursor.fetchall()]
             
-            # 找出孤立的表
-            orphaned_tables = set(all_tables) - set(mapped_tables)
+                # 找出孤立的表
+                orphaned_tables = set(all_tables) - set(mapped_tables)
             
-            if orphaned_tables:
-                print(f"🧹 发现 {len(orphaned_tables)} 个孤立表，开始清理...")
-                for table_name in orphaned_tables:
-                    cursor.execute(f"DROP TABLE IF EXISTS [{table_name}]")
-                    print(f"🗑️ 已删除孤立表: {table_name}")
+                if orphaned_tables:
+                    print(f"🧹 发现 {len(orphaned_tables)} 个孤立表，开始清理...")
+                    for table_name in orphaned_tables:
+                        drop_fts_index(cursor, table_name)
+                        cursor.execute(f"DROP TABLE IF EXISTS [{table_name}]")
+                        print(f"🗑️ 已删除孤立表: {table_name}")
                 
-                conn.commit()
-                print(f"✅ 孤立表清理完成")
-            else:
-                print(f"✨ 未发现孤立表")
-            
-            conn.close()
+                    print(f"✅ 孤立表清理完成")
+                    get_schema_catalog().invalidate(orphaned_tables)
+                else:
+                    print(f"✨ 未发现孤立表")
             
         except Exception as e:
             print(f"⚠️ 清理孤立表失败: {e}")
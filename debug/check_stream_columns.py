@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlite_bulk_loader import iter_excel_rows
+
+
+def check_stream_columns(excel_dir: str = "uploads") -> bool:
+    """
+    检查流式读取与 pandas 读取同一工作表得到的列名和行数是否一致
+    （行数超过 INGEST_STREAM_ROWS 的工作表走流式导入，其余走 pandas，两条路径的表结构必须相同）
+
+    Args:
+        excel_dir: Excel文件目录
+
+    Returns:
+        全部一致时返回True
+    """
+    print(f"🔍 检查流式读取的列名: {excel_dir}")
+    all_match = True
+    for file_name in sorted(os.listdir(excel_dir)):
+        if not file_name.endswith('.xlsx'):
+            continue
+        excel_path = os.path.join(excel_dir, file_name)
+        for sheet_name, df in pd.read_excel(excel_path, sheet_name=None).items():
+            columns, rows = iter_excel_rows(excel_path, sheet_name)
+            row_count = sum(1 for _ in rows)
+            expected = [str(c) for c in df.columns]
+            if columns == expected and row_count == len(df):
+                print(f"✅ {file_name}-{sheet_name}: {len(columns)} 列, {row_count} 行")
+                continue
+            all_match = False
+            print(f"❌ {file_name}-{sheet_name}: 流式 {len(columns)} 列/{row_count} 行, pandas {len(expected)} 列/{len(df)} 行")
+            print(f"   流式列名: {columns}")
+            print(f"   pandas列名: {expected}")
+    print("\n🎯 检查完成：" + ("全部一致" if all_match else "存在不一致的工作表"))
+    return all_match
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_stream_columns(sys.argv[1] if len(sys.argv) > 1 else "uploads") else 1)
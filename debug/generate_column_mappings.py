@@ -63,7 +63,7 @@ async def generate_table_mapping(table_name: str):
     print_separator()
     if success:
         print(f"✅ 表 '{table_name}' 的列名映射生成成功")
-        print(f"📁 配置文件保存在: column_mapping_docs/{table_name}_column_mapping.json")
+        print(f"📁 映射已保存到数据库表: column_mappings")
     else:
         print(f"❌ 表 '{table_name}' 的列名映射生成失败")
 
@@ -123,17 +123,8 @@ def show_info():
     mappings = generator.list_all_mappings()
     
     print(f"🔧 映射配置信息:")
-    print(f"   📁 配置目录: column_mapping_docs/")
     print(f"   📄 已生成映射: {len(mappings)} 个表")
-    print(f"   📋 注册表文件: column_mapping_docs/mapping_registry.json")
-    
-    # 检查配置目录
-    mapping_dir = "column_mapping_docs"
-    if os.path.exists(mapping_dir):
-        config_files = [f for f in os.listdir(mapping_dir) if f.endswith('.json')]
-        print(f"   📂 配置文件数: {len(config_files)}")
-    else:
-        print(f"   📂 配置目录: 不存在（将自动创建）")
+    print(f"   📋 注册表: 数据库表 column_mapping_registry / column_mappings")
 
 def main():
     """主函数"""
@@ -179,8 +170,7 @@ def main():
             print(f"   已映射表数量: {status['mapped_tables']}")
             print(f"   未映射表数量: {status['unmapped_tables']}")
             print(f"   映射覆盖率: {status['mapping_coverage']:.1f}%")
-            print(f"   注册表文件: {'✅ 存在' if status['registry_file_exists'] else '❌ 不存在'}")
-            print(f"   映射目录: {'✅ 存在' if status['mapping_dir_exists'] else '❌ 不存在'}")
+            print(f"   映射存储: {status['mapping_store']}")
             
             if status['unmapped_tables'] > 0:
                 print(f"\n🔍 未映射的表 (显示前10个):")
@@ -1,6 +1,7 @@
 import os
 import sqlite3
 from database_manager import get_database_manager
+from connection_pool import close_connection_pool
 
 def reinitialize_database():
     """重新初始化数据库"""
@@ -9,6 +10,7 @@ def reinitialize_database():
     
     # 1. 删除现有数据库文件
     db_path = "database.db"
+    close_connection_pool(db_path)
     if os.path.exists(db_path):
         print(f"🗑️ 删除现有数据库: {db_path}")
         os.remove(db_path)
@@ -0,0 +1,135 @@
+import os
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+
+# 计算内容哈希时的读取块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class FileFingerprinter:
+    """文件指纹管理器 - 信任 (size, mtime_ns, inode)，仅在它们变化时才计算内容哈希"""
+
+    def __init__(self):
+        """
+        初始化文件指纹管理器
+        """
+        self._cache: Dict[str, Tuple[Tuple[int, int, int], str]] = {}  # {绝对路径: (stat签名, MD5)}
+        self._lock = threading.Lock()
+        self.stat_hits = 0
+        self.hash_computations = 0
+
+    @staticmethod
+    def get_stat_signature(file_path: str) -> Optional[Tuple[int, int, int]]:
+        """
+        获取文件的 stat 签名
+
+        Args:
+            file_path: 文件路径
+
+        Returns:
+            (文件大小, 纳秒级修改时间, inode)，文件不存在时返回None
+        """
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def get_file_hash(self, file_path: str) -> str:
+        """
+        获取文件的MD5哈希值（按 stat 签名进程内记忆）
+
+        Args:
+            file_path: 文件路径
+
+        Returns:
+            文件的MD5哈希值
+
+        Raises:
+            OSError: 文件不存在或无法读取
+        """
+        key = os.path.abspath(file_path)
+        signature = self.get_stat_signature(key)
+        if signature is None:
+            raise FileNotFoundError(file_path)
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] == signature:
+                self.stat_hits += 1
+                return cached[1]
+
+        file_hash = self._compute_md5(key)
+
+        # 哈希期间文件被改写时不记忆结果，下次重新计算
+        if self.get_stat_signature(key) == signature:
+            with self._lock:
+                self._cache[key] = (signature, file_hash)
+                self.hash_computations += 1
+        return file_hash
+
+    def _compute_md5(self, file_path: str) -> str:
+        """计算文件内容的MD5"""
+        hash_md5 = hashlib.md5()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                hash_md5.update(chunk)
+        return hash_md5.hexdigest()
+
+    def invalidate(self, file_path: str = None):
+        """
+        清除记忆的指纹
+
+        Args:
+            file_path: 文件路径，为None时清除全部
+        """
+        with self._lock:
+            if file_path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(os.path.abspath(file_path), None)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        获取指纹缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                "cached_files": len(self._cache),
+                "stat_hits": self.stat_hits,
+                "hash_computations": self.hash_computations
+            }
+
+# 全局文件指纹管理器实例
+_file_fingerprinter = None
+_file_fingerprinter_lock = threading.Lock()
+
+def get_file_fingerprinter() -> FileFingerprinter:
+    """
+    获取文件指纹管理器单例
+
+    Returns:
+        文件指纹管理器实例
+    """
+    global _file_fingerprinter
+    if _file_fingerprinter is None:
+        with _file_fingerprinter_lock:
+            if _file_fingerprinter is None:
+                _file_fingerprinter = FileFingerprinter()
+    return _file_fingerprinter
+
+def get_file_hash(file_path: str) -> str:
+    """
+    获取文件内容哈希（进程内共享的记忆化结果）
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        文件的MD5哈希值
+    """
+    return get_file_fingerprinter().get_file_hash(file_path)
@@ -0,0 +1,198 @@
+import os
+import re
+import sqlite3
+from typing import List, Set
+
+from query_cache import referenced_tables
+
+# 是否在导入时为数据表建立 FTS5 trigram 全文索引
+FTS_INDEX_ENABLED = os.getenv("FTS_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+# 行数达到该值的表才建立索引（小表全表扫描已足够快）
+FTS_INDEX_MIN_ROWS = int(os.getenv("FTS_INDEX_MIN_ROWS", 1000))
+# 全文索引表名前缀（不以 table_ 开头，不会被当作用户数据表）
+FTS_TABLE_PREFIX = "fts_"
+# trigram 索引只能加速至少 3 个字符的子串匹配
+MIN_TRIGRAM_TERM_LENGTH = 3
+# FTS5 保留的列名
+_RESERVED_COLUMNS = {"rank", "rowid"}
+
+# 形如 [别名.]列名 LIKE '%词%' 的谓词（列名可用 `...`、[...]、"..." 引用；词中不含通配符）
+_LIKE_PATTERN = re.compile(
+    r"(?P<qual>(?:`[^`]+`|\[[^\]]+\]|\"[^\"]+\"|[^\W\d]\w*)\s*\.\s*)?"
+    r"(?P<col>`[^`]+`|\[[^\]]+\]|\"[^\"]+\"|[^\W\d]\w*)"
+    r"(?P<op>\s+LIKE\s+)'%(?P<term>(?:[^'%_]|'')+)%'(?!\s*ESCAPE)",
+    re.IGNORECASE
+)
+# 谓词必须独立出现在 WHERE 条件中：前面紧接 WHERE / AND / OR / 左括号，后面紧接条件结束或 AND / OR
+_PREDICATE_START = re.compile(r"(?:\bWHERE|\bAND|\bOR|\()\s*$", re.IGNORECASE)
+_PREDICATE_END = re.compile(r"\s*(?:$|\)|;|(?:AND|OR|GROUP|ORDER|LIMIT|HAVING|WINDOW)\b)", re.IGNORECASE)
+_WHERE = re.compile(r"\bWHERE\b", re.IGNORECASE)
+_WHERE_END = re.compile(r"\b(?:GROUP\s+BY|ORDER\s+BY|HAVING|LIMIT|WINDOW)\b", re.IGNORECASE)
+# 含取反子表达式或 BETWEEN 时谓词为 NULL 与为假的结果可能不同，整段不改写
+_UNSAFE_CONTEXT = re.compile(r"\bNOT\s*(?:\(|EXISTS\b)|\bBETWEEN\b", re.IGNORECASE)
+# 复合查询的分隔（各部分分别判断所读的表）
+_COMPOUND_SPLIT = re.compile(r"\b(?:UNION(?:\s+ALL)?|INTERSECT|EXCEPT)\b", re.IGNORECASE)
+
+
+def fts_table_name(table_name: str) -> str:
+    """数据表对应的全文索引表名"""
+    return f"{FTS_TABLE_PREFIX}{table_name}"
+
+
+def _quote(name: str) -> str:
+    """对 SQLite 标识符加双引号转义"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _unquote(identifier: str) -> str:
+    """去掉标识符的引号"""
+    if identifier[:1] in ("`", "[", '"'):
+        return identifier[1:-1]
+    return identifier
+
+
+def drop_fts_index(cursor, table_name: str):
+    """
+    删除数据表的全文索引（数据表被删除或重建时调用）
+
+    Args:
+        cursor: 写连接的游标
+        table_name: 数据表名
+    """
+    cursor.execute(f"DROP TABLE IF EXISTS {_quote(fts_table_name(table_name))}")
+
+
+def build_fts_index(cursor, table_name: str, min_rows: int = FTS_INDEX_MIN_ROWS) -> List[str]:
+    """
+    为数据表的文本列建立 FTS5 trigram 全文索引（外部内容表，不重复保存数据）
+
+    数据表在导入时整表重建，索引随之重建；失败时不影响数据表本身的导入。
+
+    Args:
+        cursor: 写连接的游标（处于导入事务中）
+        table_name: 数据表名
+        min_rows: 建立索引所需的最小行数
+
+    Returns:
+        建立了索引的列名列表，未建立时为空列表
+    """
+    drop_fts_index(cursor, table_name)
+    if not FTS_INDEX_ENABLED:
+        return []
+
+    row_count = cursor.execute(f"SELECT MAX(rowid) FROM {_quote(table_name)}").fetchone()[0] or 0
+    if row_count < min_rows:
+        return []
+
+    columns = [
+        row[1] for row in cursor.execute(f"PRAGMA table_info({_quote(table_name)})").fetchall()
+        if (row[2] or "TEXT").upper() == "TEXT" and str(row[1]).lower() not in _RESERVED_COLUMNS
+    ]
+    if not columns:
+        return []
+
+    fts_name = fts_table_name(table_name)
+    column_defs = ", ".join(_quote(c) for c in columns)
+    cursor.execute("SAVEPOINT fts_build")
+    try:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {_quote(fts_name)} USING fts5({column_defs}, "
+            f"content={_quote(table_name)}, content_rowid='rowid', tokenize='trigram')"
+        )
+        cursor.execute(f"INSERT INTO {_quote(fts_name)}({_quote(fts_name)}) VALUES('rebuild')")
+        cursor.execute("RELEASE SAVEPOINT fts_build")
+    except sqlite3.Error as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT fts_build")
+        cursor.execute("RELEASE SAVEPOINT fts_build")
+        print(f"⚠️ 建立全文索引失败 {table_name}: {e}")
+        return []
+    return columns
+
+
+def get_indexed_columns(conn: sqlite3.Connection, table_name: str) -> Set[str]:
+    """
+    获取数据表已建立全文索引的列（小写）
+
+    Args:
+        conn: 数据库连接
+        table_name: 数据表名
+
+    Returns:
+        列名集合，没有索引时为空集合
+    """
+    rows = conn.execute(f"PRAGMA table_info({_quote(fts_table_name(table_name))})").fetchall()
+    return {str(row[1]).lower() for row in rows}
+
+
+def _rewrite_part(conn: sqlite3.Connection, part: str) -> str:
+    """改写复合查询中的一个部分（只处理只读一张表且该表有全文索引的情况）"""
+    where = _WHERE.search(part)
+    if where is None or _UNSAFE_CONTEXT.search(part) or not _LIKE_PATTERN.search(part, where.end()):
+        return part
+    where_end = _WHERE_END.search(part, where.end())
+    where_end = where_end.start() if where_end else len(part)
+    try:
+        tables = [t for t in referenced_tables(conn, part) if not t.startswith(FTS_TABLE_PREFIX)]
+    except sqlite3.Error:
+        return part
+    if len(tables) != 1:
+        return part
+    table_name = tables[0]
+    indexed = get_indexed_columns(conn, table_name)
+    if not indexed:
+        return part
+
+    def _replace(match: re.Match) -> str:
+        column = _unquote(match.group("col"))
+        term = match.group("term")
+        if (column.lower() not in indexed
+                or len(term.replace("''", "'")) < MIN_TRIGRAM_TERM_LENGTH
+                or not where.end() <= match.start() < where_end
+                or not _PREDICATE_START.search(part, 0, match.start())
+                or not _PREDICATE_END.match(part, match.end())):
+            return match.group(0)
+        qual = match.group("qual") or ""
+        # trigram 分词器对所有 Unicode 字符忽略大小写，而 LIKE 只忽略 ASCII 大小写：
+        # 索引只用于筛选候选行，命中的行再用原 LIKE 复核
+        return (f"({qual}rowid IN (SELECT rowid FROM {_quote(fts_table_name(table_name))} "
+                f"WHERE {_quote(column)}{match.group('op')}'%{term}%') AND {match.group(0)})")
+
+    return _LIKE_PATTERN.sub(_replace, part)
+
+
+def rewrite_like_predicates(conn: sqlite3.Connection, sql: str) -> str:
+    """
+    将 col LIKE '%词%' 改写为基于全文索引的 rowid 查找
+
+    只改写语句（或复合查询的某一部分）只读一张表、该列有 trigram 索引且词长不少于 3 个字符的谓词，
+    且谓词须独立出现在 WHERE 条件中（紧接 WHERE / AND / OR / 左括号，其后为条件结束或 AND / OR）；
+    列名前后带有 || 等运算符或 COLLATE、NOT LIKE、带 ESCAPE 或含通配符的模式，以及含 NOT (...) / NOT EXISTS /
+    BETWEEN 的语句保持不变。索引只用于筛选候选行，原 LIKE 条件保留为复核（两者大小写折叠规则不同）。
+    改写后的语句无法编译时返回原语句。
+
+    Args:
+        conn: 数据库连接
+        sql: SQL语句
+
+    Returns:
+        改写后的SQL语句（无需改写时为原语句）
+    """
+    if not _LIKE_PATTERN.search(sql):
+        return sql
+
+    pieces, last = [], 0
+    for separator in _COMPOUND_SPLIT.finditer(sql):
+        pieces.append(_rewrite_part(conn, sql[last:separator.start()]))
+        pieces.append(separator.group(0))
+        last = separator.end()
+    pieces.append(_rewrite_part(conn, sql[last:]))
+    rewritten = "".join(pieces)
+    if rewritten == sql:
+        return sql
+
+    try:
+        conn.execute(f"EXPLAIN {rewritten}").fetchall()
+    except sqlite3.Error:
+        return sql
+    return rewritten
+
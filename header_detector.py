@@ -0,0 +1,163 @@
+import os
+import re
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+# 启发式结果的置信度达到该阈值时不再调用大模型
+HEADER_CONFIDENCE_THRESHOLD = float(os.getenv("HEADER_CONFIDENCE_THRESHOLD", 0.6))
+# 参与表头判断的候选行数（从 pandas 列名行开始）
+HEADER_SCAN_ROWS = 15
+# 输出的关键信息条目上限
+MAX_KEY_VALUES = 50
+
+# 常见列名关键词（与 excel_header_prompt.txt 中的规则一致）
+HEADER_KEYWORDS = (
+    "序号", "编号", "ID", "名称", "品名", "型号", "规格", "参数", "品牌", "厂家", "产地", "单位",
+    "数量", "单价", "价格", "金额", "合计", "日期", "时间", "类别", "类型", "描述", "备注", "姓名", "部门"
+)
+# 关键信息列的列名关键词
+KEY_COLUMN_KEYWORDS = ("名称", "品名", "姓名", "项目")
+
+_UNNAMED_PATTERN = re.compile(r"^Unnamed: \d+$")
+
+
+class HeaderDetection:
+    """启发式表头识别结果"""
+
+    def __init__(self, header_row: int, header: List[str], key_column: Optional[str],
+                 key_values: List[str], confidence: float):
+        self.header_row = header_row  # -1 表示 pandas 列名行，其余为数据行号
+        self.header = header
+        self.key_column = key_column
+        self.key_values = key_values
+        self.confidence = confidence
+
+    def to_header_text(self) -> str:
+        """按表头识别提示词约定的输出格式生成文本（与大模型输出可互换）"""
+        return format_header_text(" | ".join(self.header), self.key_values)
+
+
+def format_header_text(header: str, key_values: List[str]) -> str:
+    """
+    按表头识别提示词约定的输出格式拼接表头和关键信息
+
+    Args:
+        header: 表头，列名之间用 " | " 分隔
+        key_values: 关键信息列表
+
+    Returns:
+        表头和关键信息文本
+    """
+    return (
+        "*表头{header}*\n```\n" + header + "\n```\n"
+        "*关键信息{key_info}*\n```\n" + "，".join(key_values) + "\n```"
+    )
+
+
+def _cell_grid(df: pd.DataFrame, scan_rows: int) -> np.ndarray:
+    """将列名行和前若干数据行组成字符串网格，空单元格为空字符串"""
+    columns = ["" if _UNNAMED_PATTERN.match(str(c)) else str(c) for c in df.columns]
+    body = df.head(scan_rows).astype(object).where(df.head(scan_rows).notna(), "")
+    grid = np.vstack([np.array(columns, dtype=object)[None, :], body.to_numpy(dtype=object)])
+    return np.vectorize(lambda v: str(v).strip(), otypes=[object])(grid)
+
+
+def _numeric_mask(grid: np.ndarray) -> np.ndarray:
+    """判断每个单元格是否为数值/日期"""
+    flat = pd.Series(grid.ravel())
+    numeric = pd.to_numeric(flat.str.replace(",", "", regex=False), errors="coerce").notna()
+    dates = flat.str.match(r"^\d{4}[-/年]\d{1,2}([-/月]\d{1,2})?")
+    return (numeric | dates).to_numpy().reshape(grid.shape)
+
+
+def _keyword_mask(grid: np.ndarray, keywords) -> np.ndarray:
+    """判断每个单元格是否包含关键词"""
+    pattern = "|".join(re.escape(k) for k in keywords)
+    flat = pd.Series(grid.ravel())
+    return flat.str.contains(pattern, case=False, regex=True).to_numpy().reshape(grid.shape)
+
+
+def detect_header(df: pd.DataFrame, scan_rows: int = HEADER_SCAN_ROWS) -> Optional[HeaderDetection]:
+    """
+    按数据类型变化、关键词匹配、空值比例和文本特征识别表头行与关键信息列
+
+    Args:
+        df: 工作表开头若干行（pandas 默认以第一行作为列名）
+        scan_rows: 参与表头判断的候选行数
+
+    Returns:
+        识别结果，无法判断时返回None
+    """
+    if df is None or df.shape[1] == 0:
+        return None
+
+    grid = _cell_grid(df, scan_rows)
+    n_rows, n_cols = grid.shape
+    empty = grid == ""
+    numeric = _numeric_mask(grid) & ~empty
+    text = ~empty & ~numeric
+    keyword = _keyword_mask(grid, HEADER_KEYWORDS) & text
+    lengths = np.vectorize(len, otypes=[int])(grid)
+
+    filled = (~empty).sum(axis=1)
+    fill_ratio = filled / n_cols
+    safe_filled = np.maximum(filled, 1)
+    text_ratio = text.sum(axis=1) / safe_filled
+    keyword_ratio = np.minimum(keyword.sum(axis=1) / safe_filled * 2, 1.0)
+    short_ratio = (text & (lengths <= 12)).sum(axis=1) / safe_filled
+    unique_ratio = np.array([len(set(row[row != ""])) for row in grid]) / safe_filled
+
+    # 数据类型变化：该行为文本而下方数据以数值为主的列所占比例
+    below_numeric = np.zeros(n_rows)
+    for r in range(n_rows - 1):
+        below = numeric[r + 1:].mean(axis=0)
+        below_numeric[r] = ((below >= 0.5) & text[r]).sum() / safe_filled[r]
+
+    scores = (0.3 * keyword_ratio + 0.25 * fill_ratio * text_ratio + 0.25 * below_numeric
+              + 0.1 * short_ratio + 0.1 * unique_ratio)
+    scores[filled < max(2, n_cols // 3)] = 0.0  # 标题行、空白行不可能是表头
+
+    order = np.argsort(scores)[::-1]
+    best = int(order[0])
+    best_score = float(scores[best])
+    second_score = float(scores[order[1]]) if n_rows > 1 else 0.0
+    if best_score <= 0:
+        return None
+    # 最优行得分越高、与次优行差距越大，置信度越高
+    confidence = min(1.0, best_score) * min(1.0, 0.5 + (best_score - second_score) / 0.4)
+
+    header_cells = grid[best]
+    header = [cell for cell in header_cells if cell]
+
+    # 关键信息列：表头含名称类关键词、下方为文本、较少空值且取值多样
+    data = grid[best + 1:]
+    key_column, key_values, key_confidence = None, [], 0.0
+    if len(data):
+        data_empty = data == ""
+        data_text = text[best + 1:]
+        non_empty = np.maximum((~data_empty).sum(axis=0), 1)
+        col_text_ratio = data_text.sum(axis=0) / non_empty
+        col_fill_ratio = (~data_empty).mean(axis=0)
+        col_unique_ratio = np.array([len(set(col[col != ""])) for col in data.T]) / non_empty
+        col_keyword = _keyword_mask(header_cells[None, :], KEY_COLUMN_KEYWORDS)[0].astype(float)
+        key_scores = 0.5 * col_keyword + 0.2 * col_text_ratio + 0.15 * col_unique_ratio + 0.15 * col_fill_ratio
+        key_index = int(np.argmax(key_scores))
+        key_confidence = float(key_scores[key_index])
+        if col_text_ratio[key_index] >= 0.5:
+            key_column = header_cells[key_index] or str(df.columns[key_index])
+            seen = set()
+            for value in data[:, key_index]:
+                if value and value not in seen:
+                    seen.add(value)
+                    key_values.append(value)
+                if len(key_values) >= MAX_KEY_VALUES:
+                    break
+
+    if key_column is None:
+        confidence *= 0.5
+    else:
+        confidence = min(confidence, 0.4 + key_confidence * 0.6)
+
+    return HeaderDetection(best - 1, header, key_column, key_values, round(confidence, 3))
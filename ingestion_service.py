@@ -0,0 +1,359 @@
+import os
+import time
+import asyncio
+import zipfile
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from database_manager import get_database_manager
+from file_fingerprint import get_file_fingerprinter
+from parsed_sheet_store import get_parsed_sheet_store
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+
+
+def _is_excel_file(file_name: str) -> bool:
+    """判断是否为需要处理的Excel文件（忽略Office临时锁文件）"""
+    base_name = os.path.basename(file_name)
+    return base_name.endswith(EXCEL_EXTENSIONS) and not base_name.startswith('~$')
+
+
+class IngestionService:
+    """
+    后台数据接入服务
+
+    监听 uploads 目录（优先使用 watchdog/inotify，不可用时退化为轮询），对连续写入做防抖，
+    在后台线程中完成 SQLite 导入、列名映射、表头识别和向量索引更新，并发布数据版本号。
+    查询路径只读取已发布的数据，不承担任何接入开销。
+    """
+
+    def __init__(self, excel_dir: str = "uploads", debounce_seconds: float = None, poll_interval: float = None):
+        """
+        初始化数据接入服务
+
+        Args:
+            excel_dir: 监听的Excel文件目录
+            debounce_seconds: 文件最后一次变化后需保持稳定的时间（秒）
+            poll_interval: 轮询模式下的扫描间隔（秒）
+        """
+        self.excel_dir = excel_dir
+        if debounce_seconds is None:
+            debounce_seconds = float(os.getenv("INGEST_DEBOUNCE_SECONDS", 2.0))
+        if poll_interval is None:
+            poll_interval = float(os.getenv("INGEST_POLL_INTERVAL", 5.0))
+        self.debounce_seconds = debounce_seconds
+        self.poll_interval = poll_interval
+
+        self._data_version = 0
+        self._pending: Dict[str, Tuple[float, Optional[Tuple[int, int, int]]]] = {}  # {文件名: (最后事件时间, stat签名)}
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._observer = None
+        self._snapshot: Dict[str, Tuple[int, int, int]] = {}
+        self.watch_mode = None
+        self.last_ingest_at = None
+        self.last_error = None
+
+    # ------------------------------------------------------------------
+    # 数据版本
+    # ------------------------------------------------------------------
+    @property
+    def data_version(self) -> int:
+        """当前已发布的数据版本号，每批接入在 SQLite 导入后和索引更新后各递增一次"""
+        return self._data_version
+
+    def _publish_version(self, stage: str = ""):
+        """
+        发布新的数据版本（语义缓存按数据版本失效）
+
+        Args:
+            stage: 触发发布的接入阶段（仅用于日志）
+        """
+        with self._condition:
+            self._data_version += 1
+            self.last_ingest_at = time.time()
+        print(f"📢 [INGEST] 数据版本已更新: v{self._data_version}" + (f" ({stage})" if stage else ""))
+
+    # ------------------------------------------------------------------
+    # 启停
+    # ------------------------------------------------------------------
+    def start(self):
+        """
+        启动文件监听和后台接入线程
+        """
+        if self._threads:
+            return
+        os.makedirs(self.excel_dir, exist_ok=True)
+        self._stop_event.clear()
+        self._snapshot = self._scan_directory()
+
+        # 接入服务负责驱动向量索引刷新，关闭查询路径上的自动检查
+        from NL2DB import vector_store_manager
+        vector_store_manager.auto_refresh = False
+
+        if not self._start_watchdog():
+            self.watch_mode = "polling"
+            self._spawn(self._poll_loop, "ingest-poller")
+        self._spawn(self._worker_loop, "ingest-worker")
+        print(f"👀 [INGEST] 开始监听目录: {self.excel_dir} (模式: {self.watch_mode})")
+
+    def stop(self):
+        """
+        停止文件监听和后台接入线程
+        """
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def _spawn(self, target, name: str):
+        """启动守护线程"""
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _start_watchdog(self) -> bool:
+        """
+        尝试使用 watchdog（Linux 下为 inotify）监听目录
+
+        Returns:
+            是否启动成功
+        """
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return False
+
+        service = self
+
+        class _ExcelEventHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                for path in (getattr(event, 'src_path', None), getattr(event, 'dest_path', None)):
+                    if path and _is_excel_file(path):
+                        service.notify_changed(os.path.basename(path))
+
+        try:
+            observer = Observer()
+            observer.schedule(_ExcelEventHandler(), self.excel_dir, recursive=False)
+            observer.daemon = True
+            observer.start()
+        except Exception as e:
+            print(f"⚠️ [INGEST] 启动文件监听失败，改用轮询: {e}")
+            return False
+
+        self._observer = observer
+        self.watch_mode = "inotify"
+        return True
+
+    # ------------------------------------------------------------------
+    # 变化检测
+    # ------------------------------------------------------------------
+    def _scan_directory(self) -> Dict[str, Tuple[int, int, int]]:
+        """扫描目录，返回 {文件名: stat签名}"""
+        snapshot = {}
+        try:
+            with os.scandir(self.excel_dir) as entries:
+                for entry in entries:
+                    if entry.is_file() and _is_excel_file(entry.name):
+                        st = entry.stat()
+                        snapshot[entry.name] = (st.st_size, st.st_mtime_ns, st.st_ino)
+        except OSError:
+            pass
+        return snapshot
+
+    def _poll_loop(self):
+        """轮询模式：定期对比目录快照"""
+        while not self._stop_event.wait(self.poll_interval):
+            current = self._scan_directory()
+            changed = {name for name, sig in current.items() if self._snapshot.get(name) != sig}
+            changed |= set(self._snapshot) - set(current)
+            self._snapshot = current
+            for file_name in changed:
+                self.notify_changed(file_name)
+
+    def notify_changed(self, file_name: str):
+        """
+        登记文件变化事件（可由外部上传接口直接调用）
+
+        Args:
+            file_name: 发生变化的文件名
+        """
+        signature = get_file_fingerprinter().get_stat_signature(os.path.join(self.excel_dir, file_name))
+        with self._condition:
+            self._pending[file_name] = (time.time(), signature)
+            self._condition.notify_all()
+
+    def _take_ready_files(self) -> Set[str]:
+        """
+        取出已稳定（防抖期内无变化）的文件
+
+        Returns:
+            可以开始接入的文件名集合
+        """
+        now = time.time()
+        ready = set()
+        for file_name, (last_event, signature) in list(self._pending.items()):
+            if now - last_event < self.debounce_seconds:
+                continue
+            current = get_file_fingerprinter().get_stat_signature(os.path.join(self.excel_dir, file_name))
+            if current != signature:
+                # 防抖期内仍在写入，重新计时
+                self._pending[file_name] = (now, current)
+                continue
+            ready.add(file_name)
+            del self._pending[file_name]
+        return ready
+
+    def _is_upload_complete(self, file_path: str) -> bool:
+        """检查上传是否完整（xlsx 为 zip 容器，写到一半时缺少中央目录）"""
+        if file_path.endswith('.xlsx'):
+            return zipfile.is_zipfile(file_path)
+        return True
+
+    # ------------------------------------------------------------------
+    # 后台接入
+    # ------------------------------------------------------------------
+    def _worker_loop(self):
+        """后台接入线程：等待稳定的文件并执行接入"""
+        while not self._stop_event.is_set():
+            with self._condition:
+                ready = self._take_ready_files()
+                if not ready:
+                    self._condition.wait(timeout=self.debounce_seconds if self._pending else None)
+                    continue
+            try:
+                self.ingest_files(ready)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ [INGEST] 后台接入失败: {e}")
+
+    def ingest_files(self, file_names: Set[str]):
+        """
+        接入一批变化的文件：SQLite 导入后立即发布数据版本，向量索引和列名映射更新后再发布一次
+
+        SQLite 提交后查询即可读到新数据，此时先发布版本使语义缓存中基于旧数据的答案失效；
+        向量索引和列名映射影响召回和SQL生成，更新完成后再发布一次，使期间缓存的答案同样失效。
+
+        Args:
+            file_names: 变化的文件名集合
+        """
+        db_manager = get_database_manager()
+        changed_tables: List[str] = []
+        removed_tables: List[str] = []
+        index_dirty = False
+
+        for file_name in sorted(file_names):
+            file_path = os.path.join(self.excel_dir, file_name)
+            if not os.path.exists(file_path):
+                removed_tables.extend(db_manager.remove_file(file_name))
+                index_dirty = True
+                continue
+            if not self._is_upload_complete(file_path):
+                print(f"⏳ [INGEST] 文件尚未写入完整，稍后重试: {file_name}")
+                self.notify_changed(file_name)
+                continue
+
+            started = time.time()
+            updated, table_mapping = db_manager.update_if_changed(file_path)
+            if updated:
+                changed_tables.extend(table_mapping.values())
+                index_dirty = True
+                print(f"📥 [INGEST] 已导入 {file_name} ({len(table_mapping)} 个工作表, {time.time() - started:.2f}s)")
+
+        if not index_dirty:
+            return
+        self._publish_version("SQLite")
+
+        try:
+            # 向量索引更新时的工作表分析会同时生成列名映射，其余表再单独生成
+            analysis_started_at = datetime.now().isoformat()
+            self._update_vector_index()
+            self._update_column_mappings(changed_tables, removed_tables, analysis_started_at)
+        finally:
+            # 本轮所有消费者已使用完解析结果
+            get_parsed_sheet_store().release()
+        self._publish_version("向量索引/列名映射")
+
+    def _update_column_mappings(self, changed_tables: List[str], removed_tables: List[str], mapped_since: str = None):
+        """
+        为新导入的表生成列名映射，删除已移除表的映射
+
+        Args:
+            changed_tables: 新导入的表名列表
+            removed_tables: 已移除的表名列表
+            mapped_since: 在该时间之后已生成映射的表（由工作表分析阶段生成）不再重复生成
+        """
+        try:
+            from column_mapping_generator import get_column_mapping_generator
+            generator = get_column_mapping_generator()
+            for table_name in removed_tables:
+                if table_name in generator.mapping_registry:
+                    generator.delete_mapping_for_table(table_name)
+            changed_tables = generator.filter_unmapped_since(changed_tables, mapped_since)
+            if changed_tables:
+                asyncio.run(generator.generate_mappings_concurrently(changed_tables))
+        except Exception as e:
+            print(f"⚠️ [INGEST] 列名映射更新失败: {e}")
+
+    def _update_vector_index(self):
+        """增量更新向量索引（包含新工作表的表头识别）并切换到新实例"""
+        try:
+            from NL2DB import vector_store_manager
+            vector_store_manager.refresh()
+        except Exception as e:
+            print(f"⚠️ [INGEST] 向量索引更新失败: {e}")
+
+    def get_status(self) -> Dict:
+        """
+        获取接入服务状态
+
+        Returns:
+            状态信息字典
+        """
+        with self._condition:
+            pending = sorted(self._pending.keys())
+        return {
+            "watch_mode": self.watch_mode,
+            "data_version": self._data_version,
+            "pending_files": pending,
+            "last_ingest_at": self.last_ingest_at,
+            "last_error": self.last_error
+        }
+
+# 全局数据接入服务实例
+_ingestion_service = None
+
+def get_ingestion_service(excel_dir: str = "uploads") -> IngestionService:
+    """
+    获取数据接入服务单例
+
+    Args:
+        excel_dir: 监听的Excel文件目录
+
+    Returns:
+        数据接入服务实例
+    """
+    global _ingestion_service
+    if _ingestion_service is None:
+        _ingestion_service = IngestionService(excel_dir)
+    return _ingestion_service
+
+def get_data_version() -> int:
+    """
+    获取当前发布的数据版本号
+
+    Returns:
+        数据版本号
+    """
+    return get_ingestion_service().data_version
@@ -0,0 +1,75 @@
+import os
+import json
+from typing import Any, Hashable, List, Optional, Sequence, Tuple
+
+# 单次批量请求的输入 token 预算（含公共指令部分）
+LLM_BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", 6000))
+# 单次批量请求最多包含的表/工作表数量（输出长度也随之增长）
+LLM_BATCH_MAX_ITEMS = int(os.getenv("LLM_BATCH_MAX_ITEMS", 8))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的 token 数（中日韩字符约1个token，其余约4个字符1个token）
+
+    Args:
+        text: 文本
+
+    Returns:
+        估算的 token 数
+    """
+    cjk = sum(1 for ch in text if '\u2e80' <= ch <= '\u9fff' or '\uf900' <= ch <= '\ufaff' or '\uff00' <= ch <= '\uffef')
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def pack_batches(sections: Sequence[Tuple[Hashable, str]], base_tokens: int,
+                 token_budget: int = LLM_BATCH_TOKEN_BUDGET,
+                 max_items: int = LLM_BATCH_MAX_ITEMS) -> List[List[Hashable]]:
+    """
+    按 token 预算将多个片段贪心装箱，每个箱子对应一次批量请求
+
+    单个片段超出预算时独占一个箱子（调用方应对单元素箱子使用单表请求）。
+
+    Args:
+        sections: [(键, 片段文本)]
+        base_tokens: 公共指令部分的 token 数
+        token_budget: 单次请求的 token 预算
+        max_items: 单次请求最多包含的片段数
+
+    Returns:
+        分批后的键列表
+    """
+    batches: List[List[Hashable]] = []
+    current: List[Hashable] = []
+    current_tokens = base_tokens
+    for key, text in sections:
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], base_tokens
+        current.append(key)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def extract_json_object(text: str) -> Optional[Any]:
+    """
+    从模型响应中提取第一个完整的 JSON 对象（支持嵌套和 ```json 代码块）
+
+    Args:
+        text: 模型响应文本
+
+    Returns:
+        解析出的对象，失败时返回None
+    """
+    decoder = json.JSONDecoder()
+    start = text.find('{')
+    while start != -1:
+        try:
+            obj, _ = decoder.raw_decode(text, start)
+            return obj
+        except json.JSONDecodeError:
+            start = text.find('{', start + 1)
+    return None
@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+# 大模型响应缓存文件、有效期、容量上限和启用缓存的阶段（逗号分隔：header,mapping,sql,answer）
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join("cache", "llm_cache.db"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", 200))
+LLM_CACHE_STAGES = os.getenv("LLM_CACHE_STAGES", "header,mapping")
+
+# 各调用阶段的名称
+STAGE_HEADER = "header"
+STAGE_MAPPING = "mapping"
+STAGE_SQL = "sql"
+STAGE_ANSWER = "answer"
+
+
+def _messages_to_text(messages: Any) -> str:
+    """将消息列表（或字符串提示词）序列化为稳定文本，用于计算缓存键"""
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(f"{type(m).__name__}:{getattr(m, 'content', m)}" for m in messages)
+
+
+class LLMResponseCache:
+    """
+    磁盘上的大模型响应缓存
+
+    键为 (提供方, 模型, 温度, 提示词哈希)，保存在独立的 SQLite 文件中（不占用业务数据库的写连接）。
+    读取时按有效期淘汰过期条目，写入后总大小超过上限时按最近访问时间淘汰。
+    """
+
+    def __init__(self, db_path: str = LLM_CACHE_PATH, ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+                 max_bytes: int = LLM_CACHE_MAX_MB * 1024 * 1024):
+        """
+        初始化响应缓存
+
+        Args:
+            db_path: 缓存文件路径
+            ttl_seconds: 条目有效期（秒）
+            max_bytes: 缓存响应的总大小上限（字节）
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                cache_key TEXT PRIMARY KEY,
+                stage TEXT,
+                model TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_access ON llm_responses(last_access)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def make_key(llm_config: Dict[str, Any], messages: Any) -> str:
+        """
+        计算缓存键
+
+        Args:
+            llm_config: 模型配置（provider、model_name、temperature）
+            messages: 消息列表或提示词
+
+        Returns:
+            缓存键
+        """
+        prompt_hash = hashlib.sha256(_messages_to_text(messages).encode("utf-8")).hexdigest()
+        identity = json.dumps([llm_config.get("provider"), llm_config.get("model_name"),
+                               llm_config.get("temperature"), prompt_hash])
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def _count(self, stage: str, field: str):
+        """累加某阶段的命中/未命中计数"""
+        counters = self.stats.setdefault(stage, {"hits": 0, "misses": 0, "writes": 0, "discards": 0})
+        counters[field] += 1
+
+    def get(self, key: str, stage: str = "") -> Optional[str]:
+        """
+        读取缓存的响应
+
+        Args:
+            key: 缓存键
+            stage: 调用阶段（用于统计）
+
+        Returns:
+            响应文本，未命中或已过期时返回None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, size, created_at FROM llm_responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_responses WHERE cache_key = ?", (key,))
+                self._total_bytes -= row[1]
+                row = None
+            if row is None:
+                self._count(stage, "misses")
+                return None
+            self._conn.execute("UPDATE llm_responses SET last_access = ? WHERE cache_key = ?", (now, key))
+            self._count(stage, "hits")
+            return row[0]
+
+    def put(self, key: str, response: str, stage: str = "", model: str = ""):
+        """
+        写入响应，超过容量上限时淘汰最久未访问的条目
+
+        Args:
+            key: 缓存键
+            response: 响应文本
+            stage: 调用阶段
+            model: 模型名
+        """
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM llm_responses WHERE cache_key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (cache_key, stage, model, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (key, stage, model, response, size, now, now)
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._count(stage, "writes")
+            if self._total_bytes > self.max_bytes:
+                self._evict(now)
+
+    def _evict(self, now: float):
+        """先删除过期条目，再按最近访问时间淘汰到容量上限的90%"""
+        self._conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        evicted = []
+        for key, size in self._conn.execute("SELECT cache_key, size FROM llm_responses ORDER BY last_access"):
+            if total <= target:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM llm_responses WHERE cache_key = ?", evicted)
+        self._total_bytes = total
+        if evicted:
+            print(f"🧹 [LLM缓存] 淘汰 {len(evicted)} 条响应")
+
+    def discard(self, key: str, stage: str = ""):
+        """
+        删除一条响应（调用方无法解析该响应时使用，避免重试时重放同一个错误答案）
+
+        Args:
+            key: 缓存键
+            stage: 调用阶段（用于统计）
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM llm_responses WHERE cache_key = ?", (key,)).fetchone()
+            if row is None:
+                return
+            self._conn.execute("DELETE FROM llm_responses WHERE cache_key = ?", (key,))
+            self._total_bytes -= row[0]
+            self._count(stage, "discards")
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
+            self._total_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+            return {
+                "db_path": self.db_path,
+                "entries": entries,
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "stages": {stage: dict(counters) for stage, counters in self.stats.items()}
+            }
+
+
+class CachedLLM:
+    """
+    带响应缓存的大模型包装器
+
+    与被包装模型一样提供 ainvoke / invoke，命中时直接返回缓存的 AIMessage，其余属性透传。
+    调用方解析响应失败时应调用 discard（或 discard_cached_response）删除该响应，重试时重新请求模型。
+    """
+
+    def __init__(self, llm, cache: LLMResponseCache, llm_config: Dict[str, Any], stage: str):
+        """
+        初始化包装器
+
+        Args:
+            llm: 被包装的大模型
+            cache: 响应缓存
+            llm_config: 模型配置（参与缓存键计算）
+            stage: 调用阶段
+        """
+        self._llm = llm
+        self._cache = cache
+        self._llm_config = llm_config
+        self.stage = stage
+
+    def __getattr__(self, name):
+        return getattr(self._llm, name)
+
+    def _lookup(self, messages) -> Tuple[str, Optional[Any]]:
+        """查询缓存，命中时构造与模型输出一致的消息对象"""
+        from langchain_core.messages import AIMessage
+        key = self._cache.make_key(self._llm_config, messages)
+        cached = self._cache.get(key, self.stage)
+        return key, (AIMessage(content=cached) if cached is not None else None)
+
+    def _store(self, key: str, response):
+        """写入缓存（空响应不缓存）"""
+        text = response.content if hasattr(response, 'content') else str(response)
+        if text:
+            self._cache.put(key, text, self.stage, str(self._llm_config.get("model_name", "")))
+
+    def discard(self, messages):
+        """
+        删除消息对应的缓存响应
+
+        Args:
+            messages: 与调用 ainvoke / invoke 时相同的消息列表
+        """
+        self._cache.discard(self._cache.make_key(self._llm_config, messages), self.stage)
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        key, cached = self._lookup(messages)
+        if cached is not None:
+            return cached
+        response = await self._llm.ainvoke(messages, *args, **kwargs)
+        self._store(key, response)
+        return response
+
+    def invoke(self, messages, *args, **kwargs):
+        key, cached = self._lookup(messages)
+        if cached is not None:
+            return cached
+        response = self._llm.invoke(messages, *args, **kwargs)
+        self._store(key, response)
+        return response
+
+
+def discard_cached_response(llm, messages):
+    """
+    响应无法解析时删除其缓存（未启用缓存的模型不做任何操作）
+
+    Args:
+        llm: 大模型（可能是 CachedLLM）
+        messages: 调用时的消息列表
+    """
+    if isinstance(llm, CachedLLM):
+        llm.discard(messages)
@@ -0,0 +1,173 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from file_fingerprint import get_file_hash
+
+
+class ParsedSheetStore:
+    """
+    已解析工作表的进程内共享存储
+
+    每个工作表在接入时只解析一次，解析得到的 DataFrame 同时供 SQLite 导入、
+    表头识别样本构建和列名映射采样使用，避免重复调用 pd.read_excel。
+    """
+
+    def __init__(self, max_memory_mb: float = None):
+        """
+        初始化已解析工作表存储
+
+        Args:
+            max_memory_mb: 保留的 DataFrame 总内存上限（MB），超出时淘汰最早写入的工作簿
+        """
+        if max_memory_mb is None:
+            max_memory_mb = float(os.getenv("PARSED_SHEET_CACHE_MB", 512))
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self._workbooks: "OrderedDict[str, Dict]" = OrderedDict()  # {绝对路径: {"file_hash", "sheets", "bytes"}}
+        self._tables: Dict[str, Tuple[str, str]] = {}  # {表名: (绝对路径, 工作表名)}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def put_workbook(self, excel_path: str, file_hash: str, frames: Dict[str, pd.DataFrame],
+                     table_mapping: Optional[Dict[str, str]] = None):
+        """
+        保存一个工作簿的全部已解析工作表
+
+        Args:
+            excel_path: Excel文件路径
+            file_hash: 解析时的文件哈希
+            frames: 已解析的工作表 {工作表名: DataFrame}
+            table_mapping: 表映射字典 {工作表名: 数据库表名}
+        """
+        key = os.path.abspath(excel_path)
+        size = sum(int(df.memory_usage(index=True, deep=True).sum()) for df in frames.values())
+        if size > self.max_memory_bytes:
+            print(f"⚠️ 工作簿过大，不保留解析结果: {os.path.basename(excel_path)} ({size / 1024 / 1024:.1f}MB)")
+            return
+
+        with self._lock:
+            self._drop_locked(key)
+            self._workbooks[key] = {"file_hash": file_hash, "sheets": dict(frames), "bytes": size}
+            for sheet_name, table_name in (table_mapping or {}).items():
+                self._tables[table_name] = (key, sheet_name)
+
+            # 超出内存上限时淘汰最早的工作簿
+            while sum(wb["bytes"] for wb in self._workbooks.values()) > self.max_memory_bytes and len(self._workbooks) > 1:
+                oldest = next(iter(self._workbooks))
+                self._drop_locked(oldest)
+
+    def _is_current(self, key: str, workbook: Dict) -> bool:
+        """检查保留的解析结果是否仍对应磁盘上的文件内容"""
+        try:
+            return get_file_hash(key) == workbook["file_hash"]
+        except OSError:
+            return False
+
+    def get_sheet(self, excel_path: str, sheet_name: str) -> Optional[pd.DataFrame]:
+        """
+        获取已解析的工作表
+
+        Args:
+            excel_path: Excel文件路径
+            sheet_name: 工作表名
+
+        Returns:
+            DataFrame，未保留或文件已变化时返回None
+        """
+        key = os.path.abspath(excel_path)
+        with self._lock:
+            workbook = self._workbooks.get(key)
+        if workbook is None or sheet_name not in workbook["sheets"] or not self._is_current(key, workbook):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return workbook["sheets"][sheet_name]
+
+    def get_sheet_names(self, excel_path: str) -> Optional[List[str]]:
+        """
+        获取已解析工作簿的工作表列表
+
+        Args:
+            excel_path: Excel文件路径
+
+        Returns:
+            工作表名列表，未保留或文件已变化时返回None
+        """
+        key = os.path.abspath(excel_path)
+        with self._lock:
+            workbook = self._workbooks.get(key)
+        if workbook is None or not self._is_current(key, workbook):
+            return None
+        return list(workbook["sheets"].keys())
+
+    def get_table(self, table_name: str) -> Optional[pd.DataFrame]:
+        """
+        按数据库表名获取已解析的工作表
+
+        Args:
+            table_name: 数据库表名
+
+        Returns:
+            DataFrame，未保留时返回None
+        """
+        with self._lock:
+            location = self._tables.get(table_name)
+        if location is None:
+            self.misses += 1
+            return None
+        return self.get_sheet(*location)
+
+    def release(self, excel_path: str = None):
+        """
+        释放保留的解析结果（一轮接入的所有消费者完成后调用）
+
+        Args:
+            excel_path: Excel文件路径，为None时释放全部
+        """
+        with self._lock:
+            if excel_path is None:
+                self._workbooks.clear()
+                self._tables.clear()
+            else:
+                self._drop_locked(os.path.abspath(excel_path))
+
+    def _drop_locked(self, key: str):
+        """移除一个工作簿（调用方需持有锁）"""
+        if self._workbooks.pop(key, None) is not None:
+            for table_name in [t for t, loc in self._tables.items() if loc[0] == key]:
+                del self._tables[table_name]
+
+    def get_stats(self) -> Dict:
+        """
+        获取存储统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                "workbooks": len(self._workbooks),
+                "sheets": sum(len(wb["sheets"]) for wb in self._workbooks.values()),
+                "memory_mb": round(sum(wb["bytes"] for wb in self._workbooks.values()) / 1024 / 1024, 2),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+# 全局已解析工作表存储实例
+_parsed_sheet_store = None
+
+def get_parsed_sheet_store() -> ParsedSheetStore:
+    """
+    获取已解析工作表存储单例
+
+    Returns:
+        已解析工作表存储实例
+    """
+    global _parsed_sheet_store
+    if _parsed_sheet_store is None:
+        _parsed_sheet_store = ParsedSheetStore()
+    return _parsed_sheet_store
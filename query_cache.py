@@ -0,0 +1,583 @@
+import os
+import re
+import sys
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from connection_pool import QueryGuard
+from schema_catalog import get_schema_catalog
+
+# 问题 → SQL 精确缓存的最大条目数
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", 1000))
+# 参数化SQL模板的最大条目数
+SQL_TEMPLATE_MAX_ENTRIES = int(os.getenv("SQL_TEMPLATE_MAX_ENTRIES", 500))
+# 查找模板时确认实体存在的探测查询次数上限（超出时按未命中处理）
+SQL_TEMPLATE_MAX_PROBES = int(os.getenv("SQL_TEMPLATE_MAX_PROBES", 8))
+# SQL结果缓存的内存上限（MB）和可缓存的最大行数（超过时不缓存）
+SQL_RESULT_CACHE_MB = float(os.getenv("SQL_RESULT_CACHE_MB", 64))
+SQL_RESULT_CACHE_MAX_ROWS = int(os.getenv("SQL_RESULT_CACHE_MAX_ROWS", 5000))
+# 模板中实体以外的问题文本至少包含的字符数（避免“整句都是实体”的模板匹配任意问题）
+SQL_TEMPLATE_MIN_CONTEXT_CHARS = 4
+
+# 归一化时去掉的空白和句读标点（全角字符先经 NFKC 转为半角；数字中的小数点保留）
+_IGNORED_CHARS = re.compile(r"[\s,;:!?\"'`~。、…“”‘’]+|(?<!\d)\.|\.(?!\d)")
+
+# 生成的SQL中的模糊匹配字面量：LIKE '%实体%'
+_LIKE_LITERAL = re.compile(r"(LIKE\s+)'%([^'%]+)%'", re.IGNORECASE)
+# LIKE 字面量前面的列名（可用 `...`、[...]、"..." 引用，可带 NOT）
+_LIKE_COLUMN = re.compile(r"(`[^`]+`|\[[^\]]+\]|\"[^\"]+\"|[^\W\d]\w*)(?:\s+NOT)?\s+$", re.IGNORECASE)
+# 问题模板中的实体占位符
+_ENTITY_MARK = "\x00"
+# 问题末尾的句读标点（模板匹配时忽略）
+_TRAILING_PUNCTUATION = re.compile(r"[\s,;:!?~。、…]+$")
+
+
+def normalize_query(query: str) -> str:
+    """
+    归一化用户问题：全角转半角、统一小写、去掉空白和标点
+
+    Args:
+        query: 用户问题
+
+    Returns:
+        归一化后的问题
+    """
+    return _IGNORED_CHARS.sub("", unicodedata.normalize("NFKC", query).lower())
+
+
+def _template_text(text: str) -> str:
+    """
+    模板匹配用的轻量归一化：全角转半角、合并空白、去掉末尾标点（保留实体中的大小写和符号）
+
+    Args:
+        text: 问题或实体文本
+
+    Returns:
+        归一化后的文本
+    """
+    text = re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+class SQLQueryCache:
+    """
+    问题 → SQL 的精确缓存
+
+    以归一化后的问题为键，记录生成SQL时选中的工作表及其结构指纹。命中时重新计算这些表的指纹，
+    表被重新接入或列名映射变化后指纹不同，条目自动失效。按最近使用淘汰。
+    """
+
+    def __init__(self, max_entries: int = SQL_CACHE_MAX_ENTRIES):
+        """
+        初始化SQL缓存
+
+        Args:
+            max_entries: 最大条目数
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        查找问题对应的SQL
+
+        Args:
+            query: 用户问题
+
+        Returns:
+            {"sql_query", "sheets"}，未命中或已过期时返回None
+        """
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if get_schema_catalog().get_fingerprint(entry["sheets"]) != entry["fingerprint"]:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            self.stale += 1
+            self.misses += 1
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, query: str, sql_query: str, sheets: List[Tuple[str, str]]):
+        """
+        保存问题对应的SQL
+
+        Args:
+            query: 用户问题
+            sql_query: 生成的SQL
+            sheets: 生成SQL时选中的 [(Excel文件名, 工作表名)]
+        """
+        if not sql_query or not sheets:
+            return
+        fingerprint = get_schema_catalog().get_fingerprint(sheets)
+        if fingerprint is None:
+            return
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = {"sql_query": sql_query, "sheets": list(sheets), "fingerprint": fingerprint}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, query: str):
+        """
+        删除问题对应的条目（例如缓存的SQL执行全部失败时）
+
+        Args:
+            query: 用户问题
+        """
+        with self._lock:
+            self._entries.pop(normalize_query(query), None)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale
+            }
+
+class SQLTemplateCache:
+    """
+    参数化SQL模板缓存
+
+    从生成的SQL中提取 LIKE '%实体%' 字面量，若实体都出现在问题中，则把问题里的实体替换为占位符作为模板键，
+    SQL中的实体替换为参数。结构相同、只是实体不同的新问题（且召回了相同的表）直接代入实体得到SQL，无需调用大模型。
+    相邻实体之间必须有字面文本分隔（否则无法确定实体边界）；套用模板前确认每个新实体在原字面量所匹配的列中确有对应的值。
+    """
+
+    def __init__(self, max_entries: int = SQL_TEMPLATE_MAX_ENTRIES):
+        """
+        初始化模板缓存
+
+        Args:
+            max_entries: 最大模板数
+        """
+        self.max_entries = max_entries
+        self._templates: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _make_template(query: str, sql_query: str) -> Optional[Tuple[str, str, List[List[str]]]]:
+        """
+        由问题和SQL生成 (问题模板, SQL模板, 各实体所匹配的列)
+
+        Returns:
+            无法参数化（没有 LIKE 字面量、字面量不在问题中、相互重叠或相邻、无法确定所匹配的列）时返回None
+        """
+        normalized = _template_text(query)
+        entities, entity_columns = [], {}
+        for match in _LIKE_LITERAL.finditer(sql_query):
+            entity = _template_text(match.group(2))
+            if not entity:
+                continue
+            column = _LIKE_COLUMN.search(sql_query, 0, match.start())
+            if column is None:
+                return None
+            if entity not in entities:
+                entities.append(entity)
+            columns = entity_columns.setdefault(entity, [])
+            if column.group(1) not in columns:
+                columns.append(column.group(1))
+        if not entities:
+            return None
+
+        # 实体按在问题中出现的位置排序，且不能重叠
+        spans = []
+        for entity in entities:
+            start = normalized.find(entity)
+            if start < 0:
+                return None
+            spans.append((start, start + len(entity), entity))
+        spans.sort()
+        # 实体之间没有字面文本时（如“(.+?)(.+?)”）无法确定实体边界
+        if any(not normalized[spans[i][1]:spans[i + 1][0]].strip() for i in range(len(spans) - 1)):
+            return None
+
+        parts, last = [], 0
+        for start, end, _ in spans:
+            parts.append(normalized[last:start])
+            last = end
+        parts.append(normalized[last:])
+        if len("".join(parts)) < SQL_TEMPLATE_MIN_CONTEXT_CHARS:
+            return None
+
+        index = {entity: i for i, (_, _, entity) in enumerate(spans)}
+        sql_template = _LIKE_LITERAL.sub(
+            lambda m: f"{m.group(1)}'%{_ENTITY_MARK}{index[_template_text(m.group(2))]}{_ENTITY_MARK}%'", sql_query
+        )
+        return _ENTITY_MARK.join(parts), sql_template, [entity_columns[entity] for _, _, entity in spans]
+
+    @staticmethod
+    def _entity_exists(conn: sqlite3.Connection, guard: QueryGuard, probes: List[int],
+                       table_names: List[str], columns: List[str], entity: str) -> Optional[bool]:
+        """
+        实体是否在任一表的对应列中有匹配的值（与原 LIKE 字面量相同的匹配方式）
+
+        探测语句与生成的SQL一样经全文索引改写，并在执行预算内运行。
+
+        Args:
+            conn: 数据库连接
+            guard: 本次查找共用的执行预算（已进入）
+            probes: 剩余的探测次数（单元素列表，在多次调用间递减）
+            table_names: 召回的表名
+            columns: 原 LIKE 字面量所匹配的列
+            entity: 提取的实体
+
+        Returns:
+            是否存在匹配的值；探测次数用完或被执行预算中止时返回None
+        """
+        from fts_index import rewrite_like_predicates
+        literal = entity.replace("'", "''")
+        for table_name in table_names:
+            for column in columns:
+                if probes[0] <= 0:
+                    return None
+                probes[0] -= 1
+                probe = f"SELECT 1 FROM \"{table_name}\" WHERE {column} LIKE '%{literal}%' LIMIT 1"
+                try:
+                    row = conn.execute(rewrite_like_predicates(conn, probe)).fetchone()
+                except sqlite3.Error:
+                    if guard.reason is not None:
+                        return None
+                    continue
+                if row is not None:
+                    return True
+        return False
+
+    def _match_entities(self, conn: sqlite3.Connection, guard: QueryGuard, probes: List[int],
+                        template: Dict[str, Any], normalized: str, table_names: List[str]) -> Optional[List[str]]:
+        """
+        用模板匹配问题并确认提取的实体都有匹配的值
+
+        Returns:
+            实体列表；模板不适用时为空列表，探测次数用完或被执行预算中止时返回None
+        """
+        match = template["pattern"].fullmatch(normalized)
+        if match is None:
+            return []
+        entities = [entity.strip() for entity in match.groups()]
+        for entity, columns in zip(entities, template["entity_columns"]):
+            if not entity:
+                return []
+            exists = self._entity_exists(conn, guard, probes, table_names, columns, entity)
+            if exists is None:
+                return None
+            if not exists:
+                return []
+        return entities
+
+    def put(self, query: str, sql_query: str, sheets: List[Tuple[str, str]]):
+        """
+        从生成的SQL中提取模板并保存
+
+        Args:
+            query: 用户问题
+            sql_query: 生成的SQL
+            sheets: 生成SQL时选中的 [(Excel文件名, 工作表名)]
+        """
+        if not sql_query or not sheets:
+            return
+        template = self._make_template(query, sql_query)
+        fingerprint = get_schema_catalog().get_fingerprint(sheets) if template else None
+        if fingerprint is None:
+            return
+        question_template, sql_template, entity_columns = template
+        # 实体以外的文本按字面匹配（忽略大小写和空白差异），实体位置捕获任意文本
+        pattern = re.compile(
+            "(.+?)".join(re.escape(p).replace("\\ ", "\\s*") for p in question_template.split(_ENTITY_MARK)),
+            re.IGNORECASE
+        )
+        with self._lock:
+            key = (question_template, fingerprint)
+            self._templates[key] = {"pattern": pattern, "sql_template": sql_template, "entity_columns": entity_columns}
+            self._templates.move_to_end(key)
+            while len(self._templates) > self.max_entries:
+                self._templates.popitem(last=False)
+
+    def get(self, query: str, sheets: List[Tuple[str, str]], conn: sqlite3.Connection) -> Optional[str]:
+        """
+        用匹配的模板为问题生成SQL
+
+        Args:
+            query: 用户问题
+            sheets: 当前召回的 [(Excel文件名, 工作表名)]
+            conn: 数据库连接（用于确认提取的实体在对应列中有匹配的值，探测次数和执行时间有上限）
+
+        Returns:
+            代入实体后的SQL，没有匹配的模板时返回None
+        """
+        catalog = get_schema_catalog()
+        fingerprint = catalog.get_fingerprint(sheets) if sheets else None
+        if fingerprint is None:
+            return None
+        normalized = _template_text(query)
+        with self._lock:
+            candidates = [(key, template) for key, template in reversed(self._templates.items())
+                          if key[1] == fingerprint]
+        table_names = [t.table_name for t in (catalog.get_table_schema(e, s) for e, s in sheets) if t is not None]
+        probes = [SQL_TEMPLATE_MAX_PROBES]
+        with QueryGuard(conn) as guard:
+            for key, template in candidates:
+                entities = self._match_entities(conn, guard, probes, template, normalized, table_names)
+                if entities is None:
+                    # 探测次数用完或超出执行预算：按未命中处理，交给大模型生成
+                    break
+                if not entities:
+                    continue
+                sql_query = template["sql_template"]
+                for i, entity in enumerate(entities):
+                    sql_query = sql_query.replace(f"{_ENTITY_MARK}{i}{_ENTITY_MARK}", entity.replace("'", "''"))
+                with self._lock:
+                    if key in self._templates:
+                        self._templates.move_to_end(key)
+                self.hits += 1
+                return sql_query
+        self.misses += 1
+        return None
+
+    def clear(self):
+        """清空模板"""
+        with self._lock:
+            self._templates.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取模板缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                "templates": len(self._templates),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+def referenced_tables(conn: sqlite3.Connection, sql: str) -> Set[str]:
+    """
+    获取SQL语句读取的全部数据表（通过 EXPLAIN 编译语句并用授权回调收集，不实际执行查询）
+
+    Args:
+        conn: 数据库连接
+        sql: SQL语句
+
+    Returns:
+        表名集合
+    """
+    tables = set()
+
+    def _authorizer(action, arg1, arg2, db_name, trigger):
+        if action == sqlite3.SQLITE_READ and arg1:
+            tables.add(arg1)
+        return sqlite3.SQLITE_OK
+
+    conn.set_authorizer(_authorizer)
+    try:
+        conn.execute(f"EXPLAIN {sql}").fetchall()
+    finally:
+        conn.set_authorizer(None)
+    return tables
+
+
+class SQLResultCache:
+    """
+    SQL执行结果缓存
+
+    键为归一化的SQL文本加上其读取的各数据表版本（来源文件的哈希和导入时间），表被重新导入后旧结果自然失效。
+    按估算的内存大小做最近最少使用淘汰，行数过多或单个结果过大时不缓存。
+    """
+
+    def __init__(self, max_bytes: int = int(SQL_RESULT_CACHE_MB * 1024 * 1024),
+                 max_rows: int = SQL_RESULT_CACHE_MAX_ROWS):
+        """
+        初始化结果缓存
+
+        Args:
+            max_bytes: 缓存结果的总内存上限（字节）
+            max_rows: 单个结果可缓存的最大行数
+        """
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self._entries: "OrderedDict[Tuple, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    @staticmethod
+    def make_key(conn: sqlite3.Connection, sql: str) -> Optional[Tuple]:
+        """
+        计算语句的缓存键
+
+        Args:
+            conn: 数据库连接
+            sql: SQL语句
+
+        Returns:
+            缓存键；非只读语句、无法编译或读取了未登记版本的表时返回None
+        """
+        from database_manager import get_database_manager
+        if not re.match(r"\s*(SELECT|WITH)\b", sql, re.IGNORECASE):
+            return None
+        try:
+            tables = referenced_tables(conn, sql)
+        except sqlite3.Error:
+            return None
+        versions = get_database_manager().get_table_versions(tables)
+        if not tables or len(versions) != len(tables):
+            return None
+        normalized_sql = re.sub(r"\s+", " ", sql).strip().rstrip(";").rstrip()
+        return normalized_sql, tuple(sorted(versions.items()))
+
+    @staticmethod
+    def _estimate_size(result: Dict[str, Any]) -> int:
+        """估算结果占用的内存"""
+        return (sum(sys.getsizeof(c) for c in result["columns"])
+                + sum(sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row) for row in result["data"]))
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存的结果
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            查询结果（columns、data 及截断信息），未命中时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[0])
+
+    def put(self, key: Tuple, result: Dict[str, Any]):
+        """
+        保存结果，超过内存上限时淘汰最久未使用的结果
+
+        Args:
+            key: 缓存键
+            result: 查询结果（columns、data 及截断信息）
+        """
+        if len(result["data"]) > self.max_rows:
+            self.skipped += 1
+            return
+        size = self._estimate_size(result)
+        if size > self.max_bytes // 4:
+            self.skipped += 1
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._entries[key] = (dict(result), size)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取结果缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "max_rows": self.max_rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "skipped": self.skipped
+            }
+
+# 全局SQL缓存实例
+_sql_query_cache = None
+
+def get_sql_query_cache() -> SQLQueryCache:
+    """
+    获取SQL缓存单例
+
+    Returns:
+        SQL缓存实例
+    """
+    global _sql_query_cache
+    if _sql_query_cache is None:
+        _sql_query_cache = SQLQueryCache()
+    return _sql_query_cache
+
+# 全局SQL模板缓存实例
+_sql_template_cache = None
+
+def get_sql_template_cache() -> SQLTemplateCache:
+    """
+    获取SQL模板缓存单例
+
+    Returns:
+        SQL模板缓存实例
+    """
+    global _sql_template_cache
+    if _sql_template_cache is None:
+        _sql_template_cache = SQLTemplateCache()
+    return _sql_template_cache
+
+# 全局SQL结果缓存实例
+_sql_result_cache = None
+
+def get_sql_result_cache() -> SQLResultCache:
+    """
+    获取SQL结果缓存单例
+
+    Returns:
+        SQL结果缓存实例
+    """
+    global _sql_result_cache
+    if _sql_result_cache is None:
+        _sql_result_cache = SQLResultCache()
+    return _sql_result_cache
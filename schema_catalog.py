@@ -0,0 +1,188 @@
+import json
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from column_profiler import NUMERIC_SHADOW_SUFFIX, is_numeric_shadow
+
+
+class TableSchema:
+    """单个数据表的结构信息及预先拼好的提示词片段"""
+
+    def __init__(self, table_name: str, excel_name: str, sheet_name: str,
+                 columns: List[str], column_mappings: Dict[str, str]):
+        self.table_name = table_name
+        self.excel_name = excel_name
+        self.sheet_name = sheet_name
+        self.columns = columns
+        self.column_mappings = column_mappings
+        self.schema_fragment = f"表名: {table_name} (来源: {excel_name}-{sheet_name}), 列名: {', '.join(columns)}"
+        shadows = [c for c in columns if is_numeric_shadow(c, columns)]
+        if shadows:
+            # 影子列是夹杂表头行等文本的列清洗后的数值，数值比较、排序和聚合应使用影子列
+            self.schema_fragment += "; 数值列（用于数值比较、排序和聚合）: " + ", ".join(
+                f"{c} = {c[:-len(NUMERIC_SHADOW_SUFFIX)]} 的数值" for c in shadows)
+        self.mapping_fragment = ""
+        if column_mappings:
+            self.mapping_fragment = f"\n\n表 {table_name} 的列名业务含义映射:\n"
+            for db_col, business_meaning in column_mappings.items():
+                self.mapping_fragment += f"  - {db_col} → {business_meaning}\n"
+
+
+class SchemaCatalog:
+    """
+    内存中的数据表结构目录
+
+    保存 (Excel, 工作表) → 表名、表 → 列名 → 业务含义的映射以及每个表的提示词片段。
+    数据接入和列名映射变化时由写入方调用 invalidate，生成SQL时只做内存中的字符串拼接。
+    """
+
+    def __init__(self):
+        """
+        初始化结构目录
+        """
+        self._lock = threading.RLock()
+        self._sheet_index: Optional[Dict[Tuple[str, str], str]] = None  # {(Excel文件名, 工作表名): 表名}
+        self._tables: Dict[str, TableSchema] = {}
+        self._versions: Dict[str, int] = {}  # {表名: 失效次数}，用于判断依赖该表的缓存是否过期
+        self._epoch = 0  # 全量失效次数
+        self.loads = 0
+        self.hits = 0
+
+    def invalidate(self, table_names: Iterable[str] = None):
+        """
+        使目录失效，下次访问时重新加载
+
+        Args:
+            table_names: 发生变化的表名，为None时清空全部
+        """
+        with self._lock:
+            self._sheet_index = None
+            if table_names is None:
+                self._tables.clear()
+                self._epoch += 1
+            else:
+                for table_name in table_names:
+                    self._tables.pop(table_name, None)
+                    self._versions[table_name] = self._versions.get(table_name, 0) + 1
+
+    def _load_sheet_index(self) -> Dict[Tuple[str, str], str]:
+        """从元数据表加载 (Excel, 工作表) → 表名 的映射"""
+        from database_manager import get_database_manager
+        conn = get_database_manager().pool.get_reader()
+        sheet_index = {}
+        # 原有映射表作为兜底，增强映射优先
+        for file_name, sheet_name, table_name in conn.execute(
+                "SELECT file_name, sheet_name, table_name FROM table_mappings"):
+            sheet_index[(file_name, sheet_name)] = table_name
+        for excel_name, sheet_name, table_name in conn.execute(
+                "SELECT excel_name, sheet_name, table_name FROM enhanced_table_mappings"):
+            sheet_index[(excel_name, sheet_name)] = table_name
+        return sheet_index
+
+    def _load_table(self, table_name: str, excel_name: str, sheet_name: str) -> Optional[TableSchema]:
+        """加载单个表的列信息和业务含义映射"""
+        from database_manager import get_database_manager
+        db_manager = get_database_manager()
+        columns = [row[1] for row in db_manager.pool.get_reader().execute(f"PRAGMA table_info([{table_name}])")]
+        if not columns:
+            return None
+        try:
+            column_mappings = db_manager.get_column_mapping(table_name) or {}
+        except Exception as e:
+            print(f"⚠️ [CATALOG] 加载表 {table_name} 的列名映射失败: {e}")
+            column_mappings = {}
+        self.loads += 1
+        return TableSchema(table_name, excel_name, sheet_name, columns, column_mappings)
+
+    def get_table_name(self, excel_name: str, sheet_name: str) -> Optional[str]:
+        """
+        获取工作表对应的数据库表名
+
+        Args:
+            excel_name: Excel文件名
+            sheet_name: 工作表名
+
+        Returns:
+            数据库表名，未找到时返回None
+        """
+        with self._lock:
+            if self._sheet_index is None:
+                self._sheet_index = self._load_sheet_index()
+            return self._sheet_index.get((excel_name, sheet_name))
+
+    def get_table_schema(self, excel_name: str, sheet_name: str) -> Optional[TableSchema]:
+        """
+        获取工作表对应数据表的结构信息
+
+        Args:
+            excel_name: Excel文件名
+            sheet_name: 工作表名
+
+        Returns:
+            表结构信息，未找到时返回None
+        """
+        table_name = self.get_table_name(excel_name, sheet_name)
+        if table_name is None:
+            return None
+        with self._lock:
+            schema = self._tables.get(table_name)
+            if schema is not None:
+                self.hits += 1
+                return schema
+            schema = self._load_table(table_name, excel_name, sheet_name)
+            if schema is not None:
+                self._tables[table_name] = schema
+            return schema
+
+    def get_fingerprint(self, sheets: Iterable[Tuple[str, str]]) -> Optional[str]:
+        """
+        计算一组工作表对应数据表的结构指纹（列名、业务含义映射和失效版本）
+
+        表被重新接入或映射变化时指纹随之改变，依赖这些表的缓存据此判断是否过期。
+
+        Args:
+            sheets: [(Excel文件名, 工作表名)]
+
+        Returns:
+            指纹字符串，任一工作表没有对应数据表时返回None
+        """
+        parts = []
+        for excel_name, sheet_name in sheets:
+            schema = self.get_table_schema(excel_name, sheet_name)
+            if schema is None:
+                return None
+            with self._lock:
+                version = (self._epoch, self._versions.get(schema.table_name, 0))
+            parts.append([schema.table_name, schema.columns, schema.column_mappings, version])
+        return hashlib.sha1(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def get_stats(self) -> Dict:
+        """
+        获取目录统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                "cached_tables": len(self._tables),
+                "sheet_index_loaded": self._sheet_index is not None,
+                "loads": self.loads,
+                "hits": self.hits
+            }
+
+# 全局结构目录实例
+_schema_catalog = None
+
+def get_schema_catalog() -> SchemaCatalog:
+    """
+    获取结构目录单例
+
+    Returns:
+        结构目录实例
+    """
+    global _schema_catalog
+    if _schema_catalog is None:
+        _schema_catalog = SchemaCatalog()
+    return _schema_catalog
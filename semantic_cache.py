@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+from typing import Any, Dict, List, Optional
+
+import faiss
+import numpy as np
+
+# 语义缓存的相似度阈值（余弦相似度）和最大条目数
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 2000))
+# 每次查找时比较的近邻数量
+SEMANTIC_CACHE_TOP_K = 5
+
+
+class SemanticResultCache:
+    """
+    问题 → 最终答案的语义缓存
+
+    用已加载的嵌入模型对问题编码，保存在内存中的 FAISS 内积索引（向量已归一化，即余弦相似度）。
+    相似度达到阈值且条目的数据版本与当前数据版本一致时直接返回缓存的答案；
+    数据版本只增不减，版本变化后旧条目不可能再命中，写入时一并清理。
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        """
+        初始化语义缓存
+
+        Args:
+            threshold: 命中所需的最小余弦相似度
+            max_entries: 最大条目数，超出时淘汰最早写入的条目
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._index = None
+        self._vectors: List[np.ndarray] = []
+        self._entries: List[Dict[str, Any]] = []
+        self.hits = 0
+        self.misses = 0
+        self.last_similarity = None
+
+    @staticmethod
+    def embed(query: str, embedding_model) -> np.ndarray:
+        """
+        对问题编码并归一化
+
+        Args:
+            query: 用户问题
+            embedding_model: 嵌入模型（ModelManager.get_embedding_model）
+
+        Returns:
+            归一化后的向量
+        """
+        vector = np.asarray(embedding_model.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _rebuild_locked(self):
+        """按当前条目重建索引"""
+        self._index = None
+        if self._vectors:
+            self._index = faiss.IndexFlatIP(len(self._vectors[0]))
+            self._index.add(np.vstack(self._vectors))
+
+    def lookup(self, embedding: np.ndarray, data_version: int) -> Optional[Dict[str, Any]]:
+        """
+        查找语义相似且数据版本一致的缓存答案
+
+        Args:
+            embedding: 归一化的问题向量
+            data_version: 当前数据版本
+
+        Returns:
+            {"query", "response", "data_version", "similarity"}，未命中时返回None
+        """
+        with self._lock:
+            best = None
+            if self._index is not None:
+                scores, ids = self._index.search(embedding[None, :], min(SEMANTIC_CACHE_TOP_K, len(self._entries)))
+                for score, idx in zip(scores[0], ids[0]):
+                    if idx < 0:
+                        continue
+                    entry = self._entries[idx]
+                    if entry["data_version"] == data_version:
+                        best = (float(score), entry)
+                        break
+            self.last_similarity = best[0] if best else None
+            if best is None or best[0] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            best[1]["hits"] += 1
+            return {**best[1], "similarity": best[0]}
+
+    def store(self, query: str, embedding: np.ndarray, response: Dict[str, Any], data_version: int):
+        """
+        保存问题的最终答案
+
+        Args:
+            query: 用户问题
+            embedding: 归一化的问题向量
+            response: run_flow 的最终响应
+            data_version: 生成答案时的数据版本
+        """
+        with self._lock:
+            # 旧版本的条目不会再命中，直接清理
+            keep = [i for i, entry in enumerate(self._entries) if entry["data_version"] >= data_version]
+            keep = keep[-(self.max_entries - 1):] if self.max_entries > 1 else []
+            if len(keep) != len(self._entries):
+                self._entries = [self._entries[i] for i in keep]
+                self._vectors = [self._vectors[i] for i in keep]
+                self._rebuild_locked()
+            self._entries.append({
+                "query": query, "response": response, "data_version": data_version,
+                "created_at": time.time(), "hits": 0
+            })
+            self._vectors.append(embedding)
+            if self._index is None:
+                self._rebuild_locked()
+            else:
+                self._index.add(embedding[None, :])
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries, self._vectors = [], []
+            self._index = None
+
+    def get_stats(self, include_entries: bool = False) -> Dict[str, Any]:
+        """
+        获取缓存统计信息（用于调整阈值）
+
+        Args:
+            include_entries: 是否包含每个条目的问题、数据版本和命中次数
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            stats = {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "last_similarity": self.last_similarity
+            }
+            if include_entries:
+                stats["items"] = [
+                    {"query": e["query"], "data_version": e["data_version"], "hits": e["hits"]}
+                    for e in self._entries
+                ]
+            return stats
+
+# 全局语义缓存实例
+_semantic_cache = None
+
+def get_semantic_cache() -> SemanticResultCache:
+    """
+    获取语义缓存单例
+
+    Returns:
+        语义缓存实例
+    """
+    global _semantic_cache
+    if _semantic_cache is None:
+        _semantic_cache = SemanticResultCache()
+    return _semantic_cache
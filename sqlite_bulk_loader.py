@@ -0,0 +1,315 @@
+import os
+import math
+import sqlite3
+import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from connection_pool import SQLiteConnectionPool
+from column_profiler import ColumnProfile, make_row_converter, profile_dataframe, profile_rows, storage_layout
+
+# 每批插入的行数
+DEFAULT_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_ROWS", 5000))
+# 导入期间的页缓存大小（负数表示KB）
+BULK_CACHE_SIZE_KB = int(os.getenv("INGEST_CACHE_SIZE_KB", 256 * 1024))
+# 为流式导入的工作表保留的样本行数（供表头识别和列名映射使用）
+STREAM_SAMPLE_ROWS = 200
+
+
+def sqlite_type_for_dtype(dtype) -> str:
+    """
+    将 pandas 列类型转换为 SQLite 类型名（与 to_sql 的约定一致）
+
+    Args:
+        dtype: pandas 列类型
+
+    Returns:
+        SQLite 类型名
+    """
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP"
+    return "TEXT"
+
+
+def to_sqlite_value(value: Any) -> Any:
+    """
+    将单元格值转换为 sqlite3 可绑定的类型
+
+    Args:
+        value: 原始值
+
+    Returns:
+        None / int / float / str / bytes
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, str, bytes)):
+        return value
+    if isinstance(value, float):
+        return None if math.isnan(value) else value
+    if isinstance(value, np.generic):
+        return to_sqlite_value(value.item())
+    if value is pd.NaT:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return str(value)
+    return str(value)
+
+
+def quote_identifier(name: str) -> str:
+    """对 SQLite 标识符加双引号转义"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def normalize_header(raw_header: Sequence[Any]) -> List[str]:
+    """
+    按 pandas.read_excel 的规则规范化表头：空单元格为 "Unnamed: i"，重复列名追加 ".n"
+
+    Args:
+        raw_header: 表头行的原始值
+
+    Returns:
+        列名列表
+    """
+    columns = []
+    seen: Dict[str, int] = {}
+    for i, value in enumerate(raw_header):
+        if value is None or (isinstance(value, float) and math.isnan(value)) or str(value).strip() == "":
+            name = f"Unnamed: {i}"
+        else:
+            name = str(value)
+        if name in seen:
+            seen[name] += 1
+            deduped = f"{name}.{seen[name]}"
+            while deduped in seen:
+                seen[name] += 1
+                deduped = f"{name}.{seen[name]}"
+            seen[deduped] = 0
+            name = deduped
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def estimate_sheet_rows(excel_path: str) -> Dict[str, int]:
+    """
+    读取工作簿中各工作表的行数估计（只读模式，仅读取维度信息）
+
+    Args:
+        excel_path: Excel文件路径
+
+    Returns:
+        {工作表名: 估计行数}，无法估计的格式返回0
+    """
+    if not excel_path.endswith('.xlsx'):
+        with pd.ExcelFile(excel_path) as excel_file:
+            return {name: 0 for name in excel_file.sheet_names}
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        return {ws.title: int(ws.max_row or 0) for ws in workbook.worksheets}
+    finally:
+        workbook.close()
+
+
+def _is_empty_cell(value: Any) -> bool:
+    """openpyxl 读出的空单元格（None 或空字符串，pandas 同样视为空）"""
+    return value is None or value == ""
+
+
+def iter_excel_rows(excel_path: str, sheet_name: str) -> Tuple[List[str], Iterator[Tuple[Any, ...]]]:
+    """
+    流式读取工作表：返回列名和逐行数据的迭代器（xlsx 使用 openpyxl 只读模式）
+
+    Args:
+        excel_path: Excel文件路径
+        sheet_name: 工作表名
+
+    Returns:
+        (列名列表, 行迭代器)，行的长度与列名一致
+    """
+    if not excel_path.endswith('.xlsx'):
+        # xls 格式没有流式读取器，退化为整表读取后逐行输出
+        df = pd.read_excel(excel_path, sheet_name=sheet_name)
+        return [str(c) for c in df.columns], df.itertuples(index=False, name=None)
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    sheet = workbook[sheet_name]
+    # 与 pandas 一样忽略文件中记录的表格范围（可能不准确），列宽取所有行中最后一个非空单元格的最大位置：
+    # 表头只有标题单元格或右侧有无表头的列时，这些列同样保留为 "Unnamed: i"
+    sheet.reset_dimensions()
+    width = 0
+    for row in sheet.iter_rows(values_only=True):
+        used = len(row)
+        while used > width and _is_empty_cell(row[used - 1]):
+            used -= 1
+        width = max(width, used)
+    rows = sheet.iter_rows(values_only=True)
+    raw_header = next(rows, None)
+    if raw_header is None or width == 0:
+        workbook.close()
+        return [], iter(())
+
+    columns = normalize_header(tuple(raw_header[:width]) + (None,) * (width - len(raw_header)))
+
+    def _generate():
+        blank_run = 0  # 连续空行延迟输出，与 pandas 一样丢弃末尾空行
+        try:
+            for row in rows:
+                row = tuple(None if v == "" else v for v in row[:width]) + (None,) * (width - len(row))
+                if all(v is None for v in row):
+                    blank_run += 1
+                    continue
+                for _ in range(blank_run):
+                    yield (None,) * width
+                blank_run = 0
+                yield row
+        finally:
+            workbook.close()
+
+    return columns, _generate()
+
+
+class BulkSqliteLoader:
+    """
+    SQLite 批量导入器
+
+    导入期间在连接池的写连接上启用批量写入参数（WAL、降低同步级别、大页缓存），按块 executemany，
+    整个工作簿在一个事务内提交，内存占用与工作表大小无关（仅与块大小相关）。
+    建表前先推断各列类型（见 column_profiler），数值列以数值亲和性存储，夹杂非数值内容的列另加数值影子列。
+    """
+
+    def __init__(self, pool: SQLiteConnectionPool, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        初始化批量导入器
+
+        Args:
+            pool: 数据库连接池，导入期间独占其写连接
+            chunk_size: 每批插入的行数
+        """
+        self.pool = pool
+        self.chunk_size = chunk_size
+        self.conn: Optional[sqlite3.Connection] = None
+        self._writer_cm = None
+
+    def __enter__(self) -> "BulkSqliteLoader":
+        self._writer_cm = self.pool.writer_connection()
+        self.conn = self._writer_cm.__enter__()
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute(f"PRAGMA cache_size=-{BULK_CACHE_SIZE_KB}")
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.conn.execute("COMMIT")
+            else:
+                self.conn.execute("ROLLBACK")
+        finally:
+            # 恢复连接池的常规参数（WAL 模式下 NORMAL 即可保证一致性）
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(f"PRAGMA cache_size=-{self.pool.cache_size_kb}")
+            self.conn = None
+            self._writer_cm.__exit__(None, None, None)
+            self._writer_cm = None
+        return False
+
+    def cursor(self) -> sqlite3.Cursor:
+        """获取当前事务内的游标（用于写入映射等元数据）"""
+        return self.conn.cursor()
+
+    def _create_table(self, table_name: str, columns: List[str], types: List[str]):
+        """重建目标表"""
+        column_defs = ", ".join(f"{quote_identifier(c)} {t}" for c, t in zip(columns, types))
+        self.conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+        self.conn.execute(f"CREATE TABLE {quote_identifier(table_name)} ({column_defs})")
+
+    def _create_profiled_table(self, table_name: str, profiles: List[ColumnProfile]) -> List[str]:
+        """按类型推断结果重建目标表，返回包含影子列在内的全部列名"""
+        columns, types = storage_layout(profiles)
+        self._create_table(table_name, columns, types)
+        return columns
+
+    def _insert_chunks(self, table_name: str, columns: List[str], chunks: Iterable[List[Tuple[Any, ...]]],
+                       profiles: Optional[List[ColumnProfile]] = None) -> int:
+        """按块插入数据（提供类型推断结果时按推断类型转换数据行）"""
+        placeholders = ", ".join("?" for _ in columns)
+        sql = f"INSERT INTO {quote_identifier(table_name)} VALUES ({placeholders})"
+        convert = make_row_converter(profiles) if profiles else None
+        total = 0
+        for chunk in chunks:
+            if convert is not None:
+                chunk = [convert(row) for row in chunk]
+            self.conn.executemany(sql, [tuple(to_sqlite_value(v) for v in row) for row in chunk])
+            total += len(chunk)
+        return total
+
+    def load_dataframe(self, table_name: str, df: pd.DataFrame) -> int:
+        """
+        导入已解析的 DataFrame
+
+        Args:
+            table_name: 目标表名
+            df: 数据
+
+        Returns:
+            导入的行数
+        """
+        profiles = profile_dataframe(df)
+        columns = self._create_profiled_table(table_name, profiles)
+
+        def _chunks():
+            for start in range(0, len(df), self.chunk_size):
+                yield list(df.iloc[start:start + self.chunk_size].itertuples(index=False, name=None))
+
+        return self._insert_chunks(table_name, columns, _chunks(), profiles)
+
+    def load_excel_sheet(self, table_name: str, excel_path: str, sheet_name: str,
+                         sample_rows: int = STREAM_SAMPLE_ROWS) -> Tuple[int, pd.DataFrame]:
+        """
+        从Excel流式导入工作表，不在内存中保留整表
+
+        Args:
+            table_name: 目标表名
+            excel_path: Excel文件路径
+            sheet_name: 工作表名
+            sample_rows: 保留的样本行数
+
+        Returns:
+            (导入的行数, 前若干行样本 DataFrame，attrs["total_rows"] 为总行数)
+        """
+        columns, rows = iter_excel_rows(excel_path, sheet_name)
+        first_chunk = list(islice(rows, self.chunk_size))
+        profiles = profile_rows(columns, first_chunk)
+        table_columns = self._create_profiled_table(table_name, profiles)
+
+        def _chunks():
+            if first_chunk:
+                yield first_chunk
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                yield chunk
+
+        total = self._insert_chunks(table_name, table_columns, _chunks(), profiles) if columns else 0
+        sample = pd.DataFrame(first_chunk[:sample_rows], columns=columns)
+        sample.attrs["total_rows"] = total
+        return total, sample
@@ -95,9 +95,9 @@ def create_column_mapping_configs():
         config_dir = "column_mapping_docs"
         os.makedirs(config_dir, exist_ok=True)
         
-        # 初始化列名映射生成器（这会触发启动检查）
+        # 初始化列名映射生成器（缺失映射在服务启动时、工作表分析之后再生成）
         try:
-            column_mapping_generator = get_column_mapping_generator(config_dir)
+            column_mapping_generator = get_column_mapping_generator(config_dir, check_on_init=False)
             print("✅ 列名映射生成器初始化完成")
             
             # 获取映射状态